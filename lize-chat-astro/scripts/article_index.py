@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文章元数据索引
+缓存每篇文章的 frontmatter 字段，以 路径 + 修改时间 + 文件大小 判断文件是否变化：
+每次刷新只重新解析新增或修改过的文件，排序和筛选都在索引上完成，不再读取未变化的文件
+"""
+
+import argparse
+import json
+import os
+import re
+from datetime import date, datetime
+from pathlib import Path
+
+from frontmatter_io import read_header
+
+# 默认配置
+CONTENT_ROOT = Path(__file__).parent.parent / "src" / "content"
+COLLECTIONS = {
+    'blog': CONTENT_ROOT / "blog",
+    'dialogue': CONTENT_ROOT / "dialogue",
+}
+INDEX_FILE = Path(__file__).parent / ".cache" / "article_index.json"
+INDEX_VERSION = 1
+# 文章中的日期写法：2024-01-05、2024-1-5、2024/01/05，后面可以带时间
+_DAY = re.compile(r'(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})')
+_ISO_DAY = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+def _plain(value):
+    """把 YAML 解析出的值转换为可写入 JSON 的值（日期转为 ISO 字符串）"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    return value
+
+
+def read_metadata(filepath):
+    """解析一篇文章的 frontmatter（只读取头部，不读取正文），返回字段字典"""
+    return _plain(read_header(filepath).fields)
+
+
+def sort_date(fields):
+    """文章日期：blog 使用 pubDate（兼容 date），dialogue 使用 date"""
+    value = fields.get('pubDate') or fields.get('date')
+    return str(value) if value else ''
+
+
+def article_day(fields):
+    """文章日期（date），没有日期或无法识别时返回 None"""
+    match = _DAY.match(sort_date(fields).strip())
+    if not match:
+        return None
+    try:
+        return date(*map(int, match.groups()))
+    except ValueError:
+        return None
+
+
+def parse_day(value):
+    """把 YYYY-MM-DD 字符串转换为 date（date 原样返回），格式错误时抛出 ValueError"""
+    if value is None or isinstance(value, date):
+        return value
+    if not _ISO_DAY.fullmatch(value.strip()):
+        raise ValueError(f"无效的日期: {value}（应为 YYYY-MM-DD）")
+    return date.fromisoformat(value.strip())
+
+
+def day_arg(text):
+    """argparse 的 type=：--since/--until 转换为 date，格式错误时由 argparse 报错"""
+    try:
+        return parse_day(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的日期: {text}（应为 YYYY-MM-DD，如 2024-01-05）")
+
+
+class ArticleIndex:
+    """集合/文件名 -> {collection, path, mtime, size, fields, error} 的持久化索引"""
+
+    def __init__(self, path=INDEX_FILE, collections=None):
+        self.path = Path(path)
+        self.collections = collections or COLLECTIONS
+        self.entries = {}
+        self.stats = {'parsed': 0, 'reused': 0, 'removed': 0}
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+        except ValueError:
+            return
+        if data.get('version') == INDEX_VERSION:
+            self.entries = data.get('entries', {})
+
+    def save(self):
+        """原子写入索引文件"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'entries': self.entries}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def refresh(self, rebuild=False):
+        """扫描各集合目录，只重新解析新增或修改过的文件；返回本次统计"""
+        self.stats = {'parsed': 0, 'reused': 0, 'removed': 0}
+        if rebuild:
+            self.entries = {}
+        seen = set()
+        changed = False
+        for collection, directory in self.collections.items():
+            if not directory.exists():
+                continue
+            for filepath in directory.glob("*.md"):
+                key = f"{collection}/{filepath.name}"
+                seen.add(key)
+                st = filepath.stat()
+                entry = self.entries.get(key)
+                if entry and entry['mtime'] == st.st_mtime_ns and entry['size'] == st.st_size:
+                    self.stats['reused'] += 1
+                    continue
+                entry = {'collection': collection, 'path': str(filepath), 'mtime': st.st_mtime_ns,
+                         'size': st.st_size, 'fields': {}, 'error': None}
+                try:
+                    entry['fields'] = read_metadata(filepath)
+                except Exception as e:
+                    entry['error'] = str(e)
+                self.entries[key] = entry
+                self.stats['parsed'] += 1
+                changed = True
+
+        for key in [k for k in self.entries if k not in seen]:
+            del self.entries[key]
+            self.stats['removed'] += 1
+            changed = True
+        if changed or not self.path.exists():
+            self.save()
+        return self.stats
+
+    def query(self, collection=None, since=None, until=None, title=None, tag=None, sort='date', reverse=None):
+        """
+        按条件筛选并排序，返回条目列表
+
+        since/until 为 date 或 YYYY-MM-DD 字符串（含当天，格式错误时抛出 ValueError），
+        与文章日期按日期而不是字符串比较；title 为正则表达式；sort 为 'date' 或 'name'，
+        按日期排序时默认新的在前
+        """
+        since, until = parse_day(since), parse_day(until)
+        title_re = re.compile(title, re.IGNORECASE) if title else None
+        results = []
+        for entry in self.entries.values():
+            if collection and entry['collection'] != collection:
+                continue
+            fields = entry['fields']
+            day = article_day(fields) if since or until else None
+            if since and (not day or day < since):
+                continue
+            if until and (not day or day > until):
+                continue
+            if title_re and not title_re.search(str(fields.get('title', ''))):
+                continue
+            if tag:
+                tags = fields.get('tags') or []
+                if tag not in (tags if isinstance(tags, list) else [tags]):
+                    continue
+            results.append(entry)
+
+        if sort == 'date':
+            results.sort(key=lambda e: (sort_date(e['fields']), Path(e['path']).name),
+                         reverse=True if reverse is None else reverse)
+        else:
+            results.sort(key=lambda e: Path(e['path']).name, reverse=bool(reverse))
+        return results
+
+
+def load_index(rebuild=False, path=INDEX_FILE):
+    """加载并刷新索引"""
+    index = ArticleIndex(path)
+    index.refresh(rebuild=rebuild)
+    return index
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+为缺少 description 的文章补写摘要
+在 article_index.py 的元数据索引上找出没有 description 的文章（不重新读取未变化的文件），
+由线程池并行处理：每篇只读取头部和正文开头摘要需要的部分（见 summary.py），
+头部和正文直接写入文件（正文按字节范围从原文件复制），先写临时文件再原子改名
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from article_index import load_index, COLLECTIONS
+from frontmatter_io import read_header, write_document
+from summary import summarize_file, DEFAULT_MAX_LENGTH
+
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def missing_description(index, collections):
+    """索引中没有 description 的文章（解析失败的文章除外）"""
+    return [
+        entry for entry in index.query(collection=None, sort='name')
+        if entry['collection'] in collections and not entry['error'] and not entry['fields'].get('description')
+    ]
+
+
+def backfill_file(filepath, max_length=DEFAULT_MAX_LENGTH, dry_run=False):
+    """
+    为一篇文章补写摘要，返回 (状态, 摘要)
+
+    状态为 filled、present（已有 description，如索引过期时）、empty（正文没有可用的文字）或 skipped（头部没有结束的 ---）
+    """
+    header = read_header(filepath)
+    if header.unterminated:
+        return 'skipped', None
+    fields = dict(header.fields or {})
+    if fields.get('description'):
+        return 'present', None
+    description = summarize_file(header, max_length)
+    if not description:
+        return 'empty', None
+    fields['description'] = description
+    if not header.has_frontmatter:
+        fields.setdefault('title', filepath.stem)
+    if not dry_run:
+        write_document(filepath, fields, header)
+    return 'filled', description
+
+
+def backfill_descriptions(collections=('blog',), workers=DEFAULT_WORKERS, max_length=DEFAULT_MAX_LENGTH,
+                          dry_run=False, verbose=False, index=None):
+    """补写所有缺少 description 的文章，返回统计"""
+    start = time.perf_counter()
+    if index is None:
+        index = load_index()
+    else:
+        index.refresh()
+    entries = missing_description(index, collections)
+    counts = {'filled': 0, 'present': 0, 'empty': 0, 'skipped': 0, 'error': 0}
+
+    def process(entry):
+        try:
+            return backfill_file(Path(entry['path']), max_length, dry_run)
+        except Exception as e:
+            return 'error', str(e)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for entry, (status, detail) in zip(entries, executor.map(process, entries)):
+            counts[status] += 1
+            label = f"{entry['collection']}/{Path(entry['path']).name}"
+            if status == 'filled':
+                print(f"[OK] {label}: {detail}")
+            elif status == 'error':
+                print(f"[ERROR] 处理失败 {label}: {detail}")
+            elif verbose:
+                print(f"[SKIP] {label}（{status}）")
+    if counts['filled'] and not dry_run:
+        index.refresh()
+    counts['candidates'] = len(entries)
+    counts['elapsed'] = time.perf_counter() - start
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='为缺少 description 的文章补写摘要（并行处理）')
+    parser.add_argument('--collection', action='append', choices=list(COLLECTIONS),
+                        help='处理的集合，可重复指定（默认为 blog）')
+    parser.add_argument('--workers', '-w', type=int, default=DEFAULT_WORKERS,
+                        help=f'并行处理的线程数（默认为 {DEFAULT_WORKERS}）')
+    parser.add_argument('--max-length', type=int, default=DEFAULT_MAX_LENGTH,
+                        help=f'摘要长度（默认为 {DEFAULT_MAX_LENGTH} 个字符，优先在句末标点处截断）')
+    parser.add_argument('--dry-run', '-n', action='store_true', help='只打印生成的摘要，不写入文件')
+    parser.add_argument('--verbose', '-v', action='store_true', help='同时列出跳过的文章')
+    args = parser.parse_args()
+    if args.max_length < 1:
+        parser.error("--max-length 必须大于 0")
+
+    stats = backfill_descriptions(args.collection or ('blog',), workers=args.workers, max_length=args.max_length,
+                                  dry_run=args.dry_run, verbose=args.verbose)
+    action = '可补写' if args.dry_run else '已补写'
+    print(f"\n缺少 description 的文章 {stats['candidates']} 篇：{action} {stats['filled']} 篇，"
+          f"正文为空 {stats['empty']} 篇，已有 {stats['present']} 篇，头部不完整 {stats['skipped']} 篇，"
+          f"失败 {stats['error']} 篇")
+    if args.dry_run:
+        print("[DRY RUN] 未修改任何文件")
+    print(f"耗时: {stats['elapsed']:.2f}s")
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+抓取 -> 提取 -> 转换 -> 摘要 -> 保存 的离线基准测试
+不发送任何网络请求：用固定的样本页面替换 fetch_html，对每个阶段分别计时，
+输出各阶段延迟分位数、吞吐量（篇/s、MB/s）和峰值内存，结果可保存为 JSON 在不同提交之间对比。
+
+样本页面默认由固定随机种子生成，模拟微信公众号文章的结构，包含不同大小：
+短文、普通长度、超长文章和图片很多的文章；也可以用保存下来的真实页面或响应缓存。
+
+用法：
+    python benchmark.py                                # 生成的样本，每篇 5 轮
+    python benchmark.py --rounds 20 --output before.json
+    python benchmark.py --fixtures saved_pages/ --parser bs4
+    python benchmark.py --cache                        # 使用响应缓存中的页面
+    python benchmark.py --compare before.json --output after.json
+"""
+
+import argparse
+import gc
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，不统计峰值内存
+    resource = None
+
+import fast_extract
+import fetch_wechat_article_enhanced as fetcher
+
+DEFAULT_ROUNDS = 5
+DEFAULT_SEED = 20240115
+FIXTURE_HOST = 'https://mp.weixin.qq.com/s/bench-'
+
+STAGES = ('extract', 'convert', 'summary', 'save', 'end_to_end')
+
+# 生成样本的各档位：(名称, 段落数, 图片数)
+FIXTURE_PROFILES = [
+    ('short', 12, 1),
+    ('medium', 120, 6),
+    ('long', 2500, 20),
+    ('image_heavy', 80, 300),
+]
+
+_SENTENCES = [
+    '今天我们聊一聊人工智能如何改变了我们的日常工作',
+    '嘉宾分享了自己从工程师转型为产品经理的经历',
+    '在这个过程中，最重要的是保持好奇心和耐心',
+    'Large language models are changing how we write software',
+    '我们讨论了开源社区的协作方式以及其中的挑战',
+    '每一次对话都让我重新思考技术和人的关系',
+    '这本书里有一句话让我印象深刻：慢慢来，比较快',
+    'The quick brown fox jumps over the lazy dog',
+]
+
+
+def _paragraph(rng):
+    text = '，'.join(rng.choice(_SENTENCES) for _ in range(rng.randint(2, 6))) + '。'
+    style = 'font-size: 15px; color: rgb(62, 62, 62); line-height: 1.75em;'
+    kind = rng.random()
+    if kind < 0.1:
+        return f'<h2 style="{style}"><span><strong>{text[:20]}</strong></span></h2>'
+    if kind < 0.2:
+        return f'<blockquote><p style="{style}"><span>{text}</span></p></blockquote>'
+    if kind < 0.28:
+        items = ''.join(f'<li><p><span>{rng.choice(_SENTENCES)}</span></p></li>' for _ in range(3))
+        return f'<ul class="list-paddingleft-1">{items}</ul>'
+    if kind < 0.32:
+        return '<pre><code>def hello():\n    print("你好")\n</code></pre>'
+    return (f'<p style="{style}"><span style="letter-spacing: 1px;">{text}</span>'
+            f'<a href="https://example.com/{rng.randint(1, 999)}">链接</a></p>')
+
+
+def make_fixture(name, paragraphs, images, seed=DEFAULT_SEED):
+    """生成一篇结构接近微信公众号文章的 HTML（相同参数生成的内容完全相同）"""
+    rng = random.Random(f'{seed}-{name}')
+    body = [_paragraph(rng) for _ in range(paragraphs)]
+    for i in range(images):
+        img = (f'<p style="text-align: center;"><img class="rich_pages wxw-img" data-ratio="0.75" '
+               f'data-src="https://mmbiz.qpic.cn/mmbiz_jpg/bench{i}/640?wx_fmt=jpeg" '
+               f'data-type="jpeg" data-w="1080" src="data:image/gif;base64,AAAA" alt="图{i}"></p>')
+        body.insert(rng.randint(0, len(body)), img)
+    body.append('<p class="qr_code_pc">长按识别二维码关注我们</p>')
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8">'
+        f'<title>基准测试 {name} - 微信公众号</title>'
+        '<meta property="article:published_time" content="2024-01-15T08:00:00Z">'
+        '<script>var msg_title = "bench";</script></head><body>'
+        '<div class="rich_media_inner"><div class="rich_media_area_primary">'
+        f'<h1 class="rich_media_title" id="activity-name">基准测试：{name}</h1>'
+        '<div class="rich_media_meta_list"><em id="publish_time" class="rich_media_meta rich_media_meta_text">2024年1月15日</em></div>'
+        '<div class="rich_media_content" id="js_content" style="visibility: hidden;">'
+        + ''.join(body) +
+        '</div><script>window.__bench = 1;</script></div></div></body></html>'
+    ).encode('utf-8')
+
+
+def generated_corpus(seed=DEFAULT_SEED):
+    return [(FIXTURE_HOST + name, make_fixture(name, paragraphs, images, seed))
+            for name, paragraphs, images in FIXTURE_PROFILES]
+
+
+def load_corpus(fixtures_dir=None, use_cache=False, seed=DEFAULT_SEED):
+    """返回 [(url, 原始 HTML 字节)]"""
+    corpus = []
+    if fixtures_dir:
+        for path in sorted(Path(fixtures_dir).glob('*.htm*')):
+            corpus.append((FIXTURE_HOST + path.stem, path.read_bytes()))
+    if use_cache:
+        corpus.extend(fast_extract.iter_cached_pages())
+    return corpus or generated_corpus(seed)
+
+
+def percentile(values, pct):
+    """线性插值的分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * pct / 100
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def peak_rss_mb():
+    """进程峰值常驻内存（MB），不支持的平台返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _extract(html, engine):
+    if engine == 'lxml' and fast_extract.AVAILABLE:
+        try:
+            return fast_extract.extract(html, fetcher.parse_date)
+        except fast_extract.ExtractError:
+            pass
+    return fetcher.extract_with_bs4(html)
+
+
+def usable(corpus, engine):
+    """去掉无法提取正文的页面（如保存下来的错误页），返回可用的样本"""
+    kept = []
+    for url, html in corpus:
+        try:
+            _extract(html, engine)
+        except ValueError as e:
+            print(f"⚠️  跳过样本 {url}: {e}")
+            continue
+        kept.append((url, html))
+    return kept
+
+
+def run(corpus, rounds=DEFAULT_ROUNDS, engine=fetcher.DEFAULT_ENGINE):
+    """对样本逐阶段计时，返回结果字典"""
+    pages = dict(corpus)
+    timings = {stage: [] for stage in STAGES}
+    per_fixture = {url: [] for url, _ in corpus}
+
+    def fake_fetch(url, offline=False):
+        return pages[url]
+
+    with tempfile.TemporaryDirectory() as tmp, mock.patch.object(fetcher, 'fetch_html', fake_fetch):
+        output_dir = Path(tmp)
+        # 预热：初始化转换器、编译正则
+        fetcher.extract_wechat_article(corpus[0][0], engine=engine)
+        gc.collect()
+
+        for _ in range(rounds):
+            for url, html in corpus:
+                start = time.perf_counter()
+                title, pub_date, content_html = _extract(html, engine)
+                t1 = time.perf_counter()
+                content = fetcher.html_to_markdown(content_html)
+                t2 = time.perf_counter()
+                fetcher.extract_summary(content)
+                t3 = time.perf_counter()
+                filepath = fetcher.save_article({'title': title, 'date': pub_date, 'content': content, 'url': url},
+                                                output_dir=output_dir)
+                t4 = time.perf_counter()
+                filepath.unlink()
+
+                t5 = time.perf_counter()
+                fetcher.extract_wechat_article(url, engine=engine)
+                t6 = time.perf_counter()
+
+                timings['extract'].append(t1 - start)
+                timings['convert'].append(t2 - t1)
+                timings['summary'].append(t3 - t2)
+                timings['save'].append(t4 - t3)
+                timings['end_to_end'].append(t6 - t5)
+                per_fixture[url].append(t4 - start)
+
+    total_bytes = sum(len(html) for _, html in corpus) * rounds
+    articles = len(corpus) * rounds
+    pipeline_time = sum(sum(timings[s]) for s in ('extract', 'convert', 'summary', 'save'))
+    stages = {}
+    for stage, values in timings.items():
+        total = sum(values)
+        stages[stage] = {
+            'p50_ms': percentile(values, 50) * 1000,
+            'p90_ms': percentile(values, 90) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+            'max_ms': max(values) * 1000,
+            'total_s': total,
+            'articles_per_s': articles / total if total else 0,
+            'mb_per_s': total_bytes / 1024 / 1024 / total if total else 0,
+        }
+    return {
+        'revision': git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'engine': engine,
+        'rounds': rounds,
+        'fixtures': [{'url': url, 'bytes': len(html), 'p50_ms': percentile(per_fixture[url], 50) * 1000}
+                     for url, html in corpus],
+        'input_mb': total_bytes / 1024 / 1024,
+        'articles': articles,
+        'articles_per_s': articles / pipeline_time if pipeline_time else 0,
+        'mb_per_s': total_bytes / 1024 / 1024 / pipeline_time if pipeline_time else 0,
+        'peak_rss_mb': peak_rss_mb(),
+        'stages': stages,
+    }
+
+
+def format_report(result, baseline=None):
+    """格式化结果；提供 baseline 时附上 p50 的变化比例"""
+    lines = [
+        f"版本 {result['revision'] or '-'}，引擎 {result['engine']}，{len(result['fixtures'])} 个样本 × "
+        f"{result['rounds']} 轮，输入共 {result['input_mb']:.1f} MB",
+        f"{'阶段':<12}{'p50(ms)':>10}{'p90(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}{'篇/s':>10}{'MB/s':>10}"
+        + (f"{'p50 变化':>10}" if baseline else ''),
+    ]
+    for stage, st in result['stages'].items():
+        line = (f"{stage:<12}{st['p50_ms']:>10.2f}{st['p90_ms']:>10.2f}{st['p99_ms']:>10.2f}{st['max_ms']:>10.2f}"
+                f"{st['articles_per_s']:>10.1f}{st['mb_per_s']:>10.2f}")
+        old = (baseline or {}).get('stages', {}).get(stage)
+        if old and old['p50_ms']:
+            line += f"{(st['p50_ms'] / old['p50_ms'] - 1) * 100:>+9.1f}%"
+        lines.append(line)
+    lines.append("各样本（提取到保存，p50）:")
+    for fixture in result['fixtures']:
+        lines.append(f"  {fixture['url']:<48}{fixture['bytes'] / 1024:>10.0f} KB{fixture['p50_ms']:>10.2f} ms")
+    lines.append(f"整体（提取+转换+摘要+保存）: {result['articles_per_s']:.1f} 篇/s，{result['mb_per_s']:.2f} MB/s")
+    if result['peak_rss_mb'] is not None:
+        lines.append(f"峰值内存: {result['peak_rss_mb']:.1f} MB")
+    if baseline:
+        lines.append(f"对比基准: 版本 {baseline.get('revision') or '-'}（{baseline.get('timestamp', '')}）")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='文章抓取与转换的离线基准测试')
+    parser.add_argument('--rounds', '-r', type=int, default=DEFAULT_ROUNDS,
+                        help=f'每个样本重复的轮数（默认为 {DEFAULT_ROUNDS}）')
+    parser.add_argument('--fixtures', help='使用目录中保存的 HTML 页面作为样本')
+    parser.add_argument('--cache', action='store_true', help='使用响应缓存中的页面作为样本')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='生成样本的随机种子')
+    parser.add_argument('--parser', choices=['lxml', 'bs4'], default=fetcher.DEFAULT_ENGINE,
+                        help='HTML 解析引擎（默认为 lxml）')
+    parser.add_argument('--output', '-o', help='把结果保存为 JSON 文件')
+    parser.add_argument('--compare', help='与之前保存的 JSON 结果对比')
+    args = parser.parse_args()
+
+    corpus = usable(load_corpus(args.fixtures, args.cache, args.seed), args.parser)
+    if not corpus:
+        parser.error('没有可用的样本页面')
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    result = run(corpus, rounds=args.rounds, engine=args.parser)
+    print(format_report(result, baseline))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量并发抓取工具
+使用线程池并发处理 URL 列表，支持全局并发上限和单个域名的并发上限，
+结果按输入顺序返回，保证输出和错误报告的顺序稳定
+"""
+
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+# 默认配置
+DEFAULT_CONCURRENCY = 1
+DEFAULT_PER_HOST = 4
+
+
+class HostLimiter:
+    """按域名限制并发数"""
+
+    def __init__(self, per_host=DEFAULT_PER_HOST):
+        self.per_host = per_host
+        self._lock = threading.Lock()
+        self._semaphores = defaultdict(lambda: threading.BoundedSemaphore(self.per_host))
+
+    def _semaphore(self, url):
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            return self._semaphores[host]
+
+    def run(self, url, func, *args, **kwargs):
+        """在该 URL 所属域名的并发名额内执行 func"""
+        if not self.per_host or self.per_host <= 0:
+            return func(*args, **kwargs)
+        with self._semaphore(url):
+            return func(*args, **kwargs)
+
+
+def run_batch(urls, worker, concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST, on_result=None):
+    """
+    并发执行 worker(url)，按输入顺序返回结果列表
+
+    worker 应自行捕获异常并返回结果字典；on_result(index, url, result)
+    会按输入顺序依次回调，便于顺序打印进度
+    """
+    urls = list(urls)
+    results = []
+
+    if concurrency <= 1:
+        for i, url in enumerate(urls, 1):
+            result = worker(url)
+            results.append(result)
+            if on_result:
+                on_result(i, url, result)
+        return results
+
+    limiter = HostLimiter(per_host)
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        futures = [executor.submit(limiter.run, url, worker, url) for url in urls]
+        # 按提交顺序收集结果，而不是按完成顺序
+        for i, (url, future) in enumerate(zip(urls, futures), 1):
+            result = future.result()
+            results.append(result)
+            if on_result:
+                on_result(i, url, result)
+    except BaseException:
+        # 中断（Ctrl-C）或回调出错时取消排队中的 URL，只等待正在处理的几个，不再跑完整个列表
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+
+    return results
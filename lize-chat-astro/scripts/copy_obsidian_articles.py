@@ -2,16 +2,36 @@
 # -*- coding: utf-8 -*-
 """
 从 Obsidian Vault 复制文章到项目
+增量同步：按修改时间和内容哈希比较源文件与目标文件，只转换和写入有变化的文件，
+未变化的目标文件不会被改写（修改时间不变，不会让 Astro 的构建缓存失效）。
+
+--watch 持续监听源目录：通过 watchdog 订阅文件系统事件（Linux 上为 inotify，Windows 上为
+ReadDirectoryChangesW），合并短时间内的连续保存后只同步被修改的文件。需要安装 watchdog，
+未安装时报错退出；--polling 显式改用轮询（只比较目录快照，用于不支持文件系统事件的网络盘等）
 """
 
+import argparse
+import json
+import os
 import shutil
+import threading
+import time
 from pathlib import Path
 import re
 from datetime import datetime
 
+from frontmatter_io import read_header, document_hash, write_document
+from fs_utils import atomic_write, file_hash
+
 # 源目录和目标目录
 SOURCE_DIR = Path(r"D:\Documents\Obsidian Vault\lizechat\lize-chat-astro\src\content\blog")
 TARGET_DIR = Path(__file__).parent.parent / "src" / "content" / "blog"
+STATE_FILE = Path(__file__).parent / ".cache" / "copy_state.json"
+STATE_VERSION = 2
+# --watch：最后一次文件事件之后等待的静默时间（编辑器保存时往往连续触发多个事件），以及 --polling 的轮询间隔
+DEFAULT_DEBOUNCE = 0.2
+DEFAULT_POLL_INTERVAL = 0.2
+WATCHDOG_MISSING = '--watch 需要 watchdog 订阅文件系统事件：pip install watchdog（或使用 --polling 改用轮询）'
 
 TARGET_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -23,120 +43,391 @@ def sanitize_filename(filename):
     return filename
 
 
-def ensure_frontmatter(content, filepath):
-    """确保文件有正确的 frontmatter"""
-    # 检查是否已有 frontmatter
-    if content.startswith('---'):
-        # 提取现有的 frontmatter
-        parts = content.split('---', 2)
-        if len(parts) >= 3:
-            frontmatter_text = parts[1].strip()
-            body = parts[2].strip()
-            
-            # 解析 frontmatter
-            frontmatter = {}
-            for line in frontmatter_text.split('\n'):
-                if ':' in line:
-                    key, value = line.split(':', 1)
-                    key = key.strip()
-                    value = value.strip().strip('"').strip("'")
-                    frontmatter[key] = value
-            
-            # 确保有必需的字段
-            if 'pubDate' not in frontmatter and 'date' not in frontmatter:
-                # 尝试从文件名或内容中提取日期，否则使用当前日期
-                frontmatter['pubDate'] = datetime.now().strftime('%Y-%m-%d')
-            elif 'date' in frontmatter:
-                # 将 date 转换为 pubDate（blog 集合使用 pubDate）
-                frontmatter['pubDate'] = frontmatter.pop('date')
-            
-            # 重新生成 frontmatter
-            new_frontmatter_lines = ['---']
-            for key, value in frontmatter.items():
-                if isinstance(value, str) and (' ' in value or ':' in value):
-                    new_frontmatter_lines.append(f'{key}: "{value}"')
-                else:
-                    new_frontmatter_lines.append(f'{key}: {value}')
-            new_frontmatter_lines.append('---')
-            
-            return '\n\n'.join(['\n'.join(new_frontmatter_lines), body])
-    
-    # 如果没有 frontmatter，从文件名生成
-    filename = filepath.stem
-    title = filename
-    
-    # 生成默认 frontmatter
-    frontmatter = f"""---
-title: "{title}"
-pubDate: {datetime.now().strftime('%Y-%m-%d')}
----
+def ensure_fields(frontmatter):
+    """确保有必需的字段"""
+    if 'pubDate' not in frontmatter and 'date' not in frontmatter:
+        # 尝试从文件名或内容中提取日期，否则使用当前日期
+        frontmatter['pubDate'] = datetime.now().strftime('%Y-%m-%d')
+    elif 'date' in frontmatter:
+        # 将 date 转换为 pubDate（blog 集合使用 pubDate）
+        frontmatter['pubDate'] = frontmatter.pop('date')
+    return frontmatter
+
+
+def prepare_document(source_file):
+    """
+    读取源文件的头部，返回要写入的 (字段, 正文)：正文为源文件的 Header，写入时按字节范围复制
+
+    没有 frontmatter 时从文件名生成标题，整个文件作为正文
+    """
+    header = read_header(source_file)
+    if not header.has_frontmatter:
+        fields = {'title': source_file.stem, 'pubDate': datetime.now().strftime('%Y-%m-%d')}
+        return fields, header
+    return ensure_fields(header.fields), header
+
+
+def _stat(path):
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+def load_state(path=STATE_FILE):
+    """读取上次同步记录的 源文件名 -> {target, source_mtime, source_size, source_sha256, target_mtime, target_size, target_sha256}"""
+    try:
+        data = json.loads(Path(path).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+    return data.get('files', {}) if data.get('version') == STATE_VERSION else {}
+
+
+def save_state(files, path=STATE_FILE):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write(path, json.dumps({'version': STATE_VERSION, 'files': files}, ensure_ascii=False))
+
+
+def _target_unchanged(target_file, entry):
+    """目标文件仍是上次写入的内容（按修改时间和大小判断，不读取文件）"""
+    return target_file.exists() and _stat(target_file) == (entry['target_mtime'], entry['target_size'])
+
+
+def plan_file(source_file, target_dir, entry=None):
+    """
+    比较单个源文件与目标文件，返回同步计划：
+    {'action': 'create'|'update'|'unchanged', 'source', 'target', 'document', 'entry'}
+
+    源文件和目标文件的修改时间、大小都与上次记录相同时不读取任何文件；
+    修改时间变了但内容哈希相同时不改写；document 为 (字段, 正文)，只有内容确实变化时才需要写入
+    """
+    target_filename = sanitize_filename(source_file.name)
+    target_file = target_dir / target_filename
+    source_mtime, source_size = _stat(source_file)
+    plan = {'action': 'unchanged', 'source': source_file, 'target': target_file, 'document': None, 'entry': entry}
+
+    if entry and entry['target'] == target_filename and _target_unchanged(target_file, entry):
+        if (source_mtime, source_size) == (entry['source_mtime'], entry['source_size']):
+            return plan
+        source_hash = file_hash(source_file)
+        if source_hash == entry['source_sha256']:
+            plan['entry'] = dict(entry, source_mtime=source_mtime, source_size=source_size)
+            return plan
+    else:
+        source_hash = file_hash(source_file)
+
+    document = prepare_document(source_file)
+    content_hash = document_hash(*document)
+    plan['entry'] = {
+        'target': target_filename,
+        'source_mtime': source_mtime,
+        'source_size': source_size,
+        'source_sha256': source_hash,
+        'target_sha256': content_hash,
+    }
+    if target_file.exists() and file_hash(target_file) == content_hash:
+        # 目标文件内容已经一致（如首次运行或状态丢失），只补记状态，不改写
+        plan['entry']['target_mtime'], plan['entry']['target_size'] = _stat(target_file)
+        return plan
+    plan['action'] = 'update' if target_file.exists() else 'create'
+    plan['document'] = document
+    return plan
+
+
+def plan_sync(source_dir, target_dir, state):
+    """
+    生成整个目录的同步计划，返回 (计划列表, 源文件已删除的 [(源文件名, 目标文件)], 错误列表)
+
+    只有上次同步过来、且源文件已不存在的目标文件才会列为已删除
+    """
+    plans = []
+    errors = []
+    for source_file in sorted(source_dir.glob("*.md")):
+        try:
+            plans.append(plan_file(source_file, target_dir, state.get(source_file.name)))
+        except Exception as e:
+            errors.append((source_file.name, str(e)))
+    sources = {p['source'].name for p in plans} | {name for name, _ in errors}
+    removed = []
+    for name, entry in state.items():
+        if name not in sources:
+            target_file = target_dir / entry['target']
+            if target_file.exists():
+                removed.append((name, target_file))
+    return plans, removed, errors
 
-"""
-    
-    return frontmatter + content
 
+def apply_plan(plan):
+    """写入一个文件（头部和正文直接写入，原子替换），返回新的状态记录"""
+    digest = write_document(plan['target'], *plan['document'])
+    # 正文在写入时才从源文件读取，以实际写入的内容为准
+    entry = dict(plan['entry'], target_sha256=digest)
+    entry['target_mtime'], entry['target_size'] = _stat(plan['target'])
+    return entry
 
-def copy_articles():
-    """复制文章文件"""
-    if not SOURCE_DIR.exists():
-        print(f"[ERROR] 源目录不存在: {SOURCE_DIR}")
+
+def copy_articles(source_dir=SOURCE_DIR, target_dir=TARGET_DIR, delete=False, dry_run=False,
+                  full=False, state_file=STATE_FILE, verbose=False):
+    """增量同步文章文件：只转换和写入有变化的文件"""
+    source_dir = Path(source_dir)
+    target_dir = Path(target_dir)
+    if not source_dir.exists():
+        print(f"[ERROR] 源目录不存在: {source_dir}")
         return
     
-    files = list(SOURCE_DIR.glob("*.md"))
+    files = list(source_dir.glob("*.md"))
     
     if not files:
         print(f"[ERROR] 源目录中没有找到 Markdown 文件")
         return
     
-    print(f"源目录: {SOURCE_DIR}")
-    print(f"目标目录: {TARGET_DIR}")
+    start = time.perf_counter()
+    print(f"源目录: {source_dir}")
+    print(f"目标目录: {target_dir}")
     print(f"找到 {len(files)} 个文件\n")
     
-    copied = []
-    skipped = []
-    errors = []
+    state = {} if full else load_state(state_file)
+    plans, removed, errors = plan_sync(source_dir, target_dir, state)
     
-    for source_file in files:
+    labels = {'create': '新增', 'update': '更新'}
+    changed = [p for p in plans if p['action'] != 'unchanged']
+    if dry_run:
+        print("[DRY RUN] 同步计划（不会写入任何文件）:")
+    new_state = {}
+    copied = []
+    for plan in plans:
+        name = plan['source'].name
+        if plan['action'] == 'unchanged':
+            new_state[name] = plan['entry']
+            if verbose:
+                print(f"[SKIP] 未变化: {plan['target'].name}")
+            continue
+        if dry_run:
+            print(f"[{labels[plan['action']]}] {plan['target'].name}")
+            continue
         try:
-            # 读取文件内容
-            content = source_file.read_text(encoding='utf-8')
-            
-            # 确保有正确的 frontmatter
-            content = ensure_frontmatter(content, source_file)
-            
-            # 目标文件名
-            target_filename = sanitize_filename(source_file.name)
-            target_file = TARGET_DIR / target_filename
-            
-            # 如果文件已存在，询问是否覆盖（这里直接覆盖）
-            if target_file.exists():
-                print(f"[!] 文件已存在，将覆盖: {target_filename}")
-            
-            # 写入目标文件
-            target_file.write_text(content, encoding='utf-8')
-            
-            copied.append(target_filename)
-            print(f"[OK] 已复制: {target_filename}")
-            
+            new_state[name] = apply_plan(plan)
+            copied.append(plan['target'].name)
+            print(f"[OK] 已{labels[plan['action']]}: {plan['target'].name}")
         except Exception as e:
-            errors.append((source_file.name, str(e)))
-            print(f"[ERROR] 复制失败 {source_file.name}: {str(e)}")
+            errors.append((name, str(e)))
+            print(f"[ERROR] 复制失败 {name}: {str(e)}")
+    
+    deleted = []
+    orphaned = []
+    for name, target_file in removed:
+        if not delete:
+            # 未同步删除的目标文件继续保留记录，之后使用 --delete 时仍可删除
+            new_state[name] = state[name]
+            orphaned.append(target_file)
+        elif dry_run:
+            print(f"[删除] {target_file.name}")
+        else:
+            target_file.unlink()
+            print(f"[OK] 已删除: {target_file.name}")
+        deleted.append(target_file.name)
+    
+    if not dry_run:
+        save_state(new_state, state_file)
     
     # 打印总结
     print("\n" + "="*60)
-    print("复制完成！")
+    print("同步计划生成完成（未写入）" if dry_run else "复制完成！")
     print("="*60)
-    print(f"成功: {len(copied)}")
+    unchanged = len(plans) - len(changed)
+    print(f"{'待写入' if dry_run else '成功'}: {len(changed) if dry_run else len(copied)}，"
+          f"未变化: {unchanged}，{'待删除' if dry_run else '已删除'}: {len(deleted) - len(orphaned)}")
+    if orphaned:
+        print(f"源文件已删除的文章 {len(orphaned)} 篇（使用 --delete 同步删除）:")
+        for target_file in orphaned:
+            print(f"  - {target_file.name}")
     if errors:
         print(f"失败: {len(errors)}")
         for filename, error in errors:
             print(f"  - {filename}: {error}")
+    print(f"耗时: {time.perf_counter() - start:.2f}s")
+
+
+class _ChangeCollector:
+    """
+    收集被修改的 .md 文件名，供监听循环在静默一段时间后统一同步
+
+    watchdog 只调用事件处理器的 dispatch()，不需要继承 FileSystemEventHandler，watchdog 因此只在 --watch 时导入
+    """
+
+    def __init__(self, source_dir):
+        self.source_dir = Path(source_dir).resolve()
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.first_event = None
+        self.last_event = None
+        self.wakeup = threading.Event()
+
+    def add(self, path):
+        path = Path(path)
+        if path.suffix != '.md' or path.parent.resolve() != self.source_dir:
+            return
+        now = time.monotonic()
+        with self.lock:
+            self.pending.add(path.name)
+            self.first_event = self.first_event or now
+            self.last_event = now
+        self.wakeup.set()
+
+    def dispatch(self, event):
+        if event.is_directory:
+            return
+        self.add(event.src_path)
+        # 编辑器常见的保存方式是写临时文件再改名，目标文件名在 dest_path 中
+        if getattr(event, 'dest_path', None):
+            self.add(event.dest_path)
+
+    def take(self):
+        """取出已收集的文件名和第一个事件的时间"""
+        with self.lock:
+            names, first = self.pending, self.first_event
+            self.pending, self.first_event, self.last_event = set(), None, None
+            self.wakeup.clear()
+        return names, first
+
+
+def _snapshot(source_dir):
+    snapshot = {}
+    with os.scandir(source_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith('.md') and entry.is_file():
+                st = entry.stat()
+                snapshot[entry.name] = (st.st_mtime_ns, st.st_size)
+    return snapshot
+
+
+def _poll(source_dir, collector, interval, stop):
+    """轮询模式：定期比较目录快照（只 stat，不读取文件内容）"""
+    previous = _snapshot(source_dir)
+    while not stop.wait(interval):
+        current = _snapshot(source_dir)
+        for name in set(previous) | set(current):
+            if previous.get(name) != current.get(name):
+                collector.add(source_dir / name)
+        previous = current
+
+
+def sync_files(names, source_dir, target_dir, state, delete=False):
+    """只同步指定的源文件（新增、修改或删除），更新 state，返回处理的条数"""
+    done = 0
+    for name in sorted(names):
+        source_file = source_dir / name
+        try:
+            if source_file.exists():
+                plan = plan_file(source_file, target_dir, state.get(name))
+                if plan['action'] == 'unchanged':
+                    state[name] = plan['entry']
+                    continue
+                state[name] = apply_plan(plan)
+                print(f"[{time.strftime('%H:%M:%S')}] [OK] 已{'新增' if plan['action'] == 'create' else '更新'}: "
+                      f"{plan['target'].name}")
+            elif name in state:
+                target_file = target_dir / state[name]['target']
+                if not delete:
+                    print(f"[{time.strftime('%H:%M:%S')}] [!] 源文件已删除（使用 --delete 同步删除）: {name}")
+                    continue
+                target_file.unlink(missing_ok=True)
+                del state[name]
+                print(f"[{time.strftime('%H:%M:%S')}] [OK] 已删除: {target_file.name}")
+            else:
+                continue
+            done += 1
+        except Exception as e:
+            print(f"[{time.strftime('%H:%M:%S')}] [ERROR] 同步失败 {name}: {str(e)}")
+    return done
+
+
+def watch(source_dir=SOURCE_DIR, target_dir=TARGET_DIR, delete=False, state_file=STATE_FILE,
+          debounce=DEFAULT_DEBOUNCE, poll_interval=DEFAULT_POLL_INTERVAL, force_polling=False):
+    """
+    先做一次增量同步，然后持续监听源目录，只同步被修改的文件，直到按 Ctrl+C
+
+    未安装 watchdog 时抛出 ImportError（不会悄悄退回轮询）；force_polling=True 时使用轮询
+    """
+    source_dir = Path(source_dir)
+    target_dir = Path(target_dir)
+    Observer = None
+    if not force_polling:
+        try:
+            from watchdog.observers import Observer
+        except ImportError as e:
+            raise ImportError(WATCHDOG_MISSING) from e
+    copy_articles(source_dir, target_dir, delete=delete, state_file=state_file)
+    if not source_dir.exists():
+        return
+    
+    collector = _ChangeCollector(source_dir)
+    stop = threading.Event()
+    observer = None
+    if Observer is not None:
+        observer = Observer()
+        observer.schedule(collector, str(source_dir), recursive=False)
+        observer.start()
+        print(f"\n👀 正在监听 {source_dir}（文件系统事件），按 Ctrl+C 退出")
+    else:
+        threading.Thread(target=_poll, args=(source_dir, collector, poll_interval, stop), daemon=True).start()
+        print(f"\n👀 正在监听 {source_dir}（每 {poll_interval:g}s 轮询一次），按 Ctrl+C 退出")
     
-    if copied:
-        print("\n已复制的文件:")
-        for filename in copied:
-            print(f"  [OK] {filename}")
+    state = load_state(state_file)
+    try:
+        while True:
+            # 空闲时阻塞等待，不占用 CPU（带超时，Windows 上才能响应 Ctrl+C）
+            if not collector.wakeup.wait(timeout=1.0):
+                continue
+            # 等到最后一个事件之后静默 debounce 秒，合并同一次保存触发的多个事件
+            while True:
+                with collector.lock:
+                    remaining = collector.last_event + debounce - time.monotonic() if collector.last_event else 0
+                if remaining <= 0:
+                    break
+                time.sleep(remaining)
+            names, first = collector.take()
+            done = sync_files(names, source_dir, target_dir, state, delete=delete) if names else 0
+            if done:
+                save_state(state, state_file)
+                print(f"           同步 {done} 个文件，距首次修改 {time.monotonic() - first:.2f}s")
+    except KeyboardInterrupt:
+        print("\n已停止监听")
+    finally:
+        stop.set()
+        if observer is not None:
+            observer.stop()
+            observer.join()
+        save_state(state, state_file)
 
 
 if __name__ == '__main__':
-    copy_articles()
+    parser = argparse.ArgumentParser(description='从 Obsidian Vault 增量同步文章到项目')
+    parser.add_argument('--source', '-s', default=str(SOURCE_DIR), help='源目录（Obsidian 中的 blog 目录）')
+    parser.add_argument('--target', default=str(TARGET_DIR), help='目标目录（默认为 src/content/blog）')
+    parser.add_argument('--delete', action='store_true', help='删除源目录中已不存在的文章（只删除之前同步过来的文件）')
+    parser.add_argument('--dry-run', '-n', action='store_true', help='只打印同步计划，不写入或删除任何文件')
+    parser.add_argument('--full', action='store_true', help='忽略上次同步的记录，重新比较所有文件')
+    parser.add_argument('--state', default=str(STATE_FILE), help='同步状态文件（默认为 scripts/.cache/copy_state.json）')
+    parser.add_argument('--verbose', '-v', action='store_true', help='同时列出未变化的文件')
+    parser.add_argument('--watch', '-w', action='store_true', help='持续监听源目录，文件保存后自动同步')
+    parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE,
+                        help=f'--watch 时合并连续保存的静默时间，单位秒（默认为 {DEFAULT_DEBOUNCE}）')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help=f'--polling 时的轮询间隔，单位秒（默认为 {DEFAULT_POLL_INTERVAL}）')
+    parser.add_argument('--polling', action='store_true',
+                        help='--watch 时改用轮询（不需要 watchdog，用于不支持文件系统事件的目录）')
+    args = parser.parse_args()
+    if args.watch:
+        if args.dry_run:
+            parser.error('--watch 不能与 --dry-run 同时使用')
+        if args.poll_interval <= 0:
+            parser.error('--poll-interval 必须大于 0')
+        if not args.polling:
+            from importlib.util import find_spec
+            if find_spec('watchdog') is None:
+                parser.error(WATCHDOG_MISSING)
+        watch(args.source, args.target, delete=args.delete, state_file=args.state, debounce=args.debounce,
+              poll_interval=args.poll_interval, force_polling=args.polling)
+    else:
+        copy_articles(args.source, args.target, delete=args.delete, dry_run=args.dry_run, full=args.full,
+                      state_file=args.state, verbose=args.verbose)
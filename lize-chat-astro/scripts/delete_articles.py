@@ -2,77 +2,271 @@
 # -*- coding: utf-8 -*-
 """
 删除文章脚本
+除了按文件名删除，还可以按条件批量删除：日期范围、标题正则、标签、来源 URL（查导入清单）、
+与某篇文章重复。条件在 article_index.py 的元数据索引上匹配，不重新读取未变化的文件；
+匹配到的文章先全部列出，确认一次后批量删除，--dry-run 只列出不删除
 """
 
-from pathlib import Path
+import argparse
+import re
 import sys
+from pathlib import Path
 
-BLOG_DIR = Path(__file__).parent.parent / "src" / "content" / "blog"
-DIALOGUE_DIR = Path(__file__).parent.parent / "src" / "content" / "dialogue"
+from article_index import load_index, sort_date, day_arg, COLLECTIONS, INDEX_FILE
+from import_manifest import ImportManifest, MANIFEST_FILE
 
+BLOG_DIR = COLLECTIONS['blog']
+DIALOGUE_DIR = COLLECTIONS['dialogue']
 
-def delete_articles(filenames):
-    """删除指定的文章文件"""
-    deleted = []
+
+def find_by_name(index, filename):
+    """按文件名查找索引条目：可以写成 blog/xxx.md，否则依次在 blog、dialogue 中查找"""
+    if '/' in filename:
+        return index.entries.get(filename)
+    for collection in index.collections:
+        entry = index.entries.get(f"{collection}/{filename}")
+        if entry:
+            return entry
+    return None
+
+
+def _same_file(a, b):
+    return Path(a).resolve() == Path(b).resolve()
+
+
+def find_by_url(index, manifest, url):
+    """按来源 URL 查导入清单，返回对应文章的索引条目（未导入或文件已删除时返回 None）"""
+    record = manifest.lookup(url)
+    if record is None:
+        return None
+    filepath = manifest.resolve(record)
+    for collection in index.collections:
+        entry = index.entries.get(f"{collection}/{filepath.name}")
+        if entry and _same_file(entry['path'], filepath):
+            return entry
+    return None
+
+
+def _title_key(title):
+    """比较标题时忽略空白和大小写"""
+    return re.sub(r'\s+', '', str(title or '')).lower()
+
+
+def find_duplicates(index, manifest, original):
+    """
+    与 original 重复的文章（不含 original 本身）：同一集合中标题相同的文章，
+    以及导入清单中正文哈希与 original 相同的文章（同一篇文章以不同 URL 导入）
+    """
+    title = _title_key(original['fields'].get('title'))
+    paths = {}
+    for entry in index.entries.values():
+        if entry['collection'] == original['collection'] and title and _title_key(entry['fields'].get('title')) == title:
+            paths[Path(entry['path']).resolve()] = entry
+
+    if manifest is not None:
+        by_file = {}
+        for record in manifest:
+            by_file.setdefault(manifest.resolve(record).resolve(), []).append(record)
+        digests = {r['sha256'] for r in by_file.get(Path(original['path']).resolve(), [])}
+        if digests:
+            entries = {Path(e['path']).resolve(): e for e in index.entries.values()}
+            for filepath, records in by_file.items():
+                if filepath in entries and any(r['sha256'] in digests for r in records):
+                    paths[filepath] = entries[filepath]
+
+    paths.pop(Path(original['path']).resolve(), None)
+    return list(paths.values())
+
+
+def select_articles(index, names=(), collection=None, since=None, until=None, title=None, tag=None,
+                    urls=(), duplicate_of=None, manifest=None):
+    """
+    在索引上解析删除目标，返回 (条目列表, 未找到的文件名和 URL 列表)
+
+    按文件名指定的文章与条件查询的结果合并；条件之间为“且”的关系，
+    没有给出任何条件时只删除按文件名指定的文章（collection 只限定条件查询的范围，本身不是条件）
+    """
+    selected = {}
     not_found = []
-    
-    for filename in filenames:
-        # 尝试在 blog 目录查找
-        blog_file = BLOG_DIR / filename
-        dialogue_file = DIALOGUE_DIR / filename
-        
-        if blog_file.exists():
-            blog_file.unlink()
-            deleted.append(('blog', filename))
-            print(f"✅ 已删除: blog/{filename}")
-        elif dialogue_file.exists():
-            dialogue_file.unlink()
-            deleted.append(('dialogue', filename))
-            print(f"✅ 已删除: dialogue/{filename}")
+    for name in names:
+        entry = find_by_name(index, name)
+        if entry:
+            selected[entry['path']] = entry
         else:
-            not_found.append(filename)
-            print(f"❌ 未找到: {filename}")
-    
+            not_found.append(name)
+
+    has_query = any([since, until, title, tag, urls, duplicate_of])
+    if not has_query:
+        return list(selected.values()), not_found
+
+    matches = index.query(collection=collection, since=since, until=until, title=title, tag=tag)
+    if urls:
+        by_url = {}
+        for url in urls:
+            entry = find_by_url(index, manifest, url)
+            if entry:
+                by_url[entry['path']] = entry
+            else:
+                not_found.append(url)
+        matches = [e for e in matches if e['path'] in by_url]
+    if duplicate_of:
+        original = find_by_name(index, duplicate_of)
+        if original is None:
+            not_found.append(duplicate_of)
+            matches = []
+        else:
+            duplicates = {e['path'] for e in find_duplicates(index, manifest, original)}
+            matches = [e for e in matches if e['path'] in duplicates]
+    for entry in matches:
+        selected[entry['path']] = entry
+    return list(selected.values()), not_found
+
+
+def delete_entries(entries, manifest=None):
+    """删除文件；同时从导入清单中删除对应的记录，返回 (已删除条目, 失败列表)"""
+    records = {}
+    if manifest is not None:
+        for record in manifest:
+            records.setdefault(manifest.resolve(record).resolve(), []).append(record)
+
+    deleted = []
+    failed = []
+    for entry in entries:
+        filepath = Path(entry['path'])
+        label = f"{entry['collection']}/{filepath.name}"
+        try:
+            filepath.unlink()
+        except FileNotFoundError:
+            failed.append((label, '文件不存在'))
+            print(f"❌ 未找到: {label}")
+            continue
+        except OSError as e:
+            failed.append((label, str(e)))
+            print(f"❌ 删除失败 {label}: {e}")
+            continue
+        for record in records.get(filepath.resolve(), []):
+            manifest.forget(record['url'])
+        deleted.append(entry)
+        print(f"✅ 已删除: {label}")
+    return deleted, failed
+
+
+def delete_articles(filenames):
+    """删除指定的文章文件，返回 (已删除的 [(集合, 文件名)], 未找到的文件名)"""
+    index = load_index()
+    entries, not_found = select_articles(index, names=filenames)
+    for filename in not_found:
+        print(f"❌ 未找到: {filename}")
+    deleted, failed = delete_entries(entries)
+    not_found += [label for label, _ in failed]
+    index.refresh()
+
     print(f"\n删除完成: 成功 {len(deleted)} 个，未找到 {len(not_found)} 个")
-    return deleted, not_found
+    return [(e['collection'], Path(e['path']).name) for e in deleted], not_found
+
+
+def print_entries(entries):
+    for entry in sorted(entries, key=lambda e: (e['collection'], sort_date(e['fields']), e['path'])):
+        fields = entry['fields']
+        print(f"  - {entry['collection']}/{Path(entry['path']).name}"
+              f"  [{sort_date(fields)[:10] or '未知日期'}] {fields.get('title', '未命名')}")
 
 
 def list_all_articles():
     """列出所有文章供参考"""
     print("\n当前所有文章:")
-    blog_files = list(BLOG_DIR.glob("*.md"))
-    dialogue_files = list(DIALOGUE_DIR.glob("*.md"))
-    
+    index = load_index()
+    blog_files = index.query(collection='blog', sort='name')
+    dialogue_files = index.query(collection='dialogue', sort='name')
+
     if blog_files:
         print("\n📝 Blog 文章:")
-        for f in blog_files:
-            print(f"  - {f.name}")
-    
+        for entry in blog_files:
+            print(f"  - {Path(entry['path']).name}")
+
     if dialogue_files:
         print("\n💬 Dialogue 文章:")
-        for f in dialogue_files:
-            print(f"  - {f.name}")
-    
+        for entry in dialogue_files:
+            print(f"  - {Path(entry['path']).name}")
+
     if not blog_files and not dialogue_files:
         print("  (无文章)")
 
 
+def confirm(count):
+    try:
+        answer = input(f"\n确认删除以上 {count} 篇文章？[y/N] ")
+    except EOFError:
+        return False
+    return answer.strip().lower() in ('y', 'yes')
+
+
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print("使用方法:")
-        print("  python delete_articles.py <文件名1> [文件名2] ...")
+    parser = argparse.ArgumentParser(
+        description='删除文章：按文件名，或按条件批量删除',
+        epilog='示例: python delete_articles.py --since 2024-01-01 --until 2024-01-31 --title "测试" --dry-run')
+    parser.add_argument('filenames', nargs='*', help='要删除的文件名（可写成 blog/xxx.md）')
+    parser.add_argument('--collection', choices=list(COLLECTIONS),
+                        help='只在一个集合中查询（只限定条件查询的范围，需要同时给出至少一个条件）')
+    parser.add_argument('--since', type=day_arg, help='日期在该日期及之后（YYYY-MM-DD）')
+    parser.add_argument('--until', type=day_arg, help='日期在该日期及之前（YYYY-MM-DD）')
+    parser.add_argument('--title', help='标题匹配正则表达式（不区分大小写）')
+    parser.add_argument('--tag', help='包含该标签')
+    parser.add_argument('--url', action='append', default=[], help='来源 URL（查导入清单，可重复指定）')
+    parser.add_argument('--duplicate-of', metavar='FILE', help='与该文章重复（标题相同或导入时正文相同）的其他文章')
+    parser.add_argument('--dry-run', '-n', action='store_true', help='只列出匹配的文章，不删除')
+    parser.add_argument('--yes', '-y', action='store_true', help='不询问确认')
+    parser.add_argument('--rebuild', action='store_true', help=f'重建元数据索引（{INDEX_FILE}）')
+    parser.add_argument('--manifest', default=str(MANIFEST_FILE), help='导入清单（默认为 scripts/.cache/import_manifest.jsonl）')
+    args = parser.parse_args()
+    if args.title:
+        try:
+            re.compile(args.title)
+        except re.error as e:
+            parser.error(f"无效的标题正则表达式: {e}")
+
+    if args.since and args.until and args.since > args.until:
+        parser.error(f"--since {args.since} 晚于 --until {args.until}")
+
+    query = dict(since=args.since, until=args.until, title=args.title, tag=args.tag,
+                 urls=args.url, duplicate_of=args.duplicate_of)
+    if args.collection and not any(query.values()):
+        # 只给集合不是一个查询：不会删除整个集合，也不会限定按文件名指定的文章
+        parser.error('--collection 只限定条件查询的范围，需要同时给出 --since、--until、--title、--tag、--url 或 --duplicate-of')
+    if not args.filenames and not any(query.values()):
+        parser.print_usage()
         print("\n示例:")
         print("  python delete_articles.py first-conversation.md second-conversation.md")
-        print()
+        print("  python delete_articles.py --title \"^测试\" --dry-run")
+        print("  python delete_articles.py --duplicate-of 文章标题.md")
         list_all_articles()
         sys.exit(1)
-    
-    filenames = sys.argv[1:]
-    print(f"准备删除 {len(filenames)} 个文件...")
-    deleted, not_found = delete_articles(filenames)
-    
+
+    index = load_index(rebuild=args.rebuild)
+    manifest = ImportManifest(args.manifest)
+    entries, not_found = select_articles(index, names=args.filenames, collection=args.collection,
+                                         manifest=manifest, **query)
+
     if not_found:
-        print("\n未找到的文件:")
-        for f in not_found:
-            print(f"  - {f}")
-        print("\n提示: 运行 'python list_articles.py' 查看所有文章")
+        print("未找到:")
+        for name in not_found:
+            print(f"  - {name}")
+        print("\n提示: 运行 'python list_articles.py' 查看所有文章\n")
+    if not entries:
+        print("没有匹配的文章")
+        sys.exit(0 if not not_found else 1)
+
+    print(f"匹配到 {len(entries)} 篇文章:")
+    print_entries(entries)
+    if args.dry_run:
+        print("\n[DRY RUN] 未删除任何文件")
+        sys.exit(0)
+    if not args.yes and not confirm(len(entries)):
+        print("已取消")
+        sys.exit(1)
+
+    print()
+    deleted, failed = delete_entries(entries, manifest)
+    index.refresh()
+    manifest.compact()
+    print(f"\n删除完成: 成功 {len(deleted)} 个，失败 {len(failed)} 个，未找到 {len(not_found)} 个")
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基于 lxml 的快速文章提取
+只解析一次 HTML，用一个预编译的 XPath 联合查询一次性取出标题、发布日期和正文的所有候选元素，
+再按与 BeautifulSoup 版本相同的选择器优先级挑选，结果与原实现保持一致。
+
+用法（对比两种解析方式的输出是否一致）：
+    python fast_extract.py --parity page1.html page2.html
+    python fast_extract.py --parity --cache       # 检查响应缓存中的全部页面
+"""
+
+import re
+import sys
+from datetime import datetime
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # pragma: no cover - lxml 未安装时调用方回退到 BeautifulSoup
+    lxml = None
+    etree = None
+
+AVAILABLE = etree is not None
+
+
+class ExtractError(ValueError):
+    """快速提取失败（调用方应回退到 BeautifulSoup）"""
+
+
+if AVAILABLE:
+    _PARSER = lxml.html.HTMLParser(encoding='utf-8', remove_comments=True)
+
+    # 标题、日期、正文的所有候选元素，按文档顺序返回
+    _CANDIDATES = etree.XPath(
+        "//h1 | //title"
+        " | //*[@id='publish_time' or @id='js_content']"
+        " | //*[contains(@class, 'publish_time') or contains(@class, 'rich_media_meta_text')"
+        "      or contains(@class, 'rich_media_content') or contains(@class, 'article-content')]"
+        " | //div[contains(@id, 'content') or contains(@class, 'content')]"
+        " | //article"
+        " | //meta[@property='article:published_time']",
+        smart_strings=False,
+    )
+    # 与 BeautifulSoup get_text() 一致：不包含 script/style/template 中的文本
+    _TEXT = etree.XPath(
+        "descendant::text()[not(parent::script or parent::style or parent::template)]",
+        smart_strings=False,
+    )
+    _FALLBACK_DIVS = etree.XPath("//div[@class]")
+    _JUNK = etree.XPath(".//script | .//style | .//iframe | .//noscript")
+    _CLASSED = etree.XPath(".//*[@class]")
+    _LAZY_IMAGES = etree.XPath(".//img[@data-src]")
+
+
+def _classes(elem):
+    return elem.get('class', '').split()
+
+
+def _is(tag=None, id_=None, cls=None):
+    """生成与简单 CSS 选择器（tag#id.class）等价的判断函数"""
+    def match(elem):
+        if tag and elem.tag != tag:
+            return False
+        if id_ and elem.get('id') != id_:
+            return False
+        if cls and cls not in _classes(elem):
+            return False
+        return True
+    return match
+
+
+# 选择器优先级与 fetch_wechat_article_enhanced.extract_with_bs4 完全相同
+TITLE_SELECTORS = [
+    _is('h1', id_='activity-name'),                        # h1#activity-name
+    _is('h1', cls='rich_media_title'),                     # h1.rich_media_title
+    _is('h1', id_='activity-name', cls='rich_media_title'),  # h1.rich_media_title#activity-name
+    _is('h1'),                                             # h1
+    _is('title'),                                          # title
+]
+
+DATE_SELECTORS = [
+    _is(id_='publish_time'),                         # #publish_time
+    _is(cls='publish_time'),                         # .publish_time
+    _is('em', id_='publish_time'),                   # em#publish_time
+    _is('em', cls='rich_media_meta_text'),           # em.rich_media_meta_text
+    _is('span', id_='publish_time'),                 # span#publish_time
+    _is('div', cls='rich_media_meta_text'),          # div.rich_media_meta_text
+]
+
+CONTENT_SELECTORS = [
+    _is(id_='js_content'),                                         # #js_content
+    _is(cls='rich_media_content'),                                 # .rich_media_content
+    lambda e: e.tag == 'div' and 'content' in e.get('id', ''),     # div[id*="content"]
+    lambda e: e.tag == 'div' and 'content' in e.get('class', ''),  # div[class*="content"]
+    _is('article'),                                                # article
+    _is('div', cls='article-content'),                             # div.article-content
+]
+
+_META_DATE = _is('meta')
+
+TITLE_SUFFIX_WECHAT = re.compile(r'\s*[-|]\s*.*微信公众号.*$', re.IGNORECASE)
+TITLE_SUFFIX = re.compile(r'\s*[-|]\s*.*$')
+FALLBACK_CLASS = re.compile(r'content|article|text|rich')
+JUNK_CLASS = re.compile(r'qr|code|ad|advertisement|promotion')
+
+
+def get_text(elem):
+    """等价于 BeautifulSoup 的 get_text(strip=True)"""
+    return ''.join(part.strip() for part in _TEXT(elem))
+
+
+def _first_matches(candidates, selectors):
+    """对每个选择器找出文档顺序中第一个匹配的元素"""
+    found = [None] * len(selectors)
+    for elem in candidates:
+        for i, match in enumerate(selectors):
+            if found[i] is None and match(elem):
+                found[i] = elem
+    return found
+
+
+def extract(html, parse_date):
+    """
+    从原始 HTML 提取 (标题, 发布日期, 清理后的正文 HTML)
+
+    parse_date 为日期文本解析函数（与 BeautifulSoup 版本共用）
+    """
+    if not AVAILABLE:
+        raise ExtractError("lxml 未安装")
+    if isinstance(html, str):
+        html = html.encode('utf-8')
+    if not html.strip():
+        raise ExtractError("无法找到文章内容")
+    try:
+        root = lxml.html.document_fromstring(html, parser=_PARSER)
+    except (etree.ParserError, ValueError) as e:
+        raise ExtractError(f"lxml 解析失败: {e}")
+
+    candidates = _CANDIDATES(root)
+    titles = _first_matches(candidates, TITLE_SELECTORS)
+    dates = _first_matches(candidates, DATE_SELECTORS)
+    contents = _first_matches(candidates, CONTENT_SELECTORS)
+
+    # 标题
+    title = None
+    for elem in titles:
+        if elem is not None:
+            title = get_text(elem)
+            title = TITLE_SUFFIX_WECHAT.sub('', title)
+            title = TITLE_SUFFIX.sub('', title)
+            if title:
+                break
+    if not title and titles[-1] is not None:
+        title = TITLE_SUFFIX.sub('', get_text(titles[-1]))
+    if not title:
+        title = '未命名文章'
+
+    # 发布日期
+    pub_date = None
+    for elem in dates:
+        if elem is not None:
+            pub_date = parse_date(get_text(elem))
+            if pub_date:
+                break
+    if not pub_date:
+        for elem in candidates:
+            if _META_DATE(elem):
+                try:
+                    pub_date = datetime.fromisoformat(elem.get('content', '').replace('Z', '+00:00'))
+                except ValueError:
+                    pass
+                break
+    if not pub_date:
+        pub_date = datetime.now()
+
+    # 正文
+    content = next((elem for elem in contents if elem is not None), None)
+    if content is None:
+        for div in _FALLBACK_DIVS(root):
+            if any(FALLBACK_CLASS.search(cls) for cls in _classes(div)):
+                if len(''.join(_TEXT(div))) > 500:
+                    content = div
+                    break
+    if content is None:
+        raise ExtractError("无法找到文章内容")
+
+    # 清理不需要的元素（drop_tree 保留元素后面的文本，与 decompose 一致）
+    for elem in _JUNK(content):
+        elem.drop_tree()
+    for elem in _CLASSED(content):
+        if JUNK_CLASS.search(elem.get('class', '')) and elem.getparent() is not None:
+            elem.drop_tree()
+
+    # 微信图片懒加载，真实地址在 data-src 中
+    for img in _LAZY_IMAGES(content):
+        img.set('src', img.get('data-src'))
+
+    content_html = lxml.html.tostring(content, encoding='unicode', with_tail=False)
+    return title, pub_date, content_html
+
+
+def check_parity(pages):
+    """
+    对比 lxml 与 BeautifulSoup 两种解析方式的 Markdown 输出
+
+    pages 为 (名称, 原始 HTML 字节) 的可迭代对象，返回不一致的页面列表
+    """
+    import difflib
+    import fetch_wechat_article_enhanced as fetcher
+
+    mismatches = []
+    total = 0
+    for name, html in pages:
+        total += 1
+        try:
+            expected = fetcher.parse_article(html, name, engine='bs4')
+        except Exception as e:
+            expected = {'error': str(e)}
+        try:
+            actual = fetcher.parse_article(html, name, engine='lxml', fallback=False)
+        except Exception as e:
+            actual = {'error': str(e)}
+
+        fields = ('title', 'content', 'error')
+        if all(expected.get(k) == actual.get(k) for k in fields) and \
+                (expected.get('date') is None or expected['date'].date() == actual['date'].date()):
+            print(f"[OK] {name}")
+            continue
+
+        mismatches.append(name)
+        print(f"[DIFF] {name}")
+        for key in fields:
+            if expected.get(key) != actual.get(key):
+                diff = difflib.unified_diff(
+                    str(expected.get(key, '')).splitlines(), str(actual.get(key, '')).splitlines(),
+                    'bs4', 'lxml', lineterm='', n=1)
+                for line in list(diff)[:20]:
+                    print(f"    {line}")
+
+    print(f"\n共 {total} 个页面，不一致 {len(mismatches)} 个")
+    return mismatches
+
+
+def iter_cached_pages():
+    """遍历响应缓存中的全部页面，生成 (URL, 原始 HTML 字节)"""
+    import gzip
+    import json
+    from response_cache import CACHE_DIR
+    for meta_path in sorted(CACHE_DIR.glob('*/*.json')):
+        body_path = meta_path.with_name(meta_path.stem + '.html.gz')
+        if body_path.exists():
+            url = json.loads(meta_path.read_text(encoding='utf-8')).get('url', meta_path.stem)
+            yield url, gzip.decompress(body_path.read_bytes())
+
+
+def _iter_pages(args):
+    from pathlib import Path
+    if '--cache' in args:
+        yield from iter_cached_pages()
+    for arg in args:
+        if not arg.startswith('--'):
+            yield arg, Path(arg).read_bytes()
+
+
+if __name__ == '__main__':
+    argv = sys.argv[1:]
+    if '--parity' not in argv:
+        print(__doc__)
+        sys.exit(1)
+    sys.exit(1 if check_parity(_iter_pages(argv)) else 0)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享的 HTTP 抓取客户端
+基于 requests.Session 复用连接（连接池 + keep-alive），
+对 5xx/429/超时等临时错误按指数退避加随机抖动自动重试，并记录每次请求的耗时
+"""
+
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+# 默认配置
+DEFAULT_POOL_SIZE = 10
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5  # 首次重试的基础等待秒数
+DEFAULT_MAX_BACKOFF = 30.0
+DEFAULT_TIMEOUT = 30
+
+# 需要重试的 HTTP 状态码
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+}
+
+
+class FetchClient:
+    """带连接池和重试的抓取客户端，可在多个线程间共享"""
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 max_backoff=DEFAULT_MAX_BACKOFF, timeout=DEFAULT_TIMEOUT, headers=None):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+        # 重试由本类自行处理，这里关闭 urllib3 的内置重试
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'failures': 0, 'elapsed': 0.0}
+
+    def _sleep_before_retry(self, attempt, response=None):
+        """指数退避 + 随机抖动；429 响应优先使用 Retry-After"""
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                delay = min(self.max_backoff, float(retry_after))
+        time.sleep(delay)
+
+    def _record(self, elapsed, retries, failed):
+        metrics.add('retries', retries)
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['retries'] += retries
+            self.stats['elapsed'] += elapsed
+            if failed:
+                self.stats['failures'] += 1
+
+    def get(self, url, headers=None, stream=False, timeout=None):
+        """
+        发送 GET 请求，临时错误自动重试
+
+        返回的 response 带有 timing 属性：
+        {'url', 'status', 'attempts', 'elapsed', 'attempt_times'}
+        """
+        timeout = timeout or self.timeout
+        attempt_times = []
+        start = time.perf_counter()
+        attempt = 0
+
+        while True:
+            attempt_start = time.perf_counter()
+            try:
+                response = self.session.get(url, headers=headers, stream=stream, timeout=timeout)
+            except (requests.Timeout, requests.ConnectionError):
+                attempt_times.append(time.perf_counter() - attempt_start)
+                if attempt >= self.retries:
+                    self._record(time.perf_counter() - start, attempt, failed=True)
+                    raise
+                self._sleep_before_retry(attempt)
+                attempt += 1
+                continue
+
+            attempt_times.append(time.perf_counter() - attempt_start)
+            if response.status_code in RETRY_STATUS:
+                if attempt >= self.retries:
+                    self._record(time.perf_counter() - start, attempt, failed=True)
+                    response.raise_for_status()
+                response.close()
+                self._sleep_before_retry(attempt, response)
+                attempt += 1
+                continue
+
+            elapsed = time.perf_counter() - start
+            self._record(elapsed, attempt, failed=False)
+            response.timing = {
+                'url': url,
+                'status': response.status_code,
+                'attempts': attempt + 1,
+                'elapsed': elapsed,
+                'attempt_times': attempt_times,
+            }
+            return response
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def configure_client(**kwargs):
+    """按给定参数重建共享客户端（在开始抓取前调用）"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = FetchClient(**kwargs)
+    return _client
+
+
+def get_client():
+    """获取共享客户端，首次调用时按默认配置创建"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = FetchClient()
+        return _client
+
+
+def format_stats(stats):
+    """格式化请求统计，用于批量处理结束时打印"""
+    count = stats['requests']
+    average = stats['elapsed'] / count if count else 0
+    return (f"请求 {count} 次，重试 {stats['retries']} 次，失败 {stats['failures']} 次，"
+            f"平均耗时 {average:.2f}s")
@@ -5,7 +5,6 @@
 将微信公众号文章转换为符合 lize.chat 项目格式的 Markdown 文件
 """
 
-import requests
 from bs4 import BeautifulSoup
 import re
 import os
@@ -14,6 +13,14 @@ from pathlib import Path
 from urllib.parse import urlparse
 import html2text
 import json
+import threading
+
+from concurrent_fetch import run_batch, DEFAULT_PER_HOST
+from fetch_client import configure_client, get_client, DEFAULT_POOL_SIZE
+from import_manifest import ImportManifest, content_hash
+from markdown_rules import FILENAME_RULES, clean_markdown
+from frontmatter_io import write_document
+from summary import summary_prefix, iter_text
 
 # 配置
 CONTENT_DIR = Path(__file__).parent.parent / "src" / "content" / "blog"
@@ -26,20 +33,26 @@ HEADERS = {
     'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
 }
 
-# 初始化 html2text 转换器
-h = html2text.HTML2Text()
-h.ignore_links = False
-h.ignore_images = False
-h.body_width = 0  # 不限制宽度
-h.unicode_snob = True  # 使用 Unicode 字符
+# html2text 转换器在转换过程中保存状态，不能跨线程共享，每个线程各自初始化一个
+_local = threading.local()
+
+
+def get_converter():
+    """获取当前线程的 html2text 转换器"""
+    converter = getattr(_local, 'converter', None)
+    if converter is None:
+        converter = _local.converter = html2text.HTML2Text()
+        converter.ignore_links = False
+        converter.ignore_images = False
+        converter.body_width = 0  # 不限制宽度
+        converter.unicode_snob = True  # 使用 Unicode 字符
+    return converter
 
 
 def sanitize_filename(title):
     """将标题转换为安全的文件名"""
-    # 移除特殊字符，保留中文、英文、数字、连字符和下划线
-    filename = re.sub(r'[^\w\s-]', '', title)
-    # 将空格替换为连字符
-    filename = re.sub(r'\s+', '-', filename)
+    # 移除特殊字符（保留中文、英文、数字、连字符和下划线），将空格替换为连字符
+    filename = FILENAME_RULES.apply(title)
     # 限制长度
     filename = filename[:100]
     return filename
@@ -51,7 +64,7 @@ def extract_wechat_article(url):
     注意：微信公众号文章通常需要特殊访问方式，此脚本处理可直接访问的 URL
     """
     try:
-        response = requests.get(url, headers=HEADERS, timeout=30)
+        response = get_client().get(url, headers=HEADERS)
         response.encoding = 'utf-8'
         soup = BeautifulSoup(response.text, 'html.parser')
         
@@ -125,13 +138,10 @@ def extract_wechat_article(url):
             raise ValueError("无法找到文章内容")
         
         # 转换为 Markdown
-        markdown_content = h.handle(str(content))
+        markdown_content = get_converter().handle(str(content))
         
-        # 清理 Markdown 内容
-        # 移除多余的空行
-        markdown_content = re.sub(r'\n{3,}', '\n\n', markdown_content)
-        # 移除首尾空白
-        markdown_content = markdown_content.strip()
+        # 清理 Markdown 内容（多余空行、公众号关注提示、首尾空白）
+        markdown_content = clean_markdown(markdown_content)
         
         return {
             'title': title or '未命名文章',
@@ -144,137 +154,168 @@ def extract_wechat_article(url):
         raise Exception(f"抓取文章失败: {str(e)}")
 
 
-def generate_frontmatter(title, date, description=None, guest=None, host=None, slide_url=None):
-    """生成 Frontmatter"""
-    frontmatter = {
-        'title': title,
-        'pubDate': date.strftime('%Y-%m-%d'),
-    }
-    
-    if description:
-        frontmatter['description'] = description
-    
-    if guest:
-        frontmatter['guest'] = guest
-    
-    if host:
-        frontmatter['host'] = host
-    
-    if slide_url:
-        frontmatter['slideUrl'] = slide_url
-    
-    # 格式化为 YAML
-    lines = ['---']
-    for key, value in frontmatter.items():
-        if isinstance(value, str):
-            # 如果值包含特殊字符，使用引号
-            if ':' in value or '"' in value or "'" in value:
-                lines.append(f'{key}: "{value}"')
-            else:
-                lines.append(f'{key}: {value}')
-        else:
-            lines.append(f'{key}: {value}')
-    lines.append('---')
-    
-    return '\n'.join(lines)
-
-
-def save_article(article_data, output_dir=None):
-    """保存文章到文件"""
+def save_article(article_data, output_dir=None, filepath=None):
+    """保存文章到文件；指定 filepath 时覆盖该文件"""
     if output_dir is None:
         output_dir = CONTENT_DIR
     
     # 生成文件名
     filename = sanitize_filename(article_data['title'])
-    filepath = output_dir / f"{filename}.md"
-    
-    # 如果文件已存在，添加时间戳
-    if filepath.exists():
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filepath = output_dir / f"{filename}_{timestamp}.md"
+    overwrite = filepath is not None
+    if not overwrite:
+        filepath = output_dir / f"{filename}.md"
     
     # 生成摘要（取前100个字符）
     description = None
     if article_data['content']:
-        # 移除 Markdown 格式标记，提取纯文本
-        text_content = re.sub(r'[#*_\[\]()]', '', article_data['content'])
-        text_content = re.sub(r'\n+', ' ', text_content)
+        # 移除 Markdown 格式标记，提取纯文本；只处理前 101 个字符所需的部分
+        text_content = summary_prefix(iter_text(article_data['content']), 101, strip_leading=False)
         description = text_content[:100].strip()
         if len(text_content) > 100:
             description += '...'
     
-    # 生成 Frontmatter
-    frontmatter = generate_frontmatter(
-        title=article_data['title'],
-        date=article_data['date'],
-        description=description
-    )
+    # 生成 Frontmatter 字段（字段顺序和引号由 frontmatter_io 统一处理）
+    fields = {
+        'title': article_data['title'],
+        'pubDate': article_data['date'],
+        'description': description or None,
+    }
     
-    # 组合内容
-    full_content = f"{frontmatter}\n\n{article_data['content']}"
+    # 头部和正文直接写入文件，不在内存中拼接完整文档
+    if overwrite:
+        write_document(filepath, fields, article_data['content'])
+        return filepath
     
-    # 保存文件
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(full_content)
+    # 保存文件；以独占模式创建，避免并发时同名文章互相覆盖
+    # 如果文件已存在，添加时间戳
+    counter = 1
+    while True:
+        try:
+            write_document(filepath, fields, article_data['content'], exclusive=True)
+            break
+        except FileExistsError:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            suffix = f"_{counter}" if counter > 1 else ''
+            filepath = output_dir / f"{filename}_{timestamp}{suffix}.md"
+            counter += 1
     
-    print(f"✅ 文章已保存: {filepath}")
     return filepath
 
 
-def process_urls(urls):
-    """批量处理多个 URL"""
-    results = []
-    for i, url in enumerate(urls, 1):
-        print(f"\n[{i}/{len(urls)}] 正在处理: {url}")
-        try:
-            article_data = extract_wechat_article(url)
-            filepath = save_article(article_data)
-            results.append({
+def process_url(url, manifest=None, force=False):
+    """抓取并保存单篇文章，返回结果字典；已在导入清单中的 URL 直接跳过"""
+    try:
+        entry = manifest.lookup(url) if manifest is not None else None
+        if entry and not force:
+            return {
                 'url': url,
                 'success': True,
-                'filepath': str(filepath),
-                'title': article_data['title']
-            })
-        except Exception as e:
-            print(f"❌ 处理失败: {str(e)}")
-            results.append({
-                'url': url,
-                'success': False,
-                'error': str(e)
-            })
+                'skipped': True,
+                'filepath': str(manifest.resolve(entry)),
+                'title': entry.get('title') or ''
+            }
+        
+        article_data = extract_wechat_article(url)
+        digest = content_hash(article_data['content'])
+        if entry and entry.get('sha256') == digest:
+            filepath = manifest.resolve(entry)
+        else:
+            filepath = save_article(article_data, filepath=manifest.resolve(entry) if entry else None)
+            if manifest is not None:
+                manifest.record(url, filepath, digest, article_data['title'])
+        return {
+            'url': url,
+            'success': True,
+            'filepath': str(filepath),
+            'title': article_data['title']
+        }
+    except Exception as e:
+        return {
+            'url': url,
+            'success': False,
+            'error': str(e)
+        }
+
+
+def process_urls(urls, concurrency=1, per_host=DEFAULT_PER_HOST, force=False):
+    """批量处理多个 URL，concurrency > 1 时并发抓取，结果仍按输入顺序返回"""
+    configure_client(pool_size=max(DEFAULT_POOL_SIZE, concurrency))
+    manifest = ImportManifest()
+    
+    def report(i, url, result):
+        print(f"\n[{i}/{len(urls)}] 正在处理: {url}")
+        if result.get('skipped'):
+            print(f"⏭️  已导入，跳过: {result['filepath']}")
+        elif result['success']:
+            print(f"✅ 文章已保存: {result['filepath']}")
+        else:
+            print(f"❌ 处理失败: {result['error']}")
     
+    results = run_batch(
+        urls,
+        lambda url: process_url(url, manifest=manifest, force=force),
+        concurrency=concurrency,
+        per_host=per_host,
+        on_result=report
+    )
+    manifest.compact()
     return results
 
 
+def print_usage():
+    """打印命令行用法"""
+    print("使用方法:")
+    print("  python fetch_wechat_article.py <URL1> [URL2] [URL3] ...")
+    print("\n或者从文件读取 URL 列表:")
+    print("  python fetch_wechat_article.py --file urls.txt")
+    print("\n并发抓取（默认逐篇处理）:")
+    print("  python fetch_wechat_article.py --concurrency 8 --file urls.txt")
+    print("\n重新抓取已导入的 URL:")
+    print("  python fetch_wechat_article.py --force --file urls.txt")
+    print("\n示例:")
+    print("  python fetch_wechat_article.py https://mp.weixin.qq.com/s/xxxxx")
+
+
 def main():
     """主函数"""
     import sys
     
     if len(sys.argv) < 2:
-        print("使用方法:")
-        print("  python fetch_wechat_article.py <URL1> [URL2] [URL3] ...")
-        print("\n或者从文件读取 URL 列表:")
-        print("  python fetch_wechat_article.py --file urls.txt")
-        print("\n示例:")
-        print("  python fetch_wechat_article.py https://mp.weixin.qq.com/s/xxxxx")
+        print_usage()
         return
     
     urls = []
+    argv = sys.argv[1:]
+    
+    # 检查选项
+    concurrency = 1
+    force = False
+    while argv and argv[0] in ('--concurrency', '--force'):
+        if argv[0] == '--force':
+            force = True
+            argv = argv[1:]
+        elif len(argv) > 1 and argv[1].isdigit() and int(argv[1]) > 0:
+            concurrency = int(argv[1])
+            argv = argv[2:]
+        else:
+            print(f"❌ --concurrency 需要一个正整数{': ' + argv[1] if len(argv) > 1 else ''}\n")
+            print_usage()
+            sys.exit(2)
     
     # 检查是否从文件读取
-    if sys.argv[1] == '--file' and len(sys.argv) > 2:
-        filepath = sys.argv[2]
+    if argv and argv[0] == '--file' and len(argv) > 1:
+        filepath = argv[1]
         with open(filepath, 'r', encoding='utf-8') as f:
             urls = [line.strip() for line in f if line.strip() and not line.startswith('#')]
     else:
-        urls = sys.argv[1:]
+        urls = argv
     
     if not urls:
         print("❌ 没有提供有效的 URL")
         return
     
     print(f"📝 准备处理 {len(urls)} 篇文章...")
-    results = process_urls(urls)
+    results = process_urls(urls, concurrency=concurrency, force=force)
     
     # 打印总结
     print("\n" + "="*50)
@@ -286,7 +327,7 @@ def main():
     if success_count > 0:
         print("\n成功保存的文章:")
         for r in results:
-            if r['success']:
+            if r['success'] and not r.get('skipped'):
                 print(f"  - {r['title']}")
                 print(f"    文件: {r['filepath']}")
 
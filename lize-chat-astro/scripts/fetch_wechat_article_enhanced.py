@@ -6,7 +6,6 @@
 """
 
 import requests
-from bs4 import BeautifulSoup
 import re
 import os
 from datetime import datetime
@@ -15,6 +14,28 @@ from urllib.parse import urlparse, urljoin
 import html2text
 import json
 import argparse
+import contextlib
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from concurrent_fetch import run_batch, HostLimiter, DEFAULT_CONCURRENCY, DEFAULT_PER_HOST
+from pipeline import Pipeline, Stage, Done, DEFAULT_QUEUE_SIZE
+from fetch_client import configure_client, get_client, format_stats, DEFAULT_POOL_SIZE, DEFAULT_RETRIES
+import response_cache
+import fast_extract
+import markdown_rules
+from markdown_rules import MARKDOWN_RULES, FILENAME_RULES, clean_markdown
+from response_cache import configure_cache, get_cache, CacheMiss
+from import_manifest import ImportManifest, content_hash, MANIFEST_FILE
+import image_store
+from image_store import configure_store, get_store, DEFAULT_IMAGE_WORKERS
+from frontmatter_io import Header, write_document
+from job_state import JobState, default_state_file, format_summary, DEFAULT_MAX_ATTEMPTS, DEFAULT_RETRY_BACKOFF
+from summary import summarize, summarize_file, iter_text
+import stream_extract
+import metrics
 
 # 配置
 CONTENT_DIR = Path(__file__).parent.parent / "src" / "content" / "blog"
@@ -27,19 +48,73 @@ HEADERS = {
     'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
 }
 
-# 初始化 html2text 转换器
-h = html2text.HTML2Text()
-h.ignore_links = False
-h.ignore_images = True  # 忽略图片，因为微信公众号图片通常需要特殊处理
-h.body_width = 0
-h.unicode_snob = True
-h.mark_code = True  # 保留代码块
+# 默认解析引擎：lxml 快速路径，不可用或提取失败时回退到 BeautifulSoup
+DEFAULT_ENGINE = 'lxml'
+
+# 流式模式：每次读取的响应字节数；找到正文前的原始 HTML 超过 STREAM_SPOOL_SIZE 时暂存到磁盘（仅用于回退到整体解析）
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_SPOOL_SIZE = 1024 * 1024
+
+# html2text 转换器在转换过程中保存状态，不能跨线程共享，每个线程各自初始化一个
+_local = threading.local()
+
+
+def make_converter(images=False):
+    """创建 html2text 转换器；images=True 时保留图片（之后由 image_store 下载到本地）"""
+    converter = html2text.HTML2Text()
+    converter.ignore_links = False
+    converter.ignore_images = not images  # 默认忽略图片，因为微信公众号图片通常需要特殊处理
+    converter.body_width = 0
+    converter.unicode_snob = True
+    converter.mark_code = True  # 保留代码块
+    return converter
+
+
+def get_converter(images=False):
+    """获取当前线程的 html2text 转换器"""
+    name = 'image_converter' if images else 'converter'
+    converter = getattr(_local, name, None)
+    if converter is None:
+        converter = make_converter(images)
+        setattr(_local, name, converter)
+    return converter
+
+
+# 可选的进程池：提取和 Markdown 转换是纯 Python 的 CPU 密集任务，受 GIL 限制，多线程无法加速
+_process_pool = None
+
+
+def _init_worker(rules_file=None):
+    """进程池工作进程初始化：每个进程只创建一次转换器，并加载自定义清理规则"""
+    get_converter()
+    if rules_file:
+        markdown_rules.load_rules(rules_file, MARKDOWN_RULES)
+
+
+def configure_process_pool(processes, rules_file=None):
+    """创建（processes > 0）或关闭进程池"""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown()
+        _process_pool = None
+    if processes and processes > 0:
+        _process_pool = ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                            initargs=(rules_file,))
+    return _process_pool
+
+
+def parse_article_parallel(html, url, engine=None, images=False):
+    """配置了进程池时在工作进程中解析（只传入原始 HTML 字节，只传回 Markdown 和元数据）"""
+    if _process_pool is None:
+        return parse_article(html, url, engine=engine, images=images)
+    # 工作进程中的提取和转换合并记为 parse 阶段
+    with metrics.stage('parse'):
+        return _process_pool.submit(parse_article, html, url, engine, True, images).result()
 
 
 def sanitize_filename(title):
     """将标题转换为安全的文件名"""
-    filename = re.sub(r'[^\w\s-]', '', title)
-    filename = re.sub(r'\s+', '-', filename)
+    filename = FILENAME_RULES.apply(title)
     filename = filename[:100]
     return filename
 
@@ -68,245 +143,616 @@ def parse_date(date_str):
     return None
 
 
-def extract_wechat_article(url, extract_images=False):
+def fetch_html(url, offline=False):
+    """
+    获取页面原始 HTML 字节
+
+    启用缓存时通过缓存获取（条件请求 / 离线读取），否则直接请求
+    """
+    cache = get_cache()
+    if offline and cache is None:
+        raise CacheMiss(f"离线模式需要启用缓存: {url}")
+    with metrics.stage('fetch'):
+        if cache is not None:
+            html = cache.fetch(get_client(), url, headers=HEADERS, offline=offline)
+        else:
+            html = get_client().get(url, headers=HEADERS).content
+    metrics.add('bytes_in', len(html))
+    return html
+
+
+def extract_wechat_article(url, extract_images=False, offline=False, engine=None):
     """
     提取微信公众号文章内容
+
+    extract_images=True 时保留正文图片，下载到 public/images/wechat 并改写为站内链接
     """
     try:
-        response = requests.get(url, headers=HEADERS, timeout=30)
-        response.encoding = 'utf-8'
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 提取标题
-        title = None
-        title_selectors = [
-            'h1#activity-name',
-            'h1.rich_media_title',
-            'h1.rich_media_title#activity-name',
-            'h1',
-            'title'
-        ]
-        for selector in title_selectors:
-            title_elem = soup.select_one(selector)
-            if title_elem:
-                title = title_elem.get_text(strip=True)
-                # 移除常见的后缀
-                title = re.sub(r'\s*[-|]\s*.*微信公众号.*$', '', title, flags=re.IGNORECASE)
-                title = re.sub(r'\s*[-|]\s*.*$', '', title)
-                if title:
-                    break
-        
-        if not title:
-            title_tag = soup.find('title')
-            if title_tag:
-                title = title_tag.get_text(strip=True)
-                title = re.sub(r'\s*[-|]\s*.*$', '', title)
-        
-        if not title:
-            title = '未命名文章'
-        
-        # 提取发布日期
-        pub_date = None
-        date_selectors = [
-            '#publish_time',
-            '.publish_time',
-            'em#publish_time',
-            'em.rich_media_meta_text',
-            'span#publish_time',
-            'div.rich_media_meta_text',
-        ]
-        
-        for selector in date_selectors:
-            date_elem = soup.select_one(selector)
-            if date_elem:
-                date_text = date_elem.get_text(strip=True)
-                pub_date = parse_date(date_text)
-                if pub_date:
-                    break
-        
-        # 如果还没找到，尝试从 meta 标签获取
-        if not pub_date:
-            meta_date = soup.find('meta', property='article:published_time')
-            if meta_date:
-                date_str = meta_date.get('content', '')
-                try:
-                    pub_date = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                except:
-                    pass
-        
-        # 如果还是没有，使用当前日期
-        if not pub_date:
-            pub_date = datetime.now()
-        
-        # 提取正文内容
-        content = None
-        content_selectors = [
-            '#js_content',
-            '.rich_media_content',
-            'div[id*="content"]',
-            'div[class*="content"]',
-            'article',
-            'div.article-content',
-        ]
-        
-        for selector in content_selectors:
-            content_elem = soup.select_one(selector)
-            if content_elem:
-                content = content_elem
-                break
-        
-        if not content:
-            # 尝试查找包含大量文本的 div
-            divs = soup.find_all('div', class_=re.compile(r'content|article|text|rich'))
-            for div in divs:
-                text_length = len(div.get_text())
-                if text_length > 500:  # 假设正文至少500字符
-                    content = div
-                    break
-        
-        if not content:
-            raise ValueError("无法找到文章内容")
-        
-        # 清理不需要的元素
-        for elem in content.find_all(['script', 'style', 'iframe', 'noscript']):
-            elem.decompose()
-        
-        # 移除微信公众号特有的元素
-        for elem in content.find_all(class_=re.compile(r'qr|code|ad|advertisement|promotion')):
-            elem.decompose()
-        
-        # 转换为 Markdown
-        markdown_content = h.handle(str(content))
-        
-        # 清理 Markdown 内容
-        # 移除多余的空行
-        markdown_content = re.sub(r'\n{3,}', '\n\n', markdown_content)
-        # 移除首尾空白
-        markdown_content = markdown_content.strip()
-        # 移除微信公众号二维码等提示
-        markdown_content = re.sub(r'长按.*关注.*\n?', '', markdown_content, flags=re.IGNORECASE)
-        markdown_content = re.sub(r'扫码.*关注.*\n?', '', markdown_content, flags=re.IGNORECASE)
-        
+        html = fetch_html(url, offline=offline)
+        article_data = parse_article_parallel(html, url, engine=engine, images=extract_images)
+        if extract_images:
+            localize_images(article_data)
+        return article_data
+    except requests.RequestException as e:
+        raise Exception(f"网络请求失败: {str(e)}")
+    except CacheMiss as e:
+        raise Exception(str(e))
+    except Exception as e:
+        raise Exception(f"提取文章失败: {str(e)}")
+
+
+def stream_wechat_article(url, output_dir=None, images=False):
+    """
+    流式抓取并转换单篇文章（内存占用与文章大小无关，见 stream_extract.py）
+
+    响应按块送入增量解析器，正文 Markdown 逐段写入输出目录下的临时文件；返回的文章数据中
+    content 为该临时文件的 Header（保存时按字节范围复制），sha256 为正文哈希，保存后由 discard_body() 删除临时文件。
+    页面中没有 #js_content 时回退到整体解析：找到 #js_content 之前的原始 HTML 暂存在 SpooledTemporaryFile 中，
+    找到之后丢弃暂存内容，之后才失败时重新请求页面。
+    不使用响应缓存
+    """
+    output_dir = Path(output_dir or CONTENT_DIR)
+    store = get_store() if images else None
+    body = tempfile.NamedTemporaryFile('wb', dir=output_dir, prefix='.stream-', suffix='.tmp', delete=False)
+    spool = tempfile.SpooledTemporaryFile(STREAM_SPOOL_SIZE)
+    try:
+        with body:
+            sink = stream_extract.MarkdownSink(body.write, MARKDOWN_RULES,
+                                               transform=store.localize if store is not None else None)
+            extractor = stream_extract.StreamExtractor(make_converter(images), sink)
+            failed = None
+            # 下载和转换交替进行，合并记为 stream 阶段
+            with metrics.stage('stream'):
+                with get_client().get(url, headers=HEADERS, stream=True) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                        metrics.add('bytes_in', len(chunk))
+                        if spool is not None:
+                            spool.write(chunk)
+                        if failed is None:
+                            try:
+                                extractor.feed(chunk)
+                            except stream_extract.StreamError as e:
+                                failed = e
+                        if spool is not None and failed is None and extractor.found_content:
+                            spool.close()
+                            spool = None
+                if failed is None:
+                    try:
+                        title, pub_date = extractor.close(parse_date)
+                    except stream_extract.StreamError as e:
+                        failed = e
+            if failed is None:
+                digest = sink.close()
+        # 临时文件关闭后才能删除（Windows 不允许删除打开中的文件）
+        if failed is not None:
+            Path(body.name).unlink(missing_ok=True)
+            if spool is not None:
+                spool.seek(0)
+                html = spool.read()
+            else:
+                with metrics.stage('fetch'):
+                    html = get_client().get(url, headers=HEADERS).content
+                metrics.add('bytes_in', len(html))
+            article_data = parse_article(html, url, images=images)
+            return localize_images(article_data) if images else article_data
         return {
             'title': title,
             'date': pub_date,
-            'content': markdown_content,
+            'content': Header(body.name, False, '', '', 0, sink.size, {}),
+            'sha256': digest,
             'url': url
         }
-        
     except requests.RequestException as e:
+        Path(body.name).unlink(missing_ok=True)
         raise Exception(f"网络请求失败: {str(e)}")
     except Exception as e:
+        Path(body.name).unlink(missing_ok=True)
         raise Exception(f"提取文章失败: {str(e)}")
+    finally:
+        if spool is not None:
+            spool.close()
+
 
+def discard_body(article_data):
+    """删除流式模式写入的正文临时文件"""
+    if isinstance(article_data.get('content'), Header):
+        article_data['content'].path.unlink(missing_ok=True)
 
-def generate_frontmatter(title, date, description=None, guest=None, host=None, slide_url=None, tags=None):
-    """生成 Frontmatter"""
-    frontmatter = {
-        'title': f'"{title}"',  # 标题用引号包裹，避免特殊字符问题
-        'pubDate': date.strftime('%Y-%m-%d'),
+
+def parse_article(html, url, engine=None, fallback=True, images=False):
+    """
+    从原始 HTML 解析文章（不涉及网络），返回文章数据字典
+
+    engine 为 'lxml'（默认，快速路径）或 'bs4'；lxml 提取失败时回退到 BeautifulSoup。
+    images=True 时 Markdown 中保留图片链接（远程地址）
+    """
+    engine = engine or DEFAULT_ENGINE
+    with metrics.stage('extract'):
+        if engine == 'lxml' and fast_extract.AVAILABLE:
+            try:
+                title, pub_date, content_html = fast_extract.extract(html, parse_date)
+            except fast_extract.ExtractError:
+                if not fallback:
+                    raise
+                title, pub_date, content_html = extract_with_bs4(html)
+        else:
+            title, pub_date, content_html = extract_with_bs4(html)
+    
+    return {
+        'title': title,
+        'date': pub_date,
+        'content': html_to_markdown(content_html, images=images),
+        'url': url
     }
+
+
+def localize_images(article_data):
+    """下载文章中的图片并把链接改写为站内路径（未配置图片存储时不做处理）"""
+    store = get_store()
+    if store is not None:
+        with metrics.stage('images'):
+            article_data['content'] = store.localize(article_data['content'])
+    return article_data
+
+
+def extract_with_bs4(html):
+    """
+    使用 BeautifulSoup 提取 (标题, 发布日期, 清理后的正文 HTML)
+    """
+    # BeautifulSoup 只在回退或 --parser bs4 时需要，按需导入
+    from bs4 import BeautifulSoup
+    if isinstance(html, bytes):
+        html = html.decode('utf-8', errors='replace')
+    soup = BeautifulSoup(html, 'html.parser')
     
-    if description:
-        frontmatter['description'] = f'"{description}"'
+    # 提取标题
+    title = None
+    title_selectors = [
+        'h1#activity-name',
+        'h1.rich_media_title',
+        'h1.rich_media_title#activity-name',
+        'h1',
+        'title'
+    ]
+    for selector in title_selectors:
+        title_elem = soup.select_one(selector)
+        if title_elem:
+            title = title_elem.get_text(strip=True)
+            # 移除常见的后缀
+            title = re.sub(r'\s*[-|]\s*.*微信公众号.*$', '', title, flags=re.IGNORECASE)
+            title = re.sub(r'\s*[-|]\s*.*$', '', title)
+            if title:
+                break
     
-    if guest:
-        frontmatter['guest'] = f'"{guest}"'
+    if not title:
+        title_tag = soup.find('title')
+        if title_tag:
+            title = title_tag.get_text(strip=True)
+            title = re.sub(r'\s*[-|]\s*.*$', '', title)
     
-    if host:
-        frontmatter['host'] = f'"{host}"'
+    if not title:
+        title = '未命名文章'
     
-    if slide_url:
-        frontmatter['slideUrl'] = f'"{slide_url}"'
+    # 提取发布日期
+    pub_date = None
+    date_selectors = [
+        '#publish_time',
+        '.publish_time',
+        'em#publish_time',
+        'em.rich_media_meta_text',
+        'span#publish_time',
+        'div.rich_media_meta_text',
+    ]
     
-    if tags:
-        if isinstance(tags, list):
-            tags_str = '[' + ', '.join([f'"{tag}"' for tag in tags]) + ']'
-            frontmatter['tags'] = tags_str
-        else:
-            frontmatter['tags'] = f'"{tags}"'
+    for selector in date_selectors:
+        date_elem = soup.select_one(selector)
+        if date_elem:
+            date_text = date_elem.get_text(strip=True)
+            pub_date = parse_date(date_text)
+            if pub_date:
+                break
+    
+    # 如果还没找到，尝试从 meta 标签获取
+    if not pub_date:
+        meta_date = soup.find('meta', property='article:published_time')
+        if meta_date:
+            date_str = meta_date.get('content', '')
+            try:
+                pub_date = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+            except:
+                pass
+    
+    # 如果还是没有，使用当前日期
+    if not pub_date:
+        pub_date = datetime.now()
+    
+    # 提取正文内容
+    content = None
+    content_selectors = [
+        '#js_content',
+        '.rich_media_content',
+        'div[id*="content"]',
+        'div[class*="content"]',
+        'article',
+        'div.article-content',
+    ]
+    
+    for selector in content_selectors:
+        content_elem = soup.select_one(selector)
+        if content_elem:
+            content = content_elem
+            break
+    
+    if not content:
+        # 尝试查找包含大量文本的 div
+        divs = soup.find_all('div', class_=re.compile(r'content|article|text|rich'))
+        for div in divs:
+            text_length = len(div.get_text())
+            if text_length > 500:  # 假设正文至少500字符
+                content = div
+                break
+    
+    if not content:
+        raise ValueError("无法找到文章内容")
+    
+    # 清理不需要的元素
+    for elem in content.find_all(['script', 'style', 'iframe', 'noscript']):
+        elem.decompose()
     
-    # 格式化为 YAML
-    lines = ['---']
-    for key, value in frontmatter.items():
-        lines.append(f'{key}: {value}')
-    lines.append('---')
+    # 移除微信公众号特有的元素
+    for elem in content.find_all(class_=re.compile(r'qr|code|ad|advertisement|promotion')):
+        elem.decompose()
     
-    return '\n'.join(lines)
+    # 微信图片懒加载，真实地址在 data-src 中
+    for img in content.find_all('img', attrs={'data-src': True}):
+        img['src'] = img['data-src']
+    
+    return title, pub_date, str(content)
+
+
+def html_to_markdown(content_html, images=False):
+    """将正文 HTML 转换为 Markdown 并清理"""
+    with metrics.stage('convert'):
+        markdown_content = get_converter(images).handle(content_html)
+    
+    # 清理 Markdown 内容（多余空行、微信公众号二维码等提示，以及 --rules 追加的规则）
+    with metrics.stage('cleanup'):
+        return clean_markdown(markdown_content)
 
 
 def extract_summary(content, max_length=150):
-    """从内容中提取摘要"""
+    """从内容中提取摘要（只处理正文开头摘要需要的部分，见 summary.py）"""
     if not content:
         return None
-    
-    # 移除 Markdown 格式标记
-    text = re.sub(r'[#*_\[\]()]', '', content)
-    text = re.sub(r'\n+', ' ', text)
-    text = text.strip()
-    
-    # 取前 max_length 个字符
-    if len(text) > max_length:
-        # 尝试在句号处截断
-        sentences = re.split(r'[。！？]', text[:max_length * 2])
-        if len(sentences) > 1:
-            summary = '。'.join(sentences[:-1]) + '。'
-        else:
-            summary = text[:max_length] + '...'
-    else:
-        summary = text
-    
-    return summary
+    return summarize(iter_text(content), max_length)
 
 
-def save_article(article_data, output_dir=None, guest=None, host=None, tags=None):
-    """保存文章到文件"""
+def save_article(article_data, output_dir=None, guest=None, host=None, tags=None, filepath=None):
+    """保存文章到文件；指定 filepath 时覆盖该文件（用于更新已导入的文章）"""
     if output_dir is None:
         output_dir = CONTENT_DIR
     
     # 生成文件名
     filename = sanitize_filename(article_data['title'])
-    filepath = output_dir / f"{filename}.md"
+    overwrite = filepath is not None
+    if not overwrite:
+        filepath = output_dir / f"{filename}.md"
+    
+    # 生成摘要（流式模式下从正文临时文件开头读取）
+    content = article_data['content']
+    description = summarize_file(content) if isinstance(content, Header) else extract_summary(content)
+    
+    # 生成 Frontmatter 字段（字段顺序和引号由 frontmatter_io 统一处理）
+    fields = {
+        'title': article_data['title'],
+        'pubDate': article_data['date'],
+        'description': description or None,
+        'guest': guest or None,
+        'host': host or None,
+        'tags': tags or None,
+    }
     
+    # 头部和正文直接写入文件，不在内存中拼接完整文档
+    if overwrite:
+        write_document(filepath, fields, article_data['content'])
+        return filepath
+    
+    # 保存文件；以独占模式创建，并发写入同名文章时也不会互相覆盖
     # 如果文件已存在，添加时间戳
     counter = 1
-    original_filepath = filepath
-    while filepath.exists():
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filepath = output_dir / f"{filename}_{timestamp}_{counter}.md"
-        counter += 1
-    
-    # 生成摘要
-    description = extract_summary(article_data['content'])
-    
-    # 生成 Frontmatter
-    frontmatter = generate_frontmatter(
-        title=article_data['title'],
-        date=article_data['date'],
-        description=description,
-        guest=guest,
-        host=host,
-        tags=tags
-    )
-    
-    # 组合内容
-    full_content = f"{frontmatter}\n\n{article_data['content']}"
-    
-    # 保存文件
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(full_content)
+    while True:
+        try:
+            write_document(filepath, fields, article_data['content'], exclusive=True)
+            break
+        except FileExistsError:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            filepath = output_dir / f"{filename}_{timestamp}_{counter}.md"
+            counter += 1
     
     return filepath
 
 
+def skipped_result(url, manifest, entry, title=None):
+    """已导入（或内容未变化）而跳过的结果"""
+    return {
+        'url': url,
+        'success': True,
+        'skipped': True,
+        'filepath': str(manifest.resolve(entry)),
+        'title': title or entry.get('title') or ''
+    }
+
+
+def write_article(url, article_data, digest, manifest=None, entry=None, **save_options):
+    """写入文章文件（已导入的 URL 覆盖原文件）并记录到导入清单，返回文件路径"""
+    with metrics.stage('write'):
+        filepath = save_article(
+            article_data,
+            filepath=manifest.resolve(entry) if entry else None,
+            **save_options
+        )
+    metrics.add('bytes_out', filepath.stat().st_size)
+    if manifest is not None:
+        manifest.record(url, filepath, digest, article_data['title'])
+    return filepath
+
+
+def store_article(url, article_data, manifest=None, entry=None, detector=None, **save_options):
+    """
+    保存已提取的文章并记录到导入清单，返回结果字典
+
+    entry 为该 URL 已有的导入记录：内容未变化时不改写文件，有变化时覆盖原文件；
+    提供 detector（near_duplicates.DuplicateDetector）时，与已有文章近似重复的文章不保存
+    """
+    digest = article_data.get('sha256') or content_hash(article_data['content'])
+    if entry and entry.get('sha256') == digest:
+        return skipped_result(url, manifest, entry, article_data['title'])
+    
+    if detector is None:
+        filepath = write_article(url, article_data, digest, manifest, entry, **save_options)
+    else:
+        # 检查、保存和加入在检测器的锁内完成，并发导入的两篇近似重复文章不会都通过检查
+        with detector.exclusive():
+            # 重新导入同一 URL 时不与它自己的旧文件比较
+            with metrics.stage('dedupe'):
+                matches = detector.find(article_data['content'], exclude=[manifest.resolve(entry)] if entry else ())
+            if matches:
+                article, score = matches[0]
+                return {
+                    'url': url,
+                    'success': False,
+                    'duplicate': article,
+                    'title': article_data['title'],
+                    'error': f"与已有文章重复: {article}（相似度 {score:.2f}）"
+                }
+            filepath = write_article(url, article_data, digest, manifest, entry, **save_options)
+            with metrics.stage('dedupe'):
+                detector.add(filepath, article_data['content'])
+    return {
+        'url': url,
+        'success': True,
+        'filepath': str(filepath),
+        'title': article_data['title']
+    }
+
+
+@metrics.tracked
+def process_url(url, output_dir=None, guest=None, host=None, tags=None, offline=False,
+                manifest=None, force=False, engine=None, images=False, detector=None, stream=False):
+    """
+    抓取并保存单篇文章，返回结果字典（不抛出异常）
+
+    提供 manifest 时，已导入的 URL 不再抓取；force=True 时重新抓取，
+    内容未变化则不改写文件，有变化则覆盖原文件而不是生成新文件；
+    stream=True 时边下载边转换（stream_wechat_article），不使用响应缓存
+    """
+    try:
+        entry = manifest.lookup(url) if manifest is not None else None
+        if entry and not force:
+            return skipped_result(url, manifest, entry)
+        
+        if stream:
+            article_data = stream_wechat_article(url, output_dir, images=images)
+        else:
+            article_data = extract_wechat_article(url, extract_images=images, offline=offline, engine=engine)
+        try:
+            return store_article(
+                url, article_data, manifest=manifest, entry=entry, detector=detector,
+                output_dir=output_dir, guest=guest, host=host, tags=tags
+            )
+        finally:
+            discard_body(article_data)
+    except Exception as e:
+        return {
+            'url': url,
+            'success': False,
+            'error': str(e)
+        }
+
+
+def run_pipeline(urls, stage_workers, queue_size=DEFAULT_QUEUE_SIZE, per_host=DEFAULT_PER_HOST,
+                 offline=False, manifest=None, force=False, engine=None, images=False, detector=None,
+                 on_result=None, **save_options):
+    """
+    流水线方式批量导入：抓取 -> 提取 -> 转换 Markdown ->（下载图片）-> 写入，
+    各阶段并行运行，通过有界队列衔接；返回 (结果列表, Pipeline)
+    """
+    limiter = HostLimiter(per_host)
+    engine = engine or DEFAULT_ENGINE
+    recorder = metrics.get_recorder()
+    
+    def fetch(item):
+        url = item['url']
+        item['entry'] = manifest.lookup(url) if manifest is not None else None
+        if item['entry'] and not force:
+            return Done(skipped_result(url, manifest, item['entry']))
+        item['html'] = limiter.run(url, fetch_html, url, offline=offline)
+        return item
+    
+    def extract(item):
+        html = item.pop('html')
+        with metrics.stage('extract'):
+            if engine == 'lxml' and fast_extract.AVAILABLE:
+                try:
+                    item['parts'] = fast_extract.extract(html, parse_date)
+                    return item
+                except fast_extract.ExtractError:
+                    pass
+            item['parts'] = extract_with_bs4(html)
+        return item
+    
+    def convert(item):
+        title, pub_date, content_html = item.pop('parts')
+        item['article'] = {
+            'title': title,
+            'date': pub_date,
+            'content': html_to_markdown(content_html, images=images),
+            'url': item['url']
+        }
+        return item
+    
+    def parse(item):
+        # 进程池模式：提取和转换合并为一个阶段，在工作进程中完成
+        item['article'] = parse_article_parallel(item.pop('html'), item['url'], engine=engine, images=images)
+        return item
+    
+    def download_images(item):
+        localize_images(item['article'])
+        return item
+    
+    def write(item):
+        return store_article(item['url'], item['article'], manifest=manifest, entry=item['entry'],
+                             detector=detector, **save_options)
+    
+    def on_error(item, e):
+        if isinstance(e, requests.RequestException):
+            message = f"网络请求失败: {str(e)}"
+        elif isinstance(e, CacheMiss):
+            message = str(e)
+        else:
+            message = f"提取文章失败: {str(e)}"
+        result = {'url': item['url'], 'success': False, 'error': message}
+        if recorder is not None:
+            recorder.finish(item['metrics'], result)
+        return result
+    
+    def instrumented(func, last):
+        """条目在各阶段的线程之间传递，指标记录随条目传递，在每个阶段中重新绑定"""
+        if recorder is None:
+            return func
+        
+        def run(item):
+            if 'metrics' not in item:
+                item['metrics'] = recorder.new(item['url'])
+            with metrics.bind(item['metrics']):
+                output = func(item)
+            if isinstance(output, Done) or last:
+                recorder.finish(item['metrics'], output.result if isinstance(output, Done) else output)
+            return output
+        return run
+    
+    if _process_pool is not None:
+        steps = [('fetch', fetch), ('parse', parse)]
+    else:
+        steps = [('fetch', fetch), ('extract', extract), ('convert', convert)]
+    if images:
+        steps.append(('images', download_images))
+    steps.append(('write', write))
+    stages = [
+        Stage(name, instrumented(func, last=i == len(steps) - 1), workers=stage_workers.get(name, 1),
+              queue_size=queue_size)
+        for i, (name, func) in enumerate(steps)
+    ]
+    runner = Pipeline(stages, on_error, on_result=on_result)
+    results = runner.run({'url': url} for url in urls)
+    return results, runner
+
+
+def parse_stage_workers(text, default_fetch):
+    """解析 'fetch=8,extract=2' 形式的各阶段线程数"""
+    workers = {'fetch': default_fetch, 'extract': 1, 'convert': 1, 'parse': 1, 'images': 1, 'write': 1}
+    for part in filter(None, (p.strip() for p in (text or '').split(','))):
+        name, _, count = part.partition('=')
+        if name.strip() not in workers or not count.strip().isdigit():
+            raise ValueError(f"无效的阶段线程数: {part}")
+        workers[name.strip()] = int(count)
+    return workers
+
+
+def print_result(index, total, result):
+    """打印单篇文章的处理结果"""
+    print(f"\n[{index}/{total}] 正在处理: {result['url']}")
+    if result.get('skipped'):
+        print(f"⏭️  已导入，跳过: {result['title']}")
+        print(f"   文件: {result['filepath']}")
+    elif result['success']:
+        print(f"✅ 成功: {result['title']}")
+        print(f"   保存到: {result['filepath']}")
+    else:
+        print(f"❌ 失败: {result['error']}")
+
+
 def main():
-    parser = argparse.ArgumentParser(description='抓取微信公众号文章并转换为 Markdown')
+    parser = argparse.ArgumentParser(description='抓取微信公众号文章并转换为 Markdown', conflict_handler='resolve')
     parser.add_argument('urls', nargs='*', help='微信公众号文章 URL')
     parser.add_argument('--file', '-f', help='从文件读取 URL 列表')
     parser.add_argument('--guest', '-g', help='嘉宾名称')
     parser.add_argument('--host', '-h', help='主持人名称（默认为"丽泽"）', default='丽泽')
     parser.add_argument('--tags', '-t', help='标签，用逗号分隔', default='')
     parser.add_argument('--output', '-o', help='输出目录（默认为 src/content/blog）')
+    parser.add_argument('--concurrency', '-c', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'并发抓取数（默认为 {DEFAULT_CONCURRENCY}，即逐篇处理）')
+    parser.add_argument('--per-host', type=int, default=DEFAULT_PER_HOST,
+                        help=f'同一域名的最大并发数（默认为 {DEFAULT_PER_HOST}）')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='流水线模式：抓取、提取、转换、写入分阶段并行')
+    parser.add_argument('--stage-workers', default='',
+                        help='流水线各阶段线程数，如 "fetch=8,extract=2,convert=2,write=1"（fetch 默认等于并发数）')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help=f'流水线阶段间队列长度（默认为 {DEFAULT_QUEUE_SIZE}）')
+    parser.add_argument('--processes', '-p', type=int, default=0,
+                        help='在 N 个进程中并行提取和转换 Markdown（默认为 0，不使用进程池）')
+    parser.add_argument('--pool-size', type=int, default=DEFAULT_POOL_SIZE,
+                        help=f'HTTP 连接池大小（默认为 {DEFAULT_POOL_SIZE}，不小于并发数）')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help=f'临时错误（5xx/429/超时）的最大重试次数（默认为 {DEFAULT_RETRIES}）')
+    parser.add_argument('--parser', choices=['lxml', 'bs4'], default=DEFAULT_ENGINE,
+                        help='HTML 解析引擎（默认为 lxml，失败时自动回退到 BeautifulSoup）')
+    parser.add_argument('--images', action='store_true',
+                        help='下载正文图片到 public/images/wechat（按内容哈希去重）并改写为站内链接')
+    parser.add_argument('--image-workers', type=int, default=DEFAULT_IMAGE_WORKERS,
+                        help=f'图片并发下载数（默认为 {DEFAULT_IMAGE_WORKERS}）')
+    parser.add_argument('--rules', help='追加的 Markdown 清理规则文件（JSON，见 markdown_rules.py）')
+    parser.add_argument('--force', action='store_true',
+                        help='忽略导入清单，重新抓取已导入的 URL（内容有变化时覆盖原文件）')
+    parser.add_argument('--manifest', default=str(MANIFEST_FILE),
+                        help='导入清单文件（默认为 scripts/.cache/import_manifest.jsonl）')
+    parser.add_argument('--reject-duplicates', action='store_true',
+                        help='不保存与已有文章近似重复的文章（MinHash 检测，见 near_duplicates.py，需要 numpy）')
+    parser.add_argument('--duplicate-threshold', type=float, default=0.8,
+                        help='估计的正文相似度不低于该值时视为重复（默认为 0.8）')
+    parser.add_argument('--stream', action='store_true',
+                        help='流式模式：边下载边转换，正文逐段写入文件，内存占用与文章大小无关（不使用响应缓存）')
+    parser.add_argument('--offline', action='store_true',
+                        help='离线模式：只从缓存重新解析和转换，不发送任何网络请求')
+    parser.add_argument('--no-cache', action='store_true', help='不使用响应缓存')
+    parser.add_argument('--job', help='任务状态文件（默认为 --file 对应的 scripts/.cache/jobs/<列表名>-<哈希>.jsonl）')
+    parser.add_argument('--no-job', action='store_true', help='--file 时不记录任务状态（每次从头处理整个列表）')
+    parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help=f'一个 URL 最多尝试的次数，之后不再自动重试（默认为 {DEFAULT_MAX_ATTEMPTS}）')
+    parser.add_argument('--retry-backoff', type=float, default=DEFAULT_RETRY_BACKOFF,
+                        help=f'失败后到第一次重试的等待秒数，之后每次加倍（默认为 {DEFAULT_RETRY_BACKOFF:g}）')
+    parser.add_argument('--wait-retries', action='store_true',
+                        help='本次运行中等待失败的 URL 到达重试时间并重试（默认留到下次运行）')
+    parser.add_argument('--report', help='结束时写出 JSON 报告（默认为任务状态文件旁的 .report.json）')
+    parser.add_argument('--metrics', help='把每篇文章的分阶段耗时、字节数、重试和缓存结果追加到该 JSON Lines 文件')
+    parser.add_argument('--prometheus', help='结束时把本次运行的汇总写成 Prometheus 文本文件（textfile collector）')
+    parser.add_argument('--profile', help='用 cProfile 分析本次运行，结果保存到该文件（pstats 格式）')
+    parser.add_argument('--cache-dir', default=str(response_cache.CACHE_DIR),
+                        help='响应缓存目录（默认为 scripts/.cache/http）')
+    parser.add_argument('--cache-size', type=int, default=response_cache.DEFAULT_MAX_SIZE_MB,
+                        help=f'响应缓存大小上限，单位 MB（默认为 {response_cache.DEFAULT_MAX_SIZE_MB}）')
     
     args = parser.parse_args()
     
@@ -322,6 +768,36 @@ def main():
         parser.print_help()
         return
     
+    if args.offline and args.no_cache:
+        parser.error('--offline 需要使用缓存，不能与 --no-cache 同时使用')
+    if (args.report or args.wait_retries) and not (args.job or (args.file and not args.no_job)):
+        parser.error('--report 和 --wait-retries 需要任务状态（使用 --file 或 --job）')
+    if args.max_attempts < 1:
+        parser.error('--max-attempts 必须大于 0')
+    if args.retry_backoff < 0:
+        parser.error('--retry-backoff 不能为负数')
+    if args.stream:
+        conflicts = [name for name, used in (('--pipeline', args.pipeline), ('--processes', args.processes > 0),
+                                             ('--offline', args.offline), ('--reject-duplicates', args.reject_duplicates))
+                     if used]
+        if conflicts:
+            parser.error(f"--stream 不能与 {', '.join(conflicts)} 同时使用")
+        if not stream_extract.AVAILABLE:
+            parser.error('--stream 需要安装 lxml')
+    
+    with metrics.profiled(args.profile) if args.profile else contextlib.nullcontext():
+        run_import(args, urls, parser)
+
+
+def run_import(args, urls, parser):
+    """按命令行参数配置各共享组件并导入全部 URL，最后打印总结"""
+    stage_workers = None
+    if args.pipeline:
+        try:
+            stage_workers = parse_stage_workers(args.stage_workers, args.concurrency)
+        except ValueError as e:
+            parser.error(str(e))
+    
     # 解析标签
     tags = [tag.strip() for tag in args.tags.split(',')] if args.tags else None
     
@@ -331,45 +807,178 @@ def main():
     print(f"📝 准备处理 {len(urls)} 篇文章...")
     print(f"📁 输出目录: {output_dir}")
     
-    results = []
-    for i, url in enumerate(urls, 1):
-        print(f"\n[{i}/{len(urls)}] 正在处理: {url}")
+    concurrency, per_host = args.concurrency, args.per_host
+    if args.processes > 0 and not args.pipeline:
+        # 逐篇处理时每个线程阻塞等待工作进程的结果，线程数不少于进程数才能让所有工作进程同时工作；
+        # 离线模式不发送网络请求，不需要单域名并发上限
+        concurrency = max(concurrency, args.processes)
+        if args.offline:
+            per_host = 0
+    if concurrency > 1:
+        print(f"⚡ 并发数: {concurrency}（单域名上限 {per_host or '无'}）")
+    
+    fetch_workers = stage_workers['fetch'] if stage_workers else concurrency
+    pool_size = max(args.pool_size, fetch_workers + (args.image_workers if args.images else 0))
+    client = configure_client(pool_size=pool_size, retries=args.retries)
+    cache = configure_cache(args.cache_dir, args.cache_size, enabled=not args.no_cache)
+    if args.offline:
+        print("📦 离线模式: 只从缓存读取页面")
+    if args.stream:
+        print("🌊 流式模式: 边下载边转换（不使用响应缓存）")
+    manifest = ImportManifest(args.manifest)
+    images = configure_store(client, workers=args.image_workers, enabled=args.images)
+    if images is not None:
+        print(f"🖼️  下载图片: {args.image_workers} 个并发，保存到 {image_store.IMAGE_DIR}")
+    if args.rules:
         try:
-            article_data = extract_wechat_article(url)
-            filepath = save_article(
-                article_data,
+            markdown_rules.load_rules(args.rules, MARKDOWN_RULES)
+        except (OSError, ValueError, KeyError) as e:
+            parser.error(f"无法加载清理规则 {args.rules}: {e}")
+        print(f"🧹 已加载清理规则: {args.rules}")
+    recorder = metrics.configure_recorder(args.metrics, args.prometheus,
+                                          enabled=bool(args.metrics or args.prometheus))
+    if args.metrics:
+        print(f"📊 分阶段指标: {args.metrics}")
+    if args.processes > 0:
+        configure_process_pool(args.processes, args.rules)
+        print(f"🧮 进程池: {args.processes} 个进程负责提取和转换")
+        if stage_workers is not None:
+            stage_workers['parse'] = max(stage_workers['parse'], args.processes)
+    detector = None
+    if args.reject_duplicates:
+        # numpy 只在检测重复时需要，按需导入
+        from near_duplicates import DuplicateDetector
+        from article_index import COLLECTIONS
+        collections = dict(COLLECTIONS)
+        if output_dir.resolve() not in {d.resolve() for d in collections.values()}:
+            collections['output'] = output_dir
+        detector = DuplicateDetector(args.duplicate_threshold, collections)
+        print(f"🔍 重复检测: 已加载 {len(detector.labels)} 篇文章的签名，相似度阈值 {args.duplicate_threshold}")
+    
+    job = None
+    todo = urls
+    if args.job or (args.file and not args.no_job):
+        state_file = Path(args.job) if args.job else default_state_file(args.file)
+        job = JobState(state_file, max_attempts=args.max_attempts, retry_backoff=args.retry_backoff)
+        todo, waiting, finished = job.plan(urls, force=args.force)
+        print(f"📋 任务状态: {state_file}（本次处理 {len(todo)}，等待重试 {len(waiting)}，已结束 {len(finished)}）")
+    
+    runner = None
+    # 每个 URL 最后一次的结果，处理完一个记录一个，中断时已完成的 URL 也会出现在总结中
+    latest = {}
+    
+    def finish(url, result):
+        if job is not None:
+            job.record(url, result)
+        latest[url] = result
+    
+    def import_urls(batch):
+        """处理一批 URL，每个 URL 处理完后记录到任务状态和 latest"""
+        def on_result(i, result):
+            if args.pipeline:
+                finish(result['url'], result)
+            print_result(i, len(batch), result)
+        
+        if args.pipeline:
+            shown = ['fetch', 'parse'] if args.processes > 0 else ['fetch', 'extract', 'convert']
+            shown += ['images', 'write'] if args.images else ['write']
+            print("🔀 流水线模式: " + ', '.join(f"{name}×{stage_workers[name]}" for name in shown))
+            return run_pipeline(
+                batch,
+                stage_workers,
+                queue_size=args.queue_size,
+                per_host=args.per_host,
+                offline=args.offline,
+                manifest=manifest,
+                force=args.force,
+                engine=args.parser,
+                images=args.images,
+                detector=detector,
+                on_result=on_result,
                 output_dir=output_dir,
                 guest=args.guest,
                 host=args.host,
                 tags=tags
             )
-            results.append({
-                'url': url,
-                'success': True,
-                'filepath': str(filepath),
-                'title': article_data['title']
-            })
-            print(f"✅ 成功: {article_data['title']}")
-            print(f"   保存到: {filepath}")
-        except Exception as e:
-            print(f"❌ 失败: {str(e)}")
-            results.append({
-                'url': url,
-                'success': False,
-                'error': str(e)
-            })
+        
+        def process(url):
+            result = process_url(url, output_dir=output_dir, guest=args.guest, host=args.host, tags=tags,
+                                 offline=args.offline, manifest=manifest, force=args.force,
+                                 engine=args.parser, images=args.images, detector=detector, stream=args.stream)
+            # 并发时结果按输入顺序回调，在工作线程中立即记录，中断时已完成的 URL 不会丢失
+            finish(url, result)
+            return result
+        
+        return run_batch(
+            batch,
+            process,
+            concurrency=concurrency,
+            per_host=per_host,
+            on_result=lambda i, url, result: on_result(i, result)
+        ), None
+    
+    interrupted = False
+    started = time.time()
+    try:
+        batch = todo
+        while True:
+            if batch:
+                runner = import_urls(batch)[1]
+            if job is None or not args.wait_retries:
+                break
+            # 等到最早的重试时间，再处理到期的失败 URL，直到全部成功或放弃
+            next_retry = job.next_retry(urls)
+            if next_retry is None:
+                break
+            delay = max(0.0, next_retry - time.time())
+            print(f"\n⏳ {delay:.0f}s 后重试失败的 URL...")
+            time.sleep(delay)
+            batch = job.plan(urls)[0]
+    except KeyboardInterrupt:
+        interrupted = True
+        print("\n⚠️  已中断" + ("，再次运行同一列表时从中断处继续" if job is not None else ""))
+    results = [latest[url] for url in dict.fromkeys(urls) if url in latest]
+    manifest.compact()
+    configure_process_pool(0)
+    configure_store(client, enabled=False)
+    metrics.configure_recorder(enabled=False)
+    report = None
+    if job is not None:
+        job.compact()
+        report_path = Path(args.report) if args.report else job.path.with_suffix('.report.json')
+        report = job.write_report(report_path, urls, started, interrupted)
     
     # 打印总结
     print("\n" + "="*60)
     print("处理完成！")
     print("="*60)
     success_count = sum(1 for r in results if r['success'])
-    print(f"成功: {success_count}/{len(results)}")
+    skipped_count = sum(1 for r in results if r.get('skipped'))
+    print(f"成功: {success_count}/{len(results)}（其中已导入跳过 {skipped_count} 篇）")
+    if detector is not None:
+        print(f"重复未保存: {sum(1 for r in results if r.get('duplicate'))} 篇")
+    print(f"网络: {format_stats(client.stats)}")
+    if cache is not None:
+        print(f"缓存: {response_cache.format_stats(cache.stats)}")
+    if images is not None:
+        print(f"图片: {image_store.format_stats(images.stats)}")
+    if runner is not None:
+        print("\n流水线各阶段统计:")
+        print(runner.format_stats())
+    if report is not None:
+        print(f"任务: {format_summary(report['summary'])}（报告: {report_path}）")
+        if report['summary'].get('failed'):
+            print("   失败的 URL 已加入重试队列，再次运行同一列表时到期的会重新抓取")
+    if recorder is not None:
+        print("\n各阶段耗时:")
+        print(recorder.format_summary())
+        if args.prometheus:
+            print(f"Prometheus 指标已写入 {args.prometheus}")
     
     if success_count > 0:
         print("\n成功保存的文章:")
         for r in results:
-            if r['success']:
+            if r['success'] and not r.get('skipped'):
                 print(f"  ✓ {r['title']}")
                 print(f"    {r['filepath']}")
 
@@ -2,45 +2,33 @@
 # -*- coding: utf-8 -*-
 """
 修复文章格式，确保符合项目要求
+只读取文件头部判断是否需要修复，头部已符合要求且正文两端没有多余空白时不读取正文。
+
+增量模式（默认）：记录每个文件检查或修复后的修改时间和大小，下次运行时两者都未变的文件直接跳过；
+有变化的文件只读取头部重新检查（不计算全文哈希），由线程池并行处理，写入先写临时文件再原子改名
 """
 
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import re
 from datetime import datetime
 
-BLOG_DIR = Path(__file__).parent.parent / "src" / "content" / "blog"
+from frontmatter_io import read_header, dump_frontmatter, write_document
+from fs_utils import atomic_write
 
+BLOG_DIR = Path(__file__).parent.parent / "src" / "content" / "blog"
+STATE_FILE = Path(__file__).parent / ".cache" / "fix_state.json"
+# 修复规则或状态格式变化时递增，使之前记录的状态失效
+STATE_VERSION = 3
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
 
-def fix_frontmatter(content, filename):
-    """修复 frontmatter 格式"""
-    if not content.startswith('---'):
-        # 如果没有 frontmatter，添加默认的
-        title = filename.replace('.md', '')
-        frontmatter = f'''---
-title: "{title}"
-pubDate: {datetime.now().strftime('%Y-%m-%d')}
----
 
-'''
-        return frontmatter + content
-    
-    # 解析现有的 frontmatter
-    parts = content.split('---', 2)
-    if len(parts) < 3:
-        return content
-    
-    frontmatter_text = parts[1].strip()
-    body = parts[2].strip()
-    
-    # 解析字段
-    frontmatter_dict = {}
-    for line in frontmatter_text.split('\n'):
-        if ':' in line:
-            key, value = line.split(':', 1)
-            key = key.strip()
-            value = value.strip().strip('"').strip("'")
-            frontmatter_dict[key] = value
-    
+def fix_fields(frontmatter_dict, filename):
+    """补全和清理 frontmatter 字段"""
     # 确保必需的字段存在
     if 'title' not in frontmatter_dict:
         frontmatter_dict['title'] = filename.replace('.md', '')
@@ -54,44 +42,109 @@ pubDate: {datetime.now().strftime('%Y-%m-%d')}
     # 移除不需要的字段（blog 集合不支持 author 和 tags）
     frontmatter_dict.pop('author', None)
     frontmatter_dict.pop('tags', None)
-    
-    # 重新生成 frontmatter
-    frontmatter_lines = ['---']
-    for key, value in frontmatter_dict.items():
-        if isinstance(value, str) and (' ' in value or ':' in value or '"' in value):
-            # 转义引号
-            value = value.replace('"', '\\"')
-            frontmatter_lines.append(f'{key}: "{value}"')
-        else:
-            frontmatter_lines.append(f'{key}: {value}')
-    frontmatter_lines.append('---')
-    
-    return '\n\n'.join(['\n'.join(frontmatter_lines), body])
+    return frontmatter_dict
+
+
+def fix_file(filepath):
+    """
+    修复单个文件（头部和正文直接写入，原子替换），返回写入内容的 SHA-256；无需修复时返回 None
 
+    只读取头部判断是否需要修复；需要修复时正文按字节范围从原文件复制，不整体读入内存
+    """
+    header = read_header(filepath)
+    if header.unterminated:
+        # 以 --- 开头但找不到结束的 ---，无法区分头部和正文，保持原样
+        return None
+    if not header.has_frontmatter:
+        # 没有 frontmatter，添加默认的
+        fields = fix_fields({}, filepath.name)
+    else:
+        fields = fix_fields(header.fields, filepath.name)
+        if dump_frontmatter(fields) == header.raw and header.is_normalized():
+            return None
+    return write_document(filepath, fields, header)
 
-def fix_all_articles():
+
+def load_state(path=STATE_FILE):
+    """读取上次运行记录的 文件名 -> {mtime, size}"""
+    try:
+        data = json.loads(Path(path).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+    return data.get('files', {}) if data.get('version') == STATE_VERSION else {}
+
+
+def save_state(files, path=STATE_FILE):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write(path, json.dumps({'version': STATE_VERSION, 'files': files}, ensure_ascii=False))
+
+
+def _state_entry(filepath):
+    st = filepath.stat()
+    return {'mtime': st.st_mtime_ns, 'size': st.st_size}
+
+
+def process_file(filepath, entry=None):
+    """
+    检查并修复单个文件，返回 (状态, 新的状态记录, 错误信息)
+
+    状态为 unchanged（修改时间和大小与上次记录相同，未检查）、ok（无需修复）、fixed 或 error；
+    有变化的文件直接交给 fix_file 检查头部，不读取整个文件
+    """
+    try:
+        st = filepath.stat()
+        if entry and entry['mtime'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            return 'unchanged', entry, None
+        status = 'ok' if fix_file(filepath) is None else 'fixed'
+        return status, _state_entry(filepath), None
+    except Exception as e:
+        return 'error', None, str(e)
+
+
+def fix_all_articles(workers=DEFAULT_WORKERS, incremental=True, state_file=STATE_FILE, verbose=False):
     """修复所有文章"""
-    files = list(BLOG_DIR.glob("*.md"))
+    start = time.perf_counter()
+    files = sorted(BLOG_DIR.glob("*.md"))
+    state = load_state(state_file) if incremental else {}
     
     print(f"找到 {len(files)} 个文件\n")
     
+    counts = {'unchanged': 0, 'ok': 0, 'fixed': 0, 'error': 0}
+    new_state = {}
     fixed = []
-    for filepath in files:
-        try:
-            content = filepath.read_text(encoding='utf-8')
-            fixed_content = fix_frontmatter(content, filepath.name)
-            
-            if fixed_content != content:
-                filepath.write_text(fixed_content, encoding='utf-8')
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = executor.map(lambda fp: process_file(fp, state.get(fp.name)), files)
+        for filepath, (status, entry, error) in zip(files, results):
+            counts[status] += 1
+            if entry is not None:
+                new_state[filepath.name] = entry
+            if status == 'fixed':
                 fixed.append(filepath.name)
                 print(f"[OK] 已修复: {filepath.name}")
-            else:
+            elif status == 'error':
+                print(f"[ERROR] 处理失败 {filepath.name}: {error}")
+            elif status == 'ok' or verbose:
                 print(f"[SKIP] 无需修复: {filepath.name}")
-        except Exception as e:
-            print(f"[ERROR] 处理失败 {filepath.name}: {str(e)}")
+    process_time = time.perf_counter() - start
+    
+    save_state(new_state, state_file)
+    elapsed = time.perf_counter() - start
     
     print(f"\n修复完成！共修复 {len(fixed)} 个文件")
+    print(f"未变化跳过 {counts['unchanged']} 个，检查后无需修复 {counts['ok']} 个，失败 {counts['error']} 个")
+    rate = len(files) / process_time if process_time else 0
+    print(f"耗时: 处理 {process_time:.2f}s（{max(1, workers)} 个线程，{rate:.0f} 个文件/s），"
+          f"保存状态 {elapsed - process_time:.2f}s，共 {elapsed:.2f}s")
+    return fixed
 
 
 if __name__ == '__main__':
-    fix_all_articles()
+    parser = argparse.ArgumentParser(description='修复文章格式，确保符合项目要求')
+    parser.add_argument('--workers', '-w', type=int, default=DEFAULT_WORKERS,
+                        help=f'并行处理的线程数（默认为 {DEFAULT_WORKERS}）')
+    parser.add_argument('--full', action='store_true', help='忽略上次记录的状态，重新检查所有文件')
+    parser.add_argument('--state', default=str(STATE_FILE), help='状态文件（默认为 scripts/.cache/fix_state.json）')
+    parser.add_argument('--verbose', '-v', action='store_true', help='同时列出未变化而跳过的文件')
+    args = parser.parse_args()
+    fix_all_articles(workers=args.workers, incremental=not args.full, state_file=args.state, verbose=args.verbose)
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+frontmatter 的读取、解析和写入（所有脚本共用）
+
+读取：逐行读取到结束的 --- 为止，返回解析后的字段和正文的起始字节偏移，不读取正文；
+确实需要正文时再通过 seek 或 mmap 按需读取。列表、索引等只需要元数据的操作因此几乎不涉及正文 I/O。
+
+解析：常见的单行 "键: 值" 头部由快速解析器直接处理（标量类型的判断与 PyYAML 一致），
+多行值、锚点等复杂语法交给 YAML 解析，YAML 也解析失败时退回逐行按冒号拆分。
+
+写入：序列化结果是确定的，字段顺序与 src/content/config.ts 中 blog 集合的 schema 一致
+（title、date、pubDate、description，其余字段按名称排序）；头部和正文直接写入目标文件，
+正文可以是字符串，也可以是另一个文件的 Header（按字节范围复制，不在内存中拼接整篇文章）。
+文章格式统一为：头部 + 空行 + 去掉首尾空白的正文
+"""
+
+import hashlib
+import json
+import mmap
+import re
+from contextlib import contextmanager
+from datetime import date, datetime
+from pathlib import Path
+
+from fs_utils import atomic_open
+
+DELIMITER = b'---'
+BOM = b'\xef\xbb\xbf'
+# 超过这个大小还没有遇到结束的 --- 时，视为没有 frontmatter（避免把整篇正文当作头部读入）
+MAX_HEADER_BYTES = 64 * 1024
+# 查找正文首尾空白时每次读取的字节数
+_WINDOW = 256
+_COPY_CHUNK = 1024 * 1024
+
+# blog 集合的 schema：字段顺序与类型
+SCHEMA_FIELDS = ('title', 'date', 'pubDate', 'description')
+STRING_FIELDS = ('title', 'description')
+DATE_FIELDS = ('date', 'pubDate')
+
+_LINE = re.compile(r'([A-Za-z_][\w-]*):(?:[ \t]+(.*?))?[ \t]*$')
+_ISO_DATE = re.compile(r'\d{4}-\d{2}-\d{2}$')
+_DECIMAL = re.compile(r'[-+]?(0|[1-9][0-9]*)$')
+# 行内列表的一项：双引号、单引号或不含特殊字符的无引号标量，后面是逗号或结尾
+_LIST_ITEM = re.compile(r"""[ \t]*("(?:[^"\\]|\\.)*"|'(?:[^']|'')*'|[^,\[\]{}"'#]*?)[ \t]*(,|$)""")
+_STR_TAG = 'tag:yaml.org,2002:str'
+
+# PyYAML 在第一次解析头部时才导入：只读取索引的命令（列表、删除等）不需要解析，省去导入的时间
+_yaml = None
+_Loader = None
+_RESOLVER = None
+
+
+def _load_yaml():
+    global _yaml, _Loader, _RESOLVER
+    if _yaml is None:
+        import yaml
+        # 未编译 libyaml 时使用纯 Python 的 SafeLoader
+        _Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+        _RESOLVER = yaml.resolver.Resolver()
+        _yaml = yaml
+    return _yaml
+
+
+class _Unsupported(Exception):
+    """快速解析器不支持的语法，交给 YAML 解析"""
+
+
+def _scalar(value):
+    """按 PyYAML 的规则判断无引号标量的类型；只接受字符串、十进制整数、布尔、空值和 YYYY-MM-DD 日期"""
+    if not value:
+        return None
+    if value[0] in '{&*!|>%@`#?' or value.startswith(('- ', '? ')) or ' #' in value or ': ' in value \
+            or value.endswith(':'):
+        raise _Unsupported(value)
+    yaml = _load_yaml()
+    tag = _RESOLVER.resolve(yaml.ScalarNode, value, (True, False))
+    if tag == _STR_TAG:
+        return value
+    if tag.endswith(':null'):
+        return None
+    if tag.endswith(':bool'):
+        if value.lower() in ('true', 'yes', 'on'):
+            return True
+        if value.lower() in ('false', 'no', 'off'):
+            return False
+    if tag.endswith(':int') and _DECIMAL.match(value):
+        return int(value)
+    if tag.endswith(':timestamp') and _ISO_DATE.match(value):
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            pass
+    raise _Unsupported(value)
+
+
+def _value(value):
+    if value is None or value == '':
+        return None
+    if value[0] == '"':
+        if len(value) < 2 or value[-1] != '"':
+            raise _Unsupported(value)
+        try:
+            return json.loads(value)
+        except ValueError:
+            raise _Unsupported(value)
+    if value[0] == "'":
+        inner = value[1:-1]
+        if len(value) < 2 or value[-1] != "'" or "'" in inner.replace("''", ''):
+            raise _Unsupported(value)
+        return inner.replace("''", "'")
+    if value[0] == '[':
+        if value[-1] != ']':
+            raise _Unsupported(value)
+        inner = value[1:-1].strip()
+        if not inner:
+            return []
+        items = []
+        pos = 0
+        while pos <= len(inner):
+            match = _LIST_ITEM.match(inner, pos)
+            if not match or not match.group(1):
+                raise _Unsupported(value)
+            items.append(_value(match.group(1)))
+            pos = match.end()
+            if match.group(2) == '':
+                break
+        return items
+    return _scalar(value)
+
+
+def _parse_flat(text):
+    """快速解析只包含单行 "键: 值" 的头部；遇到不支持的语法抛出 _Unsupported"""
+    fields = {}
+    for line in text.split('\n'):
+        line = line.rstrip('\r')
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        match = _LINE.match(line)
+        if not match or match.group(1) in fields:
+            raise _Unsupported(line)
+        fields[match.group(1)] = _value(match.group(2))
+    return fields
+
+
+def parse_yaml(text):
+    """按 YAML 解析（与 python-frontmatter 一致，日期解析为 date 对象）"""
+    yaml = _load_yaml()
+    data = yaml.load(text, Loader=_Loader) if text.strip() else {}
+    if not isinstance(data, dict):
+        raise ValueError("frontmatter 不是键值对")
+    return data
+
+
+def parse_simple(text):
+    """逐行按第一个冒号拆分为 键: 值，去掉值两边的引号（YAML 无法解析时的宽松解析）"""
+    fields = {}
+    for line in text.strip().split('\n'):
+        if ':' in line:
+            key, value = line.split(':', 1)
+            fields[key.strip()] = value.strip().strip('"').strip("'")
+    return fields
+
+
+def parse_fields(text):
+    """解析 frontmatter 文本：快速解析 -> YAML -> 宽松解析，保证不会因格式问题而失败"""
+    try:
+        return _parse_flat(text)
+    except _Unsupported:
+        pass
+    try:
+        return parse_yaml(text)
+    except (_load_yaml().YAMLError, ValueError):
+        return parse_simple(text)
+
+
+def _format_scalar(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    # JSON 字符串同时也是合法的 YAML 双引号字符串，转义规则确定
+    return json.dumps(str(value), ensure_ascii=False)
+
+
+def format_value(key, value):
+    """按 schema 格式化单个字段的值"""
+    if key in STRING_FIELDS:
+        return json.dumps(str(value), ensure_ascii=False)
+    if key in DATE_FIELDS:
+        if isinstance(value, (datetime, date)):
+            return value.strftime('%Y-%m-%d')
+        if isinstance(value, str) and _ISO_DATE.match(value):
+            return value
+        return _format_scalar(value)
+    if isinstance(value, (list, tuple)):
+        return '[' + ', '.join(_format_scalar(v) for v in value) + ']'
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return _format_scalar(value)
+
+
+def dump_frontmatter(fields):
+    """序列化为头部文本（含首尾的 ---，不含结尾换行）；值为 None 的字段省略"""
+    keys = [k for k in SCHEMA_FIELDS if k in fields] + sorted(k for k in fields if k not in SCHEMA_FIELDS)
+    lines = ['---']
+    lines.extend(f'{key}: {format_value(key, fields[key])}' for key in keys if fields[key] is not None)
+    lines.append('---')
+    return '\n'.join(lines)
+
+
+class Header:
+    """
+    文件的 frontmatter 头部
+
+    fields 为解析后的字段，raw 为头部原文（从开头的 --- 到结束的 ---，不含其后的换行），
+    text 为两个分隔符之间的文本，body_offset 为正文起始的字节偏移；
+    unterminated 表示第一行是 --- 但找不到结束的 ---
+    """
+
+    def __init__(self, path, has_frontmatter, raw, text, body_offset, size, fields, unterminated=False):
+        self.path = Path(path)
+        self.has_frontmatter = has_frontmatter
+        self.raw = raw
+        self.text = text
+        self.body_offset = body_offset
+        self.size = size
+        self.fields = fields
+        self.unterminated = unterminated
+        self._body = None
+        self._bounds = None
+
+    @property
+    def body_size(self):
+        return self.size - self.body_offset
+
+    def read_body_bytes(self, start=0, length=None):
+        """从正文的 start 字节处读取 length 字节（默认读到文件末尾），start 为负数时从末尾倒数"""
+        if start < 0:
+            start = max(0, self.body_size + start)
+        with open(self.path, 'rb') as f:
+            f.seek(self.body_offset + start)
+            return f.read() if length is None else f.read(length)
+
+    @property
+    def body(self):
+        """正文文本（第一次访问时才读取）"""
+        if self._body is None:
+            self._body = self.read_body_bytes().decode('utf-8')
+        return self._body
+
+    @contextmanager
+    def open_body(self):
+        """以二进制方式打开文件并定位到正文开头，用于只读取正文前缀等流式读取"""
+        with open(self.path, 'rb') as f:
+            f.seek(self.body_offset)
+            yield f
+
+    @contextmanager
+    def body_view(self):
+        """通过 mmap 获取正文的只读 memoryview（不复制数据；空正文时为空的 memoryview）"""
+        if self.body_size <= 0:
+            yield memoryview(b'')
+            return
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)[self.body_offset:]
+            try:
+                yield view
+            finally:
+                view.release()
+
+    def stripped_bounds(self):
+        """
+        去掉首尾空白（与 str.strip() 相同，包括全角空格等）后正文的字节范围 (start, end)，相对正文开头；
+        只读取两端的少量字节
+        """
+        if self._bounds is not None:
+            return self._bounds
+        size = self.body_size
+        with open(self.path, 'rb') as f:
+            start = 0
+            while start < size:
+                f.seek(self.body_offset + start)
+                text = f.read(_WINDOW).decode('utf-8', errors='ignore')
+                stripped = text.lstrip()
+                start += len(text[:len(text) - len(stripped)].encode('utf-8'))
+                if stripped or not text:
+                    break
+            end = size
+            while end > start:
+                length = min(_WINDOW, end - start)
+                f.seek(self.body_offset + end - length)
+                text = f.read(length).decode('utf-8', errors='ignore')
+                stripped = text.rstrip()
+                end -= len(text[len(stripped):].encode('utf-8'))
+                if stripped or not text:
+                    break
+        self._bounds = (start, max(start, end))
+        return self._bounds
+
+    def is_normalized(self):
+        """正文是否已是统一格式：结束的 --- 后空一行，正文两端没有多余空白"""
+        start, end = self.stripped_bounds()
+        if start == end:
+            return self.body_size == 1 and self.read_body_bytes() == b'\n'
+        return start == 1 and end == self.body_size and self.read_body_bytes(0, 1) == b'\n'
+
+    def copy_body(self, write):
+        """把去掉首尾空白的正文按块传给 write（不整体读入内存）"""
+        start, end = self.stripped_bounds()
+        with open(self.path, 'rb') as f:
+            f.seek(self.body_offset + start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = f.read(min(_COPY_CHUNK, remaining))
+                if not chunk:
+                    break
+                write(chunk)
+                remaining -= len(chunk)
+
+
+def read_header(path, parse=parse_fields):
+    """
+    读取文件的 frontmatter 头部，不读取正文
+
+    没有 frontmatter（第一行不是 ---，或找不到结束的 ---）时 has_frontmatter 为 False，
+    body_offset 为 0，fields 为空字典；parse 为 None 时不解析字段（fields 为 None）
+    """
+    path = Path(path)
+    with open(path, 'rb') as f:
+        size = f.seek(0, 2)
+        f.seek(0)
+        first = f.readline()
+        start = len(BOM) if first.startswith(BOM) else 0
+        lines = []
+        found = False
+        opened = first[start:].rstrip(b'\r\n') == DELIMITER
+        if opened:
+            read = len(first)
+            while read <= MAX_HEADER_BYTES:
+                line = f.readline()
+                if not line:
+                    break
+                read += len(line)
+                if line.rstrip(b'\r\n') == DELIMITER:
+                    found = True
+                    break
+                lines.append(line)
+        if not found:
+            return Header(path, False, '', '', 0, size, {} if parse else None, unterminated=opened)
+        body_offset = f.tell()
+
+    text = b''.join(lines).decode('utf-8')
+    raw = (first[start:] + b''.join(lines) + DELIMITER).decode('utf-8')
+    fields = parse(text) if parse else None
+    return Header(path, True, raw, text, body_offset, size, fields)
+
+
+def render_document(fields, body, write):
+    """
+    按统一格式把文章分块传给 write(bytes)：头部、空行、去掉首尾空白的正文
+
+    body 为字符串或 Header（从原文件按字节范围复制正文）
+    """
+    write(dump_frontmatter(fields).encode('utf-8'))
+    write(b'\n\n')
+    if isinstance(body, Header):
+        body.copy_body(write)
+    elif body:
+        write(body.strip().encode('utf-8'))
+
+
+def document_hash(fields, body):
+    """按统一格式写出时文件内容的 SHA-256（不生成完整文档）"""
+    digest = hashlib.sha256()
+    render_document(fields, body, digest.update)
+    return digest.hexdigest()
+
+
+def write_document(path, fields, body, exclusive=False):
+    """
+    把头部和正文直接写入文件，返回写入内容的 SHA-256
+
+    默认原子写入（临时文件 + 改名，正文可以来自同一个文件）；exclusive=True 时以独占模式创建，
+    文件已存在时抛出 FileExistsError
+    """
+    digest = hashlib.sha256()
+
+    def write_to(f):
+        def write(chunk):
+            digest.update(chunk)
+            f.write(chunk)
+        render_document(fields, body, write)
+
+    if exclusive:
+        with open(path, 'xb') as f:
+            write_to(f)
+    else:
+        with atomic_open(path, 'wb') as f:
+            write_to(f)
+    return digest.hexdigest()
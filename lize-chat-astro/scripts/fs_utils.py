@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件写入工具
+先写入同目录下的临时文件并刷到磁盘，再原子地改名为目标文件：
+进程崩溃或中断时目标文件要么是旧内容，要么是完整的新内容，不会留下写了一半的文章
+"""
+
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def _temp_path(path):
+    # 以 . 开头、以 .tmp 结尾，不会被 *.md 的 glob 匹配到
+    return path.with_name(f".{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+
+
+@contextmanager
+def atomic_open(path, mode='w', encoding='utf-8'):
+    """
+    以原子方式写入文件的上下文管理器：正常退出时替换目标文件，出现异常时删除临时文件
+
+        with atomic_open(path) as f:
+            f.write(...)
+    """
+    path = Path(path)
+    tmp = _temp_path(path)
+    f = open(tmp, mode, encoding=None if 'b' in mode else encoding, newline=None if 'b' in mode else '')
+    try:
+        yield f
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        os.replace(tmp, path)
+    except BaseException:
+        f.close()
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def atomic_write(path, data, encoding='utf-8'):
+    """原子写入文本或字节"""
+    with atomic_open(path, 'wb' if isinstance(data, bytes) else 'w', encoding) as f:
+        f.write(data)
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    """文件内容的 SHA-256（分块读取）"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文章图片下载与按内容寻址的存储
+从 Markdown 中收集图片链接（来自正文 #js_content 中 img 的 data-src/src），用有界线程池并发下载，
+边下载边计算 SHA-256 并流式写入磁盘；相同内容的图片只保存一份：
+public/images/wechat/<哈希前两位>/<哈希>.<扩展名>，最后把 Markdown 中的图片链接改写为站内路径
+
+用法（在 127.0.0.1 上启动本地 HTTP 服务，检查下载、去重、目录布局、URL 索引和失败处理）：
+    python image_store.py --self-check
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+
+# 默认配置
+PUBLIC_DIR = Path(__file__).parent.parent / "public"
+IMAGE_DIR = PUBLIC_DIR / "images" / "wechat"
+URL_INDEX_FILE = Path(__file__).parent / ".cache" / "image_urls.json"
+DEFAULT_IMAGE_WORKERS = 8
+CHUNK_SIZE = 64 * 1024
+
+# Markdown 图片链接：![alt](url) 或 ![alt](url "title")
+IMAGE_LINK = re.compile(r'!\[([^\]]*)\]\((<[^>]+>|[^)\s]+)((?:\s+"[^"]*")?)\)')
+
+CONTENT_TYPE_EXT = {
+    'image/jpeg': '.jpg',
+    'image/jpg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'image/svg+xml': '.svg',
+    'image/bmp': '.bmp',
+}
+WX_FMT_EXT = {'jpeg': '.jpg', 'jpg': '.jpg', 'png': '.png', 'gif': '.gif', 'webp': '.webp', 'svg': '.svg'}
+
+
+def collect_image_urls(markdown_content):
+    """按出现顺序收集 Markdown 中的远程图片链接（去重）"""
+    urls = []
+    seen = set()
+    for match in IMAGE_LINK.finditer(markdown_content):
+        url = match.group(2).strip('<>')
+        if url.startswith(('http://', 'https://')) and url not in seen:
+            seen.add(url)
+            urls.append(url)
+    return urls
+
+
+def guess_extension(url, content_type=None):
+    """根据 Content-Type 或微信图片的 wx_fmt 参数判断扩展名"""
+    if content_type:
+        ext = CONTENT_TYPE_EXT.get(content_type.split(';')[0].strip().lower())
+        if ext:
+            return ext
+    parts = urlsplit(url)
+    fmt = parse_qs(parts.query).get('wx_fmt', [''])[0].lower()
+    if fmt in WX_FMT_EXT:
+        return WX_FMT_EXT[fmt]
+    suffix = Path(parts.path).suffix.lower()
+    return suffix if suffix in WX_FMT_EXT.values() else '.jpg'
+
+
+class ImageStore:
+    """按内容寻址的图片存储，线程安全；同一 URL 在一次运行中只下载一次"""
+
+    def __init__(self, client, image_dir=IMAGE_DIR, public_dir=PUBLIC_DIR, index_file=URL_INDEX_FILE,
+                 workers=DEFAULT_IMAGE_WORKERS):
+        self.client = client
+        self.image_dir = Path(image_dir)
+        self.public_dir = Path(public_dir)
+        self.index_file = Path(index_file) if index_file else None
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._index = self._load_index()
+        self.stats = {'downloaded': 0, 'deduplicated': 0, 'reused': 0, 'failed': 0, 'bytes': 0}
+
+    def _load_index(self):
+        if self.index_file and self.index_file.exists():
+            try:
+                return json.loads(self.index_file.read_text(encoding='utf-8'))
+            except ValueError:
+                pass
+        return {}
+
+    def save_index(self):
+        """保存 URL -> 站内路径 的索引，下次遇到同一 URL 不再下载"""
+        if not self.index_file:
+            return
+        with self._lock:
+            data = json.dumps(self._index, ensure_ascii=False, indent=0)
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_file.with_name(self.index_file.name + '.tmp')
+        tmp.write_text(data, encoding='utf-8')
+        os.replace(tmp, self.index_file)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def _public_path(self, filepath):
+        return '/' + filepath.relative_to(self.public_dir).as_posix()
+
+    def _download(self, url):
+        """流式下载到临时文件并计算哈希，按哈希改名；内容已存在时丢弃临时文件"""
+        self.image_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.image_dir / f".download-{os.getpid()}-{threading.get_ident()}.tmp"
+        digest = hashlib.sha256()
+        size = 0
+        response = self.client.get(url, stream=True)
+        try:
+            response.raise_for_status()
+            with open(tmp, 'wb') as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            ext = guess_extension(url, response.headers.get('Content-Type'))
+        except Exception:
+            tmp.unlink(missing_ok=True)
+            raise
+        finally:
+            response.close()
+
+        sha = digest.hexdigest()
+        target = self.image_dir / sha[:2] / f"{sha}{ext}"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if target.exists():
+            tmp.unlink()
+            self._count('deduplicated')
+        else:
+            os.replace(tmp, target)
+            self._count('downloaded')
+            self._count('bytes', size)
+        return self._public_path(target)
+
+    def _resolve(self, url):
+        try:
+            path = self._download(url)
+        except Exception:
+            self._count('failed')
+            return None
+        with self._lock:
+            self._index[url] = path
+        return path
+
+    def submit(self, url):
+        """提交下载，返回 Future（结果为站内路径，失败时为 None）"""
+        with self._lock:
+            path = self._index.get(url)
+            if path and (self.public_dir / path.lstrip('/')).exists():
+                self.stats['reused'] += 1
+                future = Future()
+                future.set_result(path)
+                return future
+            future = self._inflight.get(url)
+            if future is None:
+                future = self._inflight[url] = self.executor.submit(self._resolve, url)
+                future.add_done_callback(lambda _, u=url: self._forget(u))
+            return future
+
+    def _forget(self, url):
+        with self._lock:
+            self._inflight.pop(url, None)
+
+    def localize(self, markdown_content):
+        """下载 Markdown 中的全部图片，并把图片链接改写为站内路径（下载失败的保留原链接）"""
+        urls = collect_image_urls(markdown_content)
+        if not urls:
+            return markdown_content
+        futures = {url: self.submit(url) for url in urls}
+        mapping = {url: future.result() for url, future in futures.items()}
+
+        def replace(match):
+            alt, url, title = match.group(1), match.group(2).strip('<>'), match.group(3)
+            path = mapping.get(url)
+            return f"![{alt}]({path}{title})" if path else match.group(0)
+
+        return IMAGE_LINK.sub(replace, markdown_content)
+
+    def close(self):
+        self.executor.shutdown()
+        self.save_index()
+
+
+_store = None
+
+
+def configure_store(client, image_dir=IMAGE_DIR, workers=DEFAULT_IMAGE_WORKERS, enabled=True):
+    """设置共享图片存储；enabled=False 时关闭（已有的存储会先保存索引）"""
+    global _store
+    if _store is not None:
+        _store.close()
+    _store = ImageStore(client, image_dir=image_dir, workers=workers) if enabled else None
+    return _store
+
+
+def get_store():
+    """获取共享图片存储，未配置或已关闭时返回 None"""
+    return _store
+
+
+def format_stats(stats):
+    """格式化图片下载统计"""
+    return (f"下载 {stats['downloaded']} 张（{stats['bytes'] / 1024 / 1024:.1f} MB），"
+            f"内容重复 {stats['deduplicated']} 张，复用 {stats['reused']} 张，失败 {stats['failed']} 张")
+
+
+def self_check():
+    """
+    用本地 HTTP 服务检查图片存储，返回失败的检查项列表
+
+    两个 URL 返回相同内容（只保存一份）、一个不同的图片、一个 404、一个下载到一半断开的图片（不留下半个文件），
+    以及保存的 URL 索引在下一次运行中复用（不再发送请求）
+    """
+    import tempfile
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from fetch_client import FetchClient
+
+    png = b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 64
+    jpg = b'\xff\xd8\xff\xe0' + bytes(range(255, -1, -1)) * 64
+    images = {'/a.png': (png, 'image/png'), '/b.png': (png, 'image/png'), '/c': (jpg, 'image/jpeg')}
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            if self.path in images:
+                body, content_type = images[self.path]
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            elif self.path == '/broken.png':
+                # 声明的长度大于实际发送的内容，发送一半后断开连接
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png')
+                self.send_header('Content-Length', str(len(png)))
+                self.end_headers()
+                self.wfile.write(png[:len(png) // 2])
+                self.wfile.flush()
+                self.close_connection = True
+            else:
+                self.send_error(404)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    markdown = '\n'.join(f"![{name}]({base}/{name})" for name in ('a.png', 'b.png', 'c', 'missing.png', 'broken.png'))
+    failures = []
+
+    def check(name, ok):
+        print(f"[{'OK' if ok else 'FAIL'}] {name}")
+        if not ok:
+            failures.append(name)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        public_dir = Path(tmp) / 'public'
+        image_dir = public_dir / 'images' / 'wechat'
+        index_file = Path(tmp) / 'image_urls.json'
+        client = FetchClient(retries=0, timeout=5)
+        try:
+            store = ImageStore(client, image_dir=image_dir, public_dir=public_dir, index_file=index_file, workers=4)
+            result = store.localize(markdown)
+            store.close()
+
+            links = dict(match.group(1, 2) for match in IMAGE_LINK.finditer(result))
+            files = sorted(p for p in image_dir.rglob('*') if p.is_file())
+            png_sha = hashlib.sha256(png).hexdigest()
+            jpg_sha = hashlib.sha256(jpg).hexdigest()
+            check('相同内容的两个 URL 指向同一个文件',
+                  links['a.png'] == links['b.png'] == f"/images/wechat/{png_sha[:2]}/{png_sha}.png")
+            check('按 Content-Type 判断扩展名', links['c'] == f"/images/wechat/{jpg_sha[:2]}/{jpg_sha}.jpg")
+            check('文件内容与哈希一致',
+                  all(hashlib.sha256(p.read_bytes()).hexdigest() == p.stem for p in files))
+            check('404 和下载中断的图片保留原链接',
+                  links['missing.png'] == f"{base}/missing.png" and links['broken.png'] == f"{base}/broken.png")
+            check('只保存两个文件，没有残留的临时文件或半个文件',
+                  [p.name for p in files] == sorted([f"{png_sha}.png", f"{jpg_sha}.jpg"]))
+            check('统计: 下载 2，内容重复 1，失败 2',
+                  (store.stats['downloaded'], store.stats['deduplicated'], store.stats['failed']) == (2, 1, 2))
+            index = json.loads(index_file.read_text(encoding='utf-8'))
+            check('URL 索引只记录成功的图片', sorted(index) == [f"{base}/{name}" for name in ('a.png', 'b.png', 'c')])
+
+            del hits[:]
+            store = ImageStore(client, image_dir=image_dir, public_dir=public_dir, index_file=index_file, workers=4)
+            again = store.localize(markdown)
+            store.close()
+            check('再次运行时复用索引，只重新请求失败的图片',
+                  again == result and store.stats['reused'] == 3 and sorted(hits) == ['/broken.png', '/missing.png'])
+        finally:
+            client.close()
+            server.shutdown()
+            server.server_close()
+
+    print(f"\n{len(failures)} 项检查失败" if failures else "\n全部通过")
+    return failures
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] != ['--self-check']:
+        print(__doc__)
+        sys.exit(1)
+    sys.exit(1 if self_check() else 0)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文章导入清单
+记录每个来源 URL 对应的输出文件、内容哈希和导入时间（JSONL 格式，只追加），
+抓取前先查清单，已导入的 URL 直接跳过，避免重复抓取和生成重复文章
+"""
+
+import hashlib
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from response_cache import normalize_url
+
+# 默认配置
+PROJECT_DIR = Path(__file__).parent.parent
+MANIFEST_FILE = Path(__file__).parent / ".cache" / "import_manifest.jsonl"
+
+
+def content_hash(text):
+    """文章正文的 SHA-256"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _relative(filepath):
+    """项目内的文件用相对项目根目录的路径记录，便于在不同机器间共用清单"""
+    filepath = Path(filepath).resolve()
+    try:
+        return filepath.relative_to(PROJECT_DIR.resolve()).as_posix()
+    except ValueError:
+        return str(filepath)
+
+
+class ImportManifest:
+    """URL -> 导入记录，内存中为字典，磁盘上为只追加的 JSONL，线程安全"""
+
+    def __init__(self, path=MANIFEST_FILE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._lines = 0
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 上次写入被中断留下的半行，忽略
+                    continue
+                self._lines += 1
+                if entry.get('deleted'):
+                    self._entries.pop(entry['url'], None)
+                else:
+                    self._entries[entry['url']] = entry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(list(self._entries.values()))
+
+    def resolve(self, entry):
+        """记录中的文件路径 -> 绝对路径"""
+        filepath = Path(entry['file'])
+        return filepath if filepath.is_absolute() else PROJECT_DIR / filepath
+
+    def lookup(self, url):
+        """查询 URL 的导入记录；输出文件已被删除时视为未导入"""
+        entry = self._entries.get(normalize_url(url))
+        if entry and self.resolve(entry).exists():
+            return entry
+        return None
+
+    def record(self, url, filepath, digest, title=None):
+        """记录一次导入"""
+        entry = {
+            'url': normalize_url(url),
+            'source': url,
+            'file': _relative(filepath),
+            'sha256': digest,
+            'title': title,
+            'imported_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        self._append(entry)
+        return entry
+
+    def forget(self, url):
+        """删除 URL 的导入记录"""
+        self._append({'url': normalize_url(url), 'deleted': True})
+
+    def _append(self, entry):
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._lines += 1
+            if entry.get('deleted'):
+                self._entries.pop(entry['url'], None)
+            else:
+                self._entries[entry['url']] = entry
+
+    def compact(self):
+        """重复记录过多时重写清单，只保留每个 URL 的最新记录"""
+        with self._lock:
+            if self._lines <= 2 * len(self._entries) + 100:
+                return
+            tmp = self.path.with_name(self.path.name + '.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                for entry in self._entries.values():
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            tmp.replace(self.path)
+            self._lines = len(self._entries)
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+可恢复的批量导入任务
+每个 URL 列表对应一个任务状态文件（JSONL 格式，只追加，与导入清单相同）：每处理完一个 URL 追加一行，
+记录状态、尝试次数、最后一次错误和下次重试时间。进程崩溃或被中断时已处理的 URL 都已记录，
+再次运行同一个列表时跳过已完成的 URL，从中断处继续。
+
+失败的 URL 留在重试队列中，按指数退避安排下次尝试的时间（retry_backoff * 2^(尝试次数-1)，上限 MAX_BACKOFF），
+未到时间的本次运行不处理；失败 max_attempts 次后标记为 abandoned，不再自动重试。
+与已有文章重复而未保存的 URL 标记为 duplicate，同样不再重试。
+
+    python job_state.py .cache/jobs/urls-1a2b3c4d.jsonl          # 查看任务状态
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from fs_utils import atomic_write
+from response_cache import normalize_url
+
+# 默认配置
+JOBS_DIR = Path(__file__).parent / ".cache" / "jobs"
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_RETRY_BACKOFF = 60.0  # 第一次失败后等待的秒数
+MAX_BACKOFF = 3600.0
+
+# 不再自动处理的状态
+FINISHED = ('done', 'duplicate', 'abandoned')
+
+
+def default_state_file(url_file):
+    """URL 列表文件对应的任务状态文件：按列表文件的绝对路径区分，同名列表不会共用状态"""
+    url_file = Path(url_file).resolve()
+    key = hashlib.sha256(str(url_file).encode('utf-8')).hexdigest()[:8]
+    return JOBS_DIR / f"{url_file.stem}-{key}.jsonl"
+
+
+def result_status(result):
+    if result.get('success'):
+        return 'done'
+    return 'duplicate' if result.get('duplicate') else 'failed'
+
+
+def _timestamp(seconds):
+    return datetime.fromtimestamp(seconds).isoformat(timespec='seconds')
+
+
+class JobState:
+    """URL -> 任务状态，内存中为字典，磁盘上为只追加的 JSONL，线程安全"""
+
+    def __init__(self, path, max_attempts=DEFAULT_MAX_ATTEMPTS, retry_backoff=DEFAULT_RETRY_BACKOFF):
+        self.path = Path(path)
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._lines = 0
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 上次写入被中断留下的半行，忽略
+                    continue
+                self._lines += 1
+                self._entries[entry['url']] = entry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(list(self._entries.values()))
+
+    def get(self, url):
+        return self._entries.get(normalize_url(url))
+
+    def backoff(self, attempts):
+        """第 attempts 次失败后到下次尝试的等待秒数"""
+        return min(MAX_BACKOFF, self.retry_backoff * 2 ** max(0, attempts - 1))
+
+    def plan(self, urls, force=False, now=None):
+        """
+        把 URL 列表分为 (本次处理, 重试时间未到, 已结束) 三组，列表中重复的 URL 只保留第一个
+
+        force=True 时全部重新处理（包括已结束和重试时间未到的 URL）
+        """
+        now = time.time() if now is None else now
+        due, waiting, finished = [], [], []
+        seen = set()
+        for url in urls:
+            key = normalize_url(url)
+            if key in seen:
+                continue
+            seen.add(key)
+            entry = self._entries.get(key)
+            if entry is None or force:
+                due.append(url)
+            elif entry['status'] in FINISHED:
+                finished.append(url)
+            elif entry['status'] == 'failed' and entry['next_attempt_at'] > now:
+                waiting.append(url)
+            else:
+                due.append(url)
+        return due, waiting, finished
+
+    def next_retry(self, urls):
+        """列表中失败的 URL 最早的重试时间（epoch 秒），没有时返回 None"""
+        times = [entry['next_attempt_at'] for entry in map(self.get, urls)
+                 if entry is not None and entry['status'] == 'failed']
+        return min(times) if times else None
+
+    def record(self, url, result):
+        """记录一个 URL 的处理结果（结果字典），返回新的状态记录"""
+        now = time.time()
+        with self._lock:
+            previous = self._entries.get(normalize_url(url)) or {}
+            attempts = previous.get('attempts', 0) + (0 if result.get('skipped') else 1)
+            status = result_status(result)
+            entry = {
+                'url': normalize_url(url),
+                'source': url,
+                'status': status,
+                'attempts': attempts,
+                'error': result.get('error'),
+                'file': result.get('filepath') or previous.get('file'),
+                'title': result.get('title') or previous.get('title'),
+                'updated_at': _timestamp(now),
+                'next_attempt_at': None,
+            }
+            if status == 'failed':
+                if attempts >= self.max_attempts:
+                    entry['status'] = 'abandoned'
+                else:
+                    entry['next_attempt_at'] = now + self.backoff(attempts)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._lines += 1
+            self._entries[entry['url']] = entry
+        return entry
+
+    def compact(self):
+        """重复记录过多时重写状态文件，只保留每个 URL 的最新记录"""
+        with self._lock:
+            if self._lines <= 2 * len(self._entries) + 100:
+                return
+            atomic_write(self.path, ''.join(json.dumps(entry, ensure_ascii=False) + '\n'
+                                            for entry in self._entries.values()))
+            self._lines = len(self._entries)
+
+    def report(self, urls, started=None, interrupted=False):
+        """列表中每个 URL 的状态和汇总（可直接序列化为 JSON）"""
+        rows = []
+        seen = set()
+        for url in urls:
+            key = normalize_url(url)
+            if key in seen:
+                continue
+            seen.add(key)
+            entry = self._entries.get(key) or {'status': 'pending', 'attempts': 0}
+            next_attempt = entry.get('next_attempt_at')
+            rows.append({
+                'url': url,
+                'status': entry['status'],
+                'attempts': entry['attempts'],
+                'error': entry.get('error'),
+                'file': entry.get('file'),
+                'title': entry.get('title'),
+                'updated_at': entry.get('updated_at'),
+                'next_attempt_at': _timestamp(next_attempt) if next_attempt else None,
+            })
+        summary = {}
+        for row in rows:
+            summary[row['status']] = summary.get(row['status'], 0) + 1
+        report = {
+            'state_file': str(self.path),
+            'generated_at': _timestamp(time.time()),
+            'interrupted': interrupted,
+            'total': len(rows),
+            'summary': summary,
+            'urls': rows,
+        }
+        if started is not None:
+            report['elapsed'] = round(time.time() - started, 3)
+        return report
+
+    def write_report(self, path, urls, started=None, interrupted=False):
+        """把报告原子地写入 path"""
+        report = self.report(urls, started, interrupted)
+        atomic_write(path, json.dumps(report, ensure_ascii=False, indent=2) + '\n')
+        return report
+
+
+def format_summary(summary):
+    names = {'done': '已完成', 'failed': '等待重试', 'abandoned': '已放弃', 'duplicate': '重复', 'pending': '未处理'}
+    return '，'.join(f"{names.get(status, status)} {count}" for status, count in sorted(summary.items()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='查看批量导入任务的状态')
+    parser.add_argument('state', help='任务状态文件（.cache/jobs/*.jsonl）')
+    parser.add_argument('--json', action='store_true', help='输出 JSON 报告')
+    parser.add_argument('--failed', action='store_true', help='只列出失败和放弃的 URL')
+    args = parser.parse_args()
+    if not Path(args.state).exists():
+        parser.error(f"任务状态文件不存在: {args.state}")
+
+    job = JobState(args.state)
+    urls = [entry['source'] for entry in job]
+    report = job.report(urls)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        for row in report['urls']:
+            if args.failed and row['status'] not in ('failed', 'abandoned'):
+                continue
+            line = f"[{row['status']}] {row['url']}（尝试 {row['attempts']} 次）"
+            if row['next_attempt_at']:
+                line += f"，下次重试 {row['next_attempt_at']}"
+            print(line)
+            if row['error'] and row['status'] != 'done':
+                print(f"    {row['error']}")
+        print(f"\n共 {report['total']} 个 URL：{format_summary(report['summary'])}")
@@ -2,59 +2,75 @@
 # -*- coding: utf-8 -*-
 """
 列出所有文章文件
+元数据来自 article_index.py 的索引，只有新增或修改过的文件才会重新解析
 """
 
+import argparse
+import re
 from pathlib import Path
-import frontmatter
 
-BLOG_DIR = Path(__file__).parent.parent / "src" / "content" / "blog"
-DIALOGUE_DIR = Path(__file__).parent.parent / "src" / "content" / "dialogue"
+from article_index import load_index, sort_date, day_arg, INDEX_FILE
 
 
-def list_articles():
+def print_entries(entries, date_key):
+    for i, entry in enumerate(entries, 1):
+        name = Path(entry['path']).name
+        if entry['error']:
+            print(f"  {i}. {name} (读取错误: {entry['error']})")
+            continue
+        fields = entry['fields']
+        print(f"  {i}. {name}")
+        print(f"     标题: {fields.get('title', '未命名')}")
+        print(f"     日期: {fields.get(date_key) or sort_date(fields) or '未知日期'}")
+
+
+def list_articles(collection=None, since=None, until=None, title=None, tag=None, sort='date', rebuild=False):
     """列出所有文章"""
+    index = load_index(rebuild=rebuild)
+    options = dict(since=since, until=until, title=title, tag=tag, sort=sort)
+
     print("=" * 60)
     print("当前文章列表")
     print("=" * 60)
-    
+
     # Blog 文章
-    blog_files = list(BLOG_DIR.glob("*.md"))
-    if blog_files:
-        print(f"\n📝 Blog 文章 ({len(blog_files)} 篇):")
-        for i, file in enumerate(blog_files, 1):
-            try:
-                with open(file, 'r', encoding='utf-8') as f:
-                    post = frontmatter.load(f)
-                    title = post.get('title', '未命名')
-                    date = post.get('pubDate', '未知日期')
-                    print(f"  {i}. {file.name}")
-                    print(f"     标题: {title}")
-                    print(f"     日期: {date}")
-            except Exception as e:
-                print(f"  {i}. {file.name} (读取错误: {e})")
-    else:
-        print("\n📝 Blog 文章: 无")
-    
+    if collection in (None, 'blog'):
+        blog_entries = index.query(collection='blog', **options)
+        if blog_entries:
+            print(f"\n📝 Blog 文章 ({len(blog_entries)} 篇):")
+            print_entries(blog_entries, 'pubDate')
+        else:
+            print("\n📝 Blog 文章: 无")
+
     # Dialogue 文章
-    dialogue_files = list(DIALOGUE_DIR.glob("*.md"))
-    if dialogue_files:
-        print(f"\n💬 Dialogue 文章 ({len(dialogue_files)} 篇):")
-        for i, file in enumerate(dialogue_files, 1):
-            try:
-                with open(file, 'r', encoding='utf-8') as f:
-                    post = frontmatter.load(f)
-                    title = post.get('title', '未命名')
-                    date = post.get('date', '未知日期')
-                    print(f"  {i}. {file.name}")
-                    print(f"     标题: {title}")
-                    print(f"     日期: {date}")
-            except Exception as e:
-                print(f"  {i}. {file.name} (读取错误: {e})")
-    else:
-        print("\n💬 Dialogue 文章: 无")
-    
-    print("\n" + "=" * 60)
+    if collection in (None, 'dialogue'):
+        dialogue_entries = index.query(collection='dialogue', **options)
+        if dialogue_entries:
+            print(f"\n💬 Dialogue 文章 ({len(dialogue_entries)} 篇):")
+            print_entries(dialogue_entries, 'date')
+        else:
+            print("\n💬 Dialogue 文章: 无")
+
+    stats = index.stats
+    print(f"\n索引: 重新解析 {stats['parsed']} 篇，未变化 {stats['reused']} 篇，移除 {stats['removed']} 篇")
+    print("=" * 60)
 
 
 if __name__ == '__main__':
-    list_articles()
+    parser = argparse.ArgumentParser(description='列出所有文章')
+    parser.add_argument('--collection', choices=['blog', 'dialogue'], help='只列出一个集合')
+    parser.add_argument('--since', type=day_arg, help='只列出该日期及之后的文章（YYYY-MM-DD）')
+    parser.add_argument('--until', type=day_arg, help='只列出该日期及之前的文章（YYYY-MM-DD）')
+    parser.add_argument('--title', help='按标题筛选（正则表达式，不区分大小写）')
+    parser.add_argument('--tag', help='按标签筛选')
+    parser.add_argument('--sort', choices=['date', 'name'], default='date',
+                        help='排序方式：date 按日期（新的在前，默认）或 name 按文件名')
+    parser.add_argument('--rebuild', action='store_true', help=f'重建索引（{INDEX_FILE}）')
+    args = parser.parse_args()
+    if args.title:
+        try:
+            re.compile(args.title)
+        except re.error as e:
+            parser.error(f"无效的标题正则表达式: {e}")
+    list_articles(collection=args.collection, since=args.since, until=args.until, title=args.title,
+                  tag=args.tag, sort=args.sort, rebuild=args.rebuild)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+统一的命令行入口（在 scripts 目录下运行）
+
+    python -m lizechat fetch --file urls.txt
+    python -m lizechat list --collection blog
+    python -m lizechat delete --title "测试" --dry-run
+
+每个子命令对应一个脚本，参数与直接运行该脚本相同（python -m lizechat <命令> --help 查看）。
+本模块只使用 sys，子命令的脚本和它的依赖（requests、html2text、numpy 等）在运行该命令时才导入，
+list、delete 等只读取元数据的命令因此不需要为抓取和转换的依赖付出启动时间。
+
+python -m lizechat --startup 在新进程中测量各子命令的导入时间，超出预算或导入了重量级依赖时返回 1；
+python -m lizechat --profile run.prof <命令> ... 用 cProfile 分析任意一个命令（见 metrics.profiled()）
+"""
+
+import sys
+
+# 子命令: (脚本模块, 说明, 导入时间预算 ms；None 表示不检查)
+COMMANDS = {
+    'fetch': ('fetch_wechat_article_enhanced', '抓取微信公众号文章并转换为 Markdown', None),
+    'list': ('list_articles', '列出文章', 50),
+    'fix': ('fix_article_format', '修复文章格式', 50),
+    'copy': ('copy_obsidian_articles', '从 Obsidian 同步文章', 50),
+    'delete': ('delete_articles', '删除文章', 50),
+    'jobs': ('job_state', '查看批量导入任务的状态', 50),
+    'backfill': ('backfill_descriptions', '为缺少 description 的文章补写摘要', 50),
+    'search': ('search_index', '生成站内搜索索引', 50),
+    'related': ('related_articles', '计算相关文章', None),
+    'duplicates': ('near_duplicates', '查找近似重复的文章', None),
+    'bench': ('benchmark', '提取和转换的基准测试', None),
+}
+
+# 有预算的命令不应在启动时导入这些模块
+HEAVY_MODULES = ('requests', 'bs4', 'html2text', 'lxml', 'numpy', 'scipy', 'yaml', 'watchdog')
+# --startup 每个命令测量的次数（取最小值，减少系统抖动的影响）
+STARTUP_RUNS = 5
+
+_PROBE = (
+    "import sys, time\n"
+    "start = time.perf_counter()\n"
+    "import {module}\n"
+    "elapsed = time.perf_counter() - start\n"
+    "print(elapsed, *[name for name in {heavy!r} if name in sys.modules])\n"
+)
+
+
+def usage():
+    lines = ["用法: python -m lizechat <命令> [参数...]", "", "命令:"]
+    width = max(len(name) for name in COMMANDS)
+    for name, (module, description, _) in COMMANDS.items():
+        lines.append(f"  {name:<{width}}  {description}（{module}.py）")
+    lines += ["", "python -m lizechat <命令> --help 查看命令的参数",
+              "python -m lizechat --startup 检查各命令的启动时间",
+              "python -m lizechat --profile <文件> <命令> [参数...] 用 cProfile 分析一次运行"]
+    return '\n'.join(lines)
+
+
+def run(name, argv):
+    """以 __main__ 运行子命令对应的脚本（与直接运行脚本相同，多进程时工作进程也能找到脚本中的函数）"""
+    import runpy
+    module = COMMANDS[name][0]
+    sys.argv = [module, *argv]
+    runpy.run_module(module, run_name='__main__', alter_sys=True)
+
+
+def measure_startup(module, runs=STARTUP_RUNS):
+    """在新进程中导入 module，返回 (最短耗时 ms, 导入的重量级模块)"""
+    import os
+    import subprocess
+    code = _PROBE.format(module=module, heavy=HEAVY_MODULES)
+    best = None
+    heavy = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True)
+        elapsed, *heavy = result.stdout.split()
+        elapsed = float(elapsed) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, heavy
+
+
+def check_startup(runs=STARTUP_RUNS):
+    """测量所有子命令的导入时间，返回是否都在预算内"""
+    ok = True
+    print(f"各命令的导入时间（新进程，{runs} 次中的最小值，不含解释器启动）:")
+    for name, (module, _, budget) in COMMANDS.items():
+        elapsed, heavy = measure_startup(module, runs)
+        status = ''
+        if budget is not None:
+            over = elapsed > budget or heavy
+            ok = ok and not over
+            status = f"预算 {budget}ms {'❌' if over else '✅'}"
+        line = f"  {name:<10} {elapsed:7.1f}ms  {status}"
+        if heavy:
+            line += f"  导入了 {', '.join(heavy)}"
+        print(line)
+    return ok
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ('-h', '--help'):
+        print(usage())
+        return 0
+    if argv[0] == '--startup':
+        return 0 if check_startup() else 1
+    profile = None
+    if argv[0] == '--profile':
+        if len(argv) < 3:
+            print(f"--profile 需要输出文件和命令\n\n{usage()}", file=sys.stderr)
+            return 2
+        profile, argv = argv[1], argv[2:]
+    name, rest = argv[0], argv[1:]
+    if name not in COMMANDS:
+        print(f"未知命令: {name}\n\n{usage()}", file=sys.stderr)
+        return 2
+    if profile is None:
+        run(name, rest)
+        return 0
+    import metrics
+    with metrics.profiled(profile):
+        run(name, rest)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Markdown 清理规则引擎
+清理规则以声明式的表格定义，导入时编译一次，正文、摘要、文件名的清理都通过规则表完成。
+可以通过 RuleSet.add() 或 JSON 规则文件追加站点特有的模板文字（关注引导、广告语等）。
+
+规则文件格式（JSON 列表）：
+    [{"name": "footer", "pattern": "点击阅读原文.*", "replacement": "", "ignorecase": false}]
+
+微基准（对比原来逐条 re.sub 的耗时）：
+    python markdown_rules.py --bench [--size-mb 4]
+
+说明：CPython 的 re 对带字面量前缀的单个模式有快速查找（如 "长按"、"\n\n\n"），
+把多条规则合并成一个 (?P<a>...)|(?P<b>...) 交替模式做单次扫描会失去这种优化，
+实测每 MB 耗时约为逐条替换的两倍，因此这里按规则顺序逐条应用预编译的模式
+"""
+
+import json
+import re
+import sys
+import time
+
+
+class Rule:
+    """一条替换规则"""
+
+    __slots__ = ('name', 'regex', 'replacement')
+
+    def __init__(self, name, pattern, replacement='', flags=0):
+        self.name = name
+        try:
+            self.regex = re.compile(pattern, flags)
+        except re.error as e:
+            raise ValueError(f"规则 {name} 的正则表达式无效: {e}")
+        self.replacement = replacement
+
+    def apply(self, text):
+        return self.regex.sub(self.replacement, text)
+
+
+class RuleSet:
+    """
+    一组按顺序应用的替换规则：(名称, 正则, 替换文本, flags)
+
+    替换文本可以是字符串或接收 match 的函数
+    """
+
+    def __init__(self, rules=()):
+        self.rules = []
+        for rule in rules:
+            self.add(*rule)
+
+    def add(self, name, pattern, replacement='', flags=0):
+        """追加一条规则（在添加时编译）"""
+        self.rules.append(Rule(name, pattern, replacement, flags))
+        return self
+
+    def apply(self, text):
+        """按顺序应用全部规则"""
+        if not text:
+            return text
+        for rule in self.rules:
+            text = rule.apply(text)
+        return text
+
+    def copy(self):
+        copied = RuleSet()
+        copied.rules = list(self.rules)
+        return copied
+
+
+def load_rules(path, ruleset):
+    """从 JSON 文件读取规则追加到 ruleset"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for rule in json.load(f):
+            flags = re.IGNORECASE if rule.get('ignorecase') else 0
+            ruleset.add(rule['name'], rule['pattern'], rule.get('replacement', ''), flags)
+    return ruleset
+
+
+# 转换后的正文清理
+MARKDOWN_RULES = RuleSet([
+    ('blank_lines', r'\n{3,}', '\n\n'),                            # 多余的空行
+    ('wechat_long_press', r'长按.*关注.*\n?', '', re.IGNORECASE),  # 微信公众号二维码等提示
+    ('wechat_scan', r'扫码.*关注.*\n?', '', re.IGNORECASE),
+])
+
+# 摘要：去掉 Markdown 标记并把换行合并为空格
+SUMMARY_RULES = RuleSet([
+    ('markup', r'[#*_\[\]()]', ''),
+    ('newlines', r'\n+', ' '),
+])
+
+# 搜索索引：只保留可见文字，去掉图片、链接地址和 HTML 标签
+SEARCH_RULES = RuleSet([
+    ('images', r'!\[[^\]]*\]\([^)]*\)', ' '),
+    ('links', r'\[([^\]]*)\]\([^)]*\)', r'\1'),
+    ('urls', r'https?://\S+', ' '),
+    ('html', r'<[^>]+>', ' '),
+])
+
+# 文件名：去掉特殊字符，空白替换为连字符
+FILENAME_RULES = RuleSet([
+    ('special', r'[^\w\s-]', ''),
+    ('whitespace', r'\s+', '-'),
+])
+
+
+def clean_markdown(markdown_content, rules=MARKDOWN_RULES):
+    """清理转换后的 Markdown 正文（先应用规则再去掉首尾空白，删掉的提示位于文末时不会留下空行）"""
+    return rules.apply(markdown_content).strip()
+
+
+def _legacy_clean(markdown_content):
+    """原来的逐条清理（仅用于基准对比）"""
+    markdown_content = re.sub(r'\n{3,}', '\n\n', markdown_content)
+    markdown_content = markdown_content.strip()
+    markdown_content = re.sub(r'长按.*关注.*\n?', '', markdown_content, flags=re.IGNORECASE)
+    markdown_content = re.sub(r'扫码.*关注.*\n?', '', markdown_content, flags=re.IGNORECASE)
+    return markdown_content
+
+
+def _legacy_summary_text(content):
+    text = re.sub(r'[#*_\[\]()]', '', content)
+    return re.sub(r'\n+', ' ', text)
+
+
+def _sample_document(size_mb, boilerplate=True):
+    """生成接近真实文章的 Markdown 样本；boilerplate=False 时不含关注引导"""
+    block = (
+        "## 小标题\n\n这是一段正文，包含**加粗**和[链接](https://example.com/page)。"
+        "AI 与人类的对话仍在继续，我们需要更多耐心。\n\n\n\n"
+        "* 列表项一\n* 列表项二\n\n> 引用的话\n\n"
+    )
+    repeat = int(size_mb * 1024 * 1024 / len(block.encode('utf-8'))) + 1
+    text = block * repeat
+    if boilerplate:
+        text += "长按识别二维码关注我们\n\n扫码关注公众号\n"
+    return text
+
+
+def _time_per_mb(func, text, rounds):
+    size_mb = len(text.encode('utf-8')) / 1024 / 1024
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best / size_mb * 1000
+
+
+def bench(size_mb=4, rounds=5):
+    """对比原来的 re.sub 调用链与规则引擎的每 MB 耗时（取多轮中的最好成绩）"""
+    with_boilerplate = _sample_document(size_mb)
+    plain = _sample_document(size_mb, boilerplate=False)
+    cases = [
+        ('正文清理（含关注引导）', with_boilerplate, _legacy_clean, clean_markdown),
+        ('正文清理（不含引导）', plain, _legacy_clean, clean_markdown),
+        ('摘要文本', with_boilerplate, _legacy_summary_text, SUMMARY_RULES.apply),
+    ]
+    print(f"样本大小: {size_mb:.1f} MB，每项取 {rounds} 轮最好成绩；一致性比较忽略首尾空白")
+    print(f"{'规则':<16}{'逐条 re.sub (ms/MB)':>22}{'规则引擎 (ms/MB)':>20}{'一致':>6}")
+    for name, text, legacy, engine in cases:
+        legacy_ms = _time_per_mb(legacy, text, rounds)
+        engine_ms = _time_per_mb(engine, text, rounds)
+        same = '是' if legacy(text).strip() == engine(text).strip() else '否'
+        print(f"{name:<16}{legacy_ms:>22.1f}{engine_ms:>20.1f}{same:>6}")
+
+
+if __name__ == '__main__':
+    if '--bench' not in sys.argv:
+        print(__doc__)
+        sys.exit(1)
+    size = 4
+    if '--size-mb' in sys.argv:
+        size = float(sys.argv[sys.argv.index('--size-mb') + 1])
+    bench(size)
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+导入过程的分阶段指标和性能分析
+
+每篇文章一条记录（ArticleMetrics）：各阶段耗时、输入和输出的字节数、HTTP 重试次数和响应缓存的结果。
+阶段包括 fetch（网络或缓存）、extract（提取正文）、convert（html2text）、cleanup（清理规则）、
+images（下载图片）、dedupe（重复检测）、write（摘要和写入文件），进程池模式下提取和转换合并为 parse，
+流式模式下下载和转换合并为 stream。
+
+记录绑定在当前线程上（bind），各模块通过 stage() / add() / mark_cache() 记录，
+没有绑定记录时这些调用直接返回，不影响未启用指标时的性能；流水线中条目在不同阶段的线程之间传递，
+由各阶段处理条目时重新绑定。结束后写出 JSON Lines（每篇一行）和 Prometheus 文本文件
+（供 node_exporter 的 textfile collector 采集）。
+
+profiled() 用 cProfile 分析一次运行（包括工作线程，不包括进程池中的工作进程），结果保存为 pstats 文件
+"""
+
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+from fs_utils import atomic_write
+
+# 汇总表中各阶段的顺序
+STAGES = ('fetch', 'extract', 'convert', 'cleanup', 'parse', 'stream', 'images', 'dedupe', 'write')
+PROMETHEUS_PREFIX = 'lizechat_import'
+# --profile 时打印的函数数
+DEFAULT_PROFILE_TOP = 25
+
+_local = threading.local()
+
+
+class ArticleMetrics:
+    """一篇文章的指标"""
+
+    __slots__ = ('url', 'stages', 'bytes_in', 'bytes_out', 'retries', 'cache', 'status', 'error', 'started', 'elapsed')
+
+    def __init__(self, url):
+        self.url = url
+        self.stages = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.retries = 0
+        self.cache = None
+        self.status = None
+        self.error = None
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def to_dict(self):
+        return {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'url': self.url,
+            'status': self.status,
+            'elapsed': round(self.elapsed, 6),
+            'stages': {name: round(seconds, 6) for name, seconds in self.stages.items()},
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'retries': self.retries,
+            'cache': self.cache,
+            'error': self.error,
+        }
+
+
+class _Timer:
+    __slots__ = ('record', 'name', 'start')
+
+    def __init__(self, record, name):
+        self.record = record
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        stages = self.record.stages
+        stages[self.name] = stages.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_TIMER = _NoTimer()
+
+
+def current():
+    """当前线程绑定的记录，没有时返回 None"""
+    return getattr(_local, 'record', None)
+
+
+@contextmanager
+def bind(record):
+    """在 with 块内把 record 绑定到当前线程（record 为 None 时不记录）"""
+    previous = getattr(_local, 'record', None)
+    _local.record = record
+    try:
+        yield record
+    finally:
+        _local.record = previous
+
+
+def stage(name):
+    """计时上下文：with stage('convert'): ...，耗时累加到当前记录的该阶段"""
+    record = getattr(_local, 'record', None)
+    return _Timer(record, name) if record is not None else _NO_TIMER
+
+
+def add(field, amount):
+    """累加当前记录的计数字段（bytes_in、bytes_out、retries）"""
+    record = getattr(_local, 'record', None)
+    if record is not None:
+        setattr(record, field, getattr(record, field) + amount)
+
+
+def mark_cache(result):
+    """记录响应缓存的结果：hit、revalidated 或 miss"""
+    record = getattr(_local, 'record', None)
+    if record is not None:
+        record.cache = result
+
+
+def result_status(result):
+    """由结果字典得到状态：success、skipped、duplicate 或 failed"""
+    if result.get('skipped'):
+        return 'skipped'
+    if result.get('success'):
+        return 'success'
+    return 'duplicate' if result.get('duplicate') else 'failed'
+
+
+class MetricsRecorder:
+    """收集全部文章的记录：逐篇追加到 JSON Lines 文件，结束时汇总，线程安全"""
+
+    def __init__(self, jsonl_path=None, prometheus_path=None):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self._lock = threading.Lock()
+        self._log = open(jsonl_path, 'a', encoding='utf-8') if jsonl_path else None
+        self.started = time.time()
+        self.status = {}
+        self.stage_seconds = {}
+        self.stage_calls = {}
+        self.stage_max = {}
+        self.totals = {'bytes_in': 0, 'bytes_out': 0, 'retries': 0}
+        self.cache = {}
+
+    def new(self, url):
+        return ArticleMetrics(url)
+
+    def finish(self, record, result):
+        """文章处理结束：根据结果字典设置状态，写出一行日志并累加到汇总"""
+        record.elapsed = time.perf_counter() - record.started
+        record.status = result_status(result)
+        record.error = result.get('error')
+        line = json.dumps(record.to_dict(), ensure_ascii=False) + '\n'
+        with self._lock:
+            if self._log is not None:
+                self._log.write(line)
+                self._log.flush()
+            self.status[record.status] = self.status.get(record.status, 0) + 1
+            for name, seconds in record.stages.items():
+                self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+                self.stage_calls[name] = self.stage_calls.get(name, 0) + 1
+                self.stage_max[name] = max(self.stage_max.get(name, 0.0), seconds)
+            self.totals['bytes_in'] += record.bytes_in
+            self.totals['bytes_out'] += record.bytes_out
+            self.totals['retries'] += record.retries
+            if record.cache:
+                self.cache[record.cache] = self.cache.get(record.cache, 0) + 1
+
+    def _stage_names(self):
+        return [name for name in STAGES if name in self.stage_seconds] + \
+               sorted(name for name in self.stage_seconds if name not in STAGES)
+
+    def format_summary(self):
+        """各阶段的文章数、总耗时、平均和最长耗时，以及字节数、重试和缓存统计"""
+        lines = [f"{'阶段':<10}{'文章':>8}{'总耗时(s)':>12}{'平均(ms)':>12}{'最长(ms)':>12}"]
+        for name in self._stage_names():
+            calls = self.stage_calls[name]
+            total = self.stage_seconds[name]
+            lines.append(f"{name:<10}{calls:>8}{total:>12.3f}{total / calls * 1000:>12.1f}"
+                         f"{self.stage_max[name] * 1000:>12.1f}")
+        lines.append(f"输入 {self.totals['bytes_in'] / 1024 / 1024:.2f} MB，输出 {self.totals['bytes_out'] / 1024 / 1024:.2f} MB，"
+                     f"重试 {self.totals['retries']} 次，缓存 " +
+                     ('，'.join(f"{k} {v}" for k, v in sorted(self.cache.items())) or '未使用'))
+        return '\n'.join(lines)
+
+    def prometheus_text(self):
+        """Prometheus 文本格式的汇总（本次运行的值，均为 gauge）"""
+        p = PROMETHEUS_PREFIX
+        lines = []
+
+        def metric(name, help_text, samples):
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} gauge")
+            for labels, value in samples:
+                label_text = '{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}' if labels else ''
+                lines.append(f"{p}_{name}{label_text} {value}")
+
+        metric('articles', '最近一次运行处理的文章数',
+               [({'status': status}, count) for status, count in sorted(self.status.items())])
+        stages = self._stage_names()
+        metric('stage_seconds', '最近一次运行各阶段的总耗时（秒）',
+               [({'stage': name}, f"{self.stage_seconds[name]:.6f}") for name in stages])
+        metric('stage_articles', '最近一次运行经过各阶段的文章数',
+               [({'stage': name}, self.stage_calls[name]) for name in stages])
+        metric('bytes', '最近一次运行的输入（原始 HTML）和输出（文章文件）字节数',
+               [({'direction': 'in'}, self.totals['bytes_in']), ({'direction': 'out'}, self.totals['bytes_out'])])
+        metric('retries', '最近一次运行的 HTTP 重试次数', [({}, self.totals['retries'])])
+        metric('cache_results', '最近一次运行响应缓存的结果',
+               [({'result': result}, count) for result, count in sorted(self.cache.items())])
+        metric('duration_seconds', '最近一次运行的总耗时（秒）', [({}, f"{time.time() - self.started:.3f}")])
+        metric('last_run_timestamp_seconds', '最近一次运行结束的时间', [({}, f"{time.time():.0f}")])
+        return '\n'.join(lines) + '\n'
+
+    def close(self):
+        """关闭日志，写出 Prometheus 文本文件（原子替换，采集时不会读到一半）"""
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        if self.prometheus_path:
+            atomic_write(self.prometheus_path, self.prometheus_text())
+
+
+_recorder = None
+
+
+def configure_recorder(jsonl_path=None, prometheus_path=None, enabled=True):
+    """设置共享的指标收集器；enabled=False 时关闭"""
+    global _recorder
+    if _recorder is not None:
+        _recorder.close()
+    _recorder = MetricsRecorder(jsonl_path, prometheus_path) if enabled else None
+    return _recorder
+
+
+def get_recorder():
+    """获取共享的指标收集器，未配置时返回 None"""
+    return _recorder
+
+
+def tracked(func):
+    """装饰处理单个 URL 的函数 func(url, ...) -> 结果字典：配置了收集器时为每次调用建立一条记录"""
+    @wraps(func)
+    def wrapper(url, *args, **kwargs):
+        recorder = _recorder
+        if recorder is None:
+            return func(url, *args, **kwargs)
+        record = recorder.new(url)
+        with bind(record):
+            result = func(url, *args, **kwargs)
+        recorder.finish(record, result)
+        return result
+    return wrapper
+
+
+@contextmanager
+def profiled(path, top=DEFAULT_PROFILE_TOP):
+    """
+    用 cProfile 分析 with 块（包括其中启动的线程），结束后保存到 path 并打印累计耗时最多的 top 个函数
+
+    保存的文件可以用 python -m pstats 或 snakeviz 等工具查看
+    """
+    import cProfile
+    import pstats
+
+    profiles = [cProfile.Profile()]
+    # Python 3.12 起 cProfile 基于 sys.monitoring，一个分析器就能覆盖所有线程；
+    # 之前的版本每个线程需要各自的分析器，在线程第一次产生事件时启动
+    per_thread = sys.version_info < (3, 12)
+    lock = threading.Lock()
+
+    def start_thread_profile(frame, event, arg):
+        profile = cProfile.Profile()
+        with lock:
+            profiles.append(profile)
+        profile.enable()
+
+    if per_thread:
+        threading.setprofile(start_thread_profile)
+    profiles[0].enable()
+    try:
+        yield
+    finally:
+        profiles[0].disable()
+        if per_thread:
+            threading.setprofile(None)
+        with lock:
+            stats = pstats.Stats(*profiles)
+        stats.dump_stats(path)
+        print(f"\n性能分析结果已保存到 {path}（python -m pstats {path} 查看），累计耗时最多的 {top} 个函数:")
+        stats.sort_stats('cumulative').print_stats(top)
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+近似重复文章检测
+save_article() 遇到同名文件时会写成 <标题>_<时间戳>.md，重复导入和 Obsidian 复制留下了很多几乎相同的文章。
+两两比较正文是 O(n²)，这里用 MinHash + LSH 分段在接近线性的时间内找出近似重复的文章簇：
+
+1. 正文按 SEARCH_RULES 去掉图片、链接地址和 HTML 标签，NFKC 规范化并转小写，只保留文字和数字，
+   切成相邻 SHINGLE_SIZE 个字符的片段（shingle），每个片段用多项式滚动哈希映射为 64 位整数
+2. NUM_PERM 个 multiply-add-shift 哈希函数对片段集合取最小值，得到 MinHash 签名：
+   两篇文章签名中相同位置取值相等的比例是片段集合 Jaccard 相似度的无偏估计
+3. 签名分为 BANDS 段、每段 NUM_PERM / BANDS 个值，任意一段完全相同的文章成为候选对；
+   只对候选对比较签名，估计的相似度不低于阈值的文章用并查集合并成簇
+
+默认 32 段 × 4 行：相似度 0.8 的文章成为候选对的概率超过 99.999%，相似度 0.2 的约为 5%
+
+增量计算：scripts/.cache/minhash_state.npz 记录每篇文章的修改时间、大小和签名，只重新计算新增或修改过的文章；
+只扫描部分集合（--collection）时，其他集合的记录原样保留。
+
+导入时检查：DuplicateDetector 加载全部签名并建立分段桶，find() 检查一篇新文章是否与已有文章重复，
+fetch_wechat_article_enhanced.py --reject-duplicates 用它拒绝保存重复的文章
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from article_index import COLLECTIONS
+from frontmatter_io import read_header
+from markdown_rules import SEARCH_RULES
+
+STATE_FILE = Path(__file__).parent / ".cache" / "minhash_state.npz"
+# 切分或哈希规则变化时递增，使之前的签名失效
+STATE_VERSION = 1
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+BANDS = 32
+DEFAULT_THRESHOLD = 0.8
+SEED = 20240101
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+# 桶中文章超过该数量时只与桶中第一篇比较，避免大量相同片段（如空白模板）退化为 O(n²)
+MAX_BUCKET = 64
+# 计算签名时每批处理的片段数，限制 NUM_PERM × 片段数 的中间矩阵大小
+_HASH_CHUNK = 8192
+_PAIR_CHUNK = 65536
+
+_NON_WORD = re.compile(r'[\W_]+')
+_ROLL = np.uint64(0x100000001b3)
+_MIX = np.uint64(0xbf58476d1ce4e5b9)
+_BAND_MIX = np.uint64(0x9e3779b97f4a7c15)
+
+_rng = np.random.default_rng(SEED)
+# multiply-add-shift：((a·x + b) mod 2⁶⁴) >> 32，a 取奇数
+_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+
+
+def normalize(text):
+    """只保留可见的文字和数字（NFKC 规范化、转小写，去掉空白和标点）"""
+    text = unicodedata.normalize('NFKC', SEARCH_RULES.apply(text or '')).lower()
+    return _NON_WORD.sub('', text)
+
+
+def shingle_hashes(text, size=SHINGLE_SIZE):
+    """规范化文本中相邻 size 个字符的片段的 64 位哈希（去重）；不足 size 个字符时整段作为一个片段"""
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    if len(codes) == 0:
+        return codes
+    size = min(size, len(codes))
+    count = len(codes) - size + 1
+    hashes = np.zeros(count, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for offset in range(size):
+            hashes = hashes * _ROLL + codes[offset:offset + count]
+        hashes ^= hashes >> np.uint64(31)
+        hashes *= _MIX
+        hashes ^= hashes >> np.uint64(29)
+    return np.unique(hashes)
+
+
+def minhash(hashes):
+    """片段哈希集合的 MinHash 签名（NUM_PERM 个 uint32）；空集合返回 None"""
+    if len(hashes) == 0:
+        return None
+    signature = np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for start in range(0, len(hashes), _HASH_CHUNK):
+            chunk = hashes[start:start + _HASH_CHUNK]
+            values = np.multiply.outer(_A, chunk)
+            values += _B[:, None]
+            np.minimum(signature, values.min(axis=1), out=signature)
+    # 右移保持大小顺序，先取最小值再右移，不必对整个矩阵移位
+    return (signature >> np.uint64(32)).astype(np.uint32)
+
+
+def signature(text):
+    """正文的 MinHash 签名；没有可见文字时返回 None"""
+    return minhash(shingle_hashes(normalize(text)))
+
+
+def band_keys(signatures, bands=BANDS):
+    """每篇文章每一段签名的 64 位哈希：返回 文章数 × bands 的矩阵"""
+    signatures = np.asarray(signatures, dtype=np.uint32)
+    rows = signatures.shape[1] // bands
+    parts = signatures[:, :bands * rows].reshape(len(signatures), bands, rows).astype(np.uint64)
+    keys = np.zeros((len(signatures), bands), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for r in range(rows):
+            keys = (keys ^ parts[:, :, r]) * _BAND_MIX
+    return keys
+
+
+def estimate(signatures, pairs):
+    """候选对 (i, j) 的 Jaccard 相似度估计：签名中取值相同的位置所占比例"""
+    scores = np.empty(len(pairs))
+    for start in range(0, len(pairs), _PAIR_CHUNK):
+        chunk = pairs[start:start + _PAIR_CHUNK]
+        scores[start:start + len(chunk)] = (signatures[chunk[:, 0]] == signatures[chunk[:, 1]]).mean(axis=1)
+    return scores
+
+
+def candidate_pairs(signatures, bands=BANDS, max_bucket=MAX_BUCKET):
+    """LSH 分段：任意一段签名相同的文章对，返回去重后的 (i, j) 数组（i < j）"""
+    n = len(signatures)
+    if n < 2:
+        return np.empty((0, 2), dtype=np.int64)
+    keys = band_keys(signatures, bands)
+    found = []
+    for band in range(bands):
+        order = np.argsort(keys[:, band], kind='stable')
+        values = keys[order, band]
+        # 相同取值的连续区间即为一个桶
+        starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+        sizes = np.diff(np.r_[starts, n])
+        for start, size in zip(starts[sizes > 1], sizes[sizes > 1]):
+            members = np.sort(order[start:start + size])
+            if size <= max_bucket:
+                i, j = np.triu_indices(size, 1)
+                found.append(members[i] * n + members[j])
+            else:
+                found.append(members[0] * n + members[1:])
+    if not found:
+        return np.empty((0, 2), dtype=np.int64)
+    codes = np.unique(np.concatenate(found))
+    return np.stack([codes // n, codes % n], axis=1)
+
+
+def find_clusters(signatures, threshold=DEFAULT_THRESHOLD, bands=BANDS):
+    """
+    近似重复的文章簇，返回 ([(成员行号列表, 簇内最低相似度, 最高相似度)], 候选对数)
+
+    簇由相似度不低于阈值的文章对连通而成，成员之间不一定两两都超过阈值
+    """
+    pairs = candidate_pairs(signatures, bands)
+    scores = estimate(signatures, pairs)
+    keep = scores >= threshold
+    parent = list(range(len(signatures)))
+
+    def root(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, j in pairs[keep].tolist():
+        a, b = root(i), root(j)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+
+    clusters = {}
+    for (i, j), score in zip(pairs[keep].tolist(), scores[keep].tolist()):
+        members, low, high = clusters.get(root(i), (set(), 1.0, 0.0))
+        members.update((i, j))
+        clusters[root(i)] = (members, min(low, score), max(high, score))
+    result = [(sorted(members), low, high) for members, low, high in clusters.values()]
+    result.sort(key=lambda c: (-len(c[0]), c[0][0]))
+    return result, len(pairs)
+
+
+def load_state(path=STATE_FILE):
+    """读取上次记录的签名：返回 {文章: (修改时间, 大小, 行号)} 和 (签名矩阵, 是否无可见文字)"""
+    try:
+        with np.load(path, allow_pickle=False) as f:
+            params = f['params'].tolist()
+            if params != [STATE_VERSION, SHINGLE_SIZE, NUM_PERM, SEED]:
+                return {}, None
+            docs = {key: (mtime, size, row) for row, (key, mtime, size)
+                    in enumerate(zip(f['keys'].tolist(), f['mtime'].tolist(), f['size'].tolist()))}
+            return docs, (f['signatures'], f['empty'])
+    except (OSError, ValueError, KeyError):
+        return {}, None
+
+
+def save_state(keys, mtimes, sizes, signatures, empty, path=STATE_FILE):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.stem}.tmp.npz")
+    np.savez(tmp, params=np.asarray([STATE_VERSION, SHINGLE_SIZE, NUM_PERM, SEED]),
+             keys=np.asarray(keys, dtype=str), mtime=np.asarray(mtimes, dtype=np.int64),
+             size=np.asarray(sizes, dtype=np.int64), signatures=signatures.reshape(len(keys), NUM_PERM),
+             empty=np.asarray(empty, dtype=bool))
+    os.replace(tmp, path)
+
+
+def _file_signature(filepath):
+    try:
+        return signature(read_header(filepath).body), None
+    except Exception as e:
+        return None, str(e)
+
+
+def update_signatures(collections=None, state_file=STATE_FILE, full=False, workers=DEFAULT_WORKERS, verbose=False):
+    """
+    扫描各集合，只为新增或修改过的文章计算签名（由线程池并行计算）
+
+    返回 ({文章: 文件路径}, 签名矩阵, 是否无可见文字, 统计)，文章为 集合/文件名，按名称排序；
+    状态文件中不属于本次扫描的集合的记录原样写回（不计为移除），full=True 时只重新计算本次扫描的集合
+    """
+    collections = collections or COLLECTIONS
+    old_docs, old = load_state(state_file)
+    files = []
+    changed = []
+    for collection, directory in collections.items():
+        directory = Path(directory)
+        if not directory.exists():
+            continue
+        for filepath in sorted(directory.glob("*.md")):
+            key = f"{collection}/{filepath.name}"
+            st = filepath.stat()
+            cached = None if full else old_docs.get(key)
+            if not cached or cached[0] != st.st_mtime_ns or cached[1] != st.st_size:
+                changed.append(filepath)
+            files.append((key, filepath, st, cached))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        computed = dict(zip(changed, executor.map(_file_signature, changed)))
+
+    paths = {}
+    mtimes, sizes, rows, empty = [], [], [], []
+    stats = {'computed': 0, 'reused': 0, 'removed': 0, 'errors': 0}
+    for key, filepath, st, cached in files:
+        if filepath not in computed:
+            rows.append(old[0][cached[2]])
+            empty.append(bool(old[1][cached[2]]))
+            stats['reused'] += 1
+        else:
+            sig, error = computed[filepath]
+            if error is not None:
+                stats['errors'] += 1
+                print(f"[ERROR] 无法读取 {key}: {error}")
+                continue
+            rows.append(sig if sig is not None else np.zeros(NUM_PERM, dtype=np.uint32))
+            empty.append(sig is None)
+            stats['computed'] += 1
+            if verbose:
+                print(f"[MINHASH] {key}")
+        paths[key] = filepath
+        mtimes.append(st.st_mtime_ns)
+        sizes.append(st.st_size)
+    # 其他集合的记录保留在状态文件中，下次扫描全部集合时不需要重新计算
+    kept = [(key, doc) for key, doc in old_docs.items() if key.split('/', 1)[0] not in collections]
+    stats['removed'] = len(old_docs.keys() - paths.keys()) - len(kept)
+
+    signatures = np.array(rows, dtype=np.uint32).reshape(len(rows), NUM_PERM)
+    empty = np.asarray(empty, dtype=bool)
+    if stats['computed'] or stats['removed'] or not Path(state_file).exists():
+        keys, all_signatures, all_empty = list(paths), signatures, empty
+        if kept:
+            kept_rows = [row for _, (_, _, row) in kept]
+            keys += [key for key, _ in kept]
+            mtimes += [mtime for _, (mtime, _, _) in kept]
+            sizes += [size for _, (_, size, _) in kept]
+            all_signatures = np.concatenate([signatures, old[0][kept_rows].reshape(len(kept), NUM_PERM)])
+            all_empty = np.concatenate([empty, old[1][kept_rows].astype(bool)])
+        save_state(keys, mtimes, sizes, all_signatures, all_empty, state_file)
+    stats['docs'] = len(paths)
+    return paths, signatures, empty, stats
+
+
+def report(collections=None, threshold=DEFAULT_THRESHOLD, state_file=STATE_FILE, full=False, workers=DEFAULT_WORKERS,
+           verbose=False):
+    """找出所有近似重复的文章簇，返回 ([{articles, min_score, max_score}], 统计)"""
+    start = time.perf_counter()
+    paths, signatures, empty, stats = update_signatures(collections, state_file, full, workers, verbose)
+    keys = list(paths)
+    rows = np.flatnonzero(~empty)
+    clusters, stats['candidates'] = find_clusters(signatures[rows], threshold)
+    result = [
+        {'articles': [keys[rows[i]] for i in members], 'min_score': round(low, 3), 'max_score': round(high, 3)}
+        for members, low, high in clusters
+    ]
+    stats['elapsed'] = time.perf_counter() - start
+    return result, stats
+
+
+class DuplicateDetector:
+    """
+    导入时的重复检查：加载已有文章的签名并建立 LSH 分段桶
+
+        detector = DuplicateDetector()
+        matches = detector.find(markdown)   # [(文章, 相似度)]，相似度从高到低
+        detector.add(filepath, markdown)    # 新保存的文章也参与之后的检查
+
+    find() 和 add() 可以在多个线程中调用；并发导入时检查、保存和加入要在 with detector.exclusive(): 中
+    作为一个整体执行，否则同一批中两篇近似重复的文章可能都通过检查
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, collections=None, state_file=STATE_FILE):
+        self.threshold = threshold
+        self.labels = []
+        self.paths = []
+        self.rows = {}
+        self.signatures = []
+        self.buckets = [{} for _ in range(BANDS)]
+        self._lock = threading.Lock()
+        self._exclusive = threading.Lock()
+        paths, signatures, empty, self.stats = update_signatures(collections, state_file)
+        for (label, filepath), sig, is_empty in zip(paths.items(), signatures, empty):
+            if not is_empty:
+                self._insert(label, filepath, sig)
+
+    def _insert(self, label, filepath, sig):
+        row = len(self.labels)
+        self.labels.append(label)
+        self.paths.append(Path(filepath).resolve())
+        self.rows[self.paths[row]] = row
+        self.signatures.append(sig)
+        for band, key in enumerate(band_keys(sig[None, :])[0].tolist()):
+            self.buckets[band].setdefault(key, []).append(row)
+
+    def exclusive(self):
+        """检查 -> 保存 -> 加入期间持有的锁（与 find() 和 add() 内部的锁不同，可以在其中调用它们）"""
+        return self._exclusive
+
+    def find(self, text, exclude=()):
+        """与 text 相似度不低于阈值的已有文章 [(文章, 相似度)]；exclude 中的文件不参与比较"""
+        sig = signature(text)
+        if sig is None:
+            return []
+        excluded = {Path(p).resolve() for p in exclude}
+        with self._lock:
+            rows = set()
+            for band, key in enumerate(band_keys(sig[None, :])[0].tolist()):
+                rows.update(self.buckets[band].get(key, ()))
+            matches = []
+            for row in rows:
+                if self.paths[row] is None or self.paths[row] in excluded:
+                    continue
+                score = float((self.signatures[row] == sig).mean())
+                if score >= self.threshold:
+                    matches.append((self.labels[row], score))
+        return sorted(matches, key=lambda m: (-m[1], m[0]))
+
+    def add(self, filepath, text):
+        """把新保存的文章加入检查范围（同一文件再次加入时替换原来的签名）"""
+        sig = signature(text)
+        if sig is None:
+            return
+        filepath = Path(filepath)
+        label = f"{filepath.parent.name}/{filepath.name}"
+        with self._lock:
+            old = self.rows.get(filepath.resolve())
+            if old is not None:
+                # 被覆盖的旧版本不再参与比较
+                self.paths[old] = None
+            self._insert(label, filepath, sig)
+
+
+def print_clusters(clusters):
+    for number, cluster in enumerate(clusters, 1):
+        low, high = cluster['min_score'], cluster['max_score']
+        scores = f"{low:.2f}" if low == high else f"{low:.2f}–{high:.2f}"
+        print(f"\n簇 {number}（{len(cluster['articles'])} 篇，相似度 {scores}）:")
+        for article in cluster['articles']:
+            print(f"  - {article}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='用 MinHash + LSH 找出近似重复的文章',
+        epilog='示例: python near_duplicates.py --collection blog --threshold 0.9')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'估计的 Jaccard 相似度不低于该值时视为重复（默认为 {DEFAULT_THRESHOLD}）')
+    parser.add_argument('--collection', choices=list(COLLECTIONS), help='只检查一个集合')
+    parser.add_argument('--check', metavar='FILE', help='只检查一个 Markdown 文件是否与已有文章重复（重复时退出码为 1）')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出重复簇')
+    parser.add_argument('--full', action='store_true', help='忽略上次记录的签名，重新计算所有文章')
+    parser.add_argument('--workers', '-w', type=int, default=DEFAULT_WORKERS,
+                        help=f'并行计算签名的线程数（默认为 {DEFAULT_WORKERS}）')
+    parser.add_argument('--state', default=str(STATE_FILE), help='状态文件（默认为 scripts/.cache/minhash_state.npz）')
+    parser.add_argument('--verbose', '-v', action='store_true', help='列出重新计算签名的文章')
+    args = parser.parse_args()
+    if not 0 < args.threshold <= 1:
+        parser.error("--threshold 必须在 (0, 1] 之间")
+    collections = {args.collection: COLLECTIONS[args.collection]} if args.collection else None
+
+    if args.check:
+        check_path = Path(args.check)
+        detector = DuplicateDetector(args.threshold, collections, args.state)
+        matches = detector.find(read_header(check_path).body, exclude=[check_path])
+        if args.json:
+            print(json.dumps([{'article': a, 'score': round(s, 3)} for a, s in matches], ensure_ascii=False, indent=2))
+        elif matches:
+            print(f"{check_path.name} 与以下文章重复:")
+            for article, score in matches:
+                print(f"  - {article}（相似度 {score:.2f}）")
+        else:
+            print(f"{check_path.name} 没有重复的文章")
+        sys.exit(1 if matches else 0)
+
+    clusters, stats = report(collections, args.threshold, args.state, args.full, args.workers, args.verbose)
+    if args.json:
+        print(json.dumps(clusters, ensure_ascii=False, indent=2))
+        sys.exit(0)
+    print(f"文章 {stats['docs']} 篇：重新计算签名 {stats['computed']} 篇，未变化 {stats['reused']} 篇，"
+          f"移除 {stats['removed']} 篇，失败 {stats['errors']} 篇")
+    print(f"候选对 {stats['candidates']} 个，重复簇 {len(clusters)} 个"
+          f"（涉及 {sum(len(c['articles']) for c in clusters)} 篇文章）")
+    print_clusters(clusters)
+    print(f"\n耗时: {stats['elapsed']:.2f}s")
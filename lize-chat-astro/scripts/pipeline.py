@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分阶段流水线
+各阶段之间用有界队列连接，每个阶段有独立的线程数；下游处理不过来时上游在 put 上阻塞（背压）。
+结果按输入顺序回调，处理结束后可打印各阶段的吞吐量和队列深度统计
+"""
+
+import queue
+import threading
+import time
+
+# 默认配置
+DEFAULT_QUEUE_SIZE = 16
+
+_STOP = object()
+
+
+class Done:
+    """阶段函数返回 Done(result) 表示该条目已处理完毕，跳过后续阶段直接输出"""
+
+    def __init__(self, result):
+        self.result = result
+
+
+class Stage:
+    """流水线中的一个阶段：func(item) -> 新的 item 或 Done(result)"""
+
+    def __init__(self, name, func, workers=1, queue_size=DEFAULT_QUEUE_SIZE):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._running = self.workers
+        self.stats = {'items': 0, 'errors': 0, 'busy': 0.0, 'max_depth': 0, 'depth_sum': 0, 'depth_samples': 0}
+
+    def put(self, entry):
+        """放入条目（队列满时阻塞），同时采样队列深度"""
+        self.queue.put(entry)
+        depth = self.queue.qsize()
+        with self._lock:
+            self.stats['max_depth'] = max(self.stats['max_depth'], depth)
+            self.stats['depth_sum'] += depth
+            self.stats['depth_samples'] += 1
+
+    def _finish_worker(self):
+        """返回 True 表示这是该阶段最后一个退出的线程"""
+        with self._lock:
+            self._running -= 1
+            return self._running == 0
+
+
+class Pipeline:
+    """
+    由多个 Stage 组成的流水线
+
+    on_error(item, exception) 把异常转换为结果（on_error 本身出错时结果为 {'url', 'success': False, 'error'}）；
+    on_result(index, result) 按输入顺序回调
+    """
+
+    def __init__(self, stages, on_error, on_result=None):
+        self.stages = stages
+        self.on_error = on_error
+        self.on_result = on_result
+        self._sink = queue.Queue()
+        self.elapsed = 0.0
+
+    def _error_result(self, item, error):
+        """用 on_error 把异常转换为结果；on_error 本身出错时返回一个通用的失败结果"""
+        try:
+            return self.on_error(item, error)
+        except Exception as e:
+            return {
+                'url': item.get('url') if isinstance(item, dict) else item,
+                'success': False,
+                'error': f"{error}（错误处理失败: {e}）"
+            }
+
+    def _worker(self, position):
+        stage = self.stages[position]
+        downstream = self.stages[position + 1] if position + 1 < len(self.stages) else None
+        try:
+            while True:
+                entry = stage.queue.get()
+                if entry is _STOP:
+                    break
+                index, item = entry
+                start = time.perf_counter()
+                try:
+                    output = stage.func(item)
+                except Exception as e:
+                    output = Done(self._error_result(item, e))
+                    with stage._lock:
+                        stage.stats['errors'] += 1
+                with stage._lock:
+                    stage.stats['busy'] += time.perf_counter() - start
+                    stage.stats['items'] += 1
+
+                if isinstance(output, Done) or downstream is None:
+                    self._sink.put((index, output.result if isinstance(output, Done) else output))
+                else:
+                    downstream.put((index, output))
+        finally:
+            # 线程意外退出时也要传递结束标记，否则下游阶段和 run() 会一直等待
+            if stage._finish_worker():
+                # 本阶段全部线程结束后，通知下游阶段结束
+                if downstream is not None:
+                    for _ in range(downstream.workers):
+                        downstream.put(_STOP)
+                else:
+                    self._sink.put(_STOP)
+
+    def run(self, items):
+        """处理全部条目，返回按输入顺序排列的结果列表"""
+        items = list(items)
+        start = time.perf_counter()
+        threads = []
+        for position, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                thread = threading.Thread(target=self._worker, args=(position,), daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        def feed():
+            first = self.stages[0]
+            for index, item in enumerate(items):
+                first.put((index, item))
+            for _ in range(first.workers):
+                first.put(_STOP)
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+
+        # 乱序完成的结果先缓存，按输入顺序依次输出
+        results = [None] * len(items)
+        pending = {}
+        next_index = 0
+        while True:
+            entry = self._sink.get()
+            if entry is _STOP:
+                break
+            index, result = entry
+            pending[index] = result
+            while next_index in pending:
+                results[next_index] = pending.pop(next_index)
+                if self.on_result:
+                    self.on_result(next_index + 1, results[next_index])
+                next_index += 1
+
+        feeder.join()
+        for thread in threads:
+            thread.join()
+        self.elapsed = time.perf_counter() - start
+        return results
+
+    def format_stats(self):
+        """各阶段统计：处理条数、忙碌时间、吞吐量、队列深度"""
+        lines = [f"{'阶段':<10}{'线程':>6}{'条目':>8}{'错误':>6}{'忙碌(s)':>10}{'吞吐(条/s)':>12}{'平均队列':>10}{'最大队列':>10}"]
+        for stage in self.stages:
+            st = stage.stats
+            throughput = st['items'] / self.elapsed if self.elapsed else 0
+            avg_depth = st['depth_sum'] / st['depth_samples'] if st['depth_samples'] else 0
+            lines.append(
+                f"{stage.name:<10}{stage.workers:>6}{st['items']:>8}{st['errors']:>6}{st['busy']:>10.2f}"
+                f"{throughput:>12.2f}{avg_depth:>10.1f}{st['max_depth']:>10}"
+            )
+        lines.append(f"总耗时: {self.elapsed:.2f}s")
+        return '\n'.join(lines)
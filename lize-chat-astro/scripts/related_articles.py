@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+预先计算每篇 blog 文章的相关文章
+用 search_index.py 相同的切分规则生成 TF-IDF 向量（scipy 稀疏矩阵，行向量归一化），
+按批计算 余弦相似度 = X[批] · Xᵀ，用 argpartition 取每行前 k 个，结果写入 src/data/related.json，
+由 src/pages/blog/[slug].astro 直接 import。
+
+增量计算：scripts/.cache/related_state.json 记录每篇文章的修改时间和上次的相关文章，
+各文章的词频矩阵保存在同名的 .npz 文件中（两个文件带同一个 generation，不一致时整体重新计算），只重新切分新增或修改过的文章；只有变化的文章及其相关文章列表受影响的文章才重新计算整行，
+其余文章只把变化的文章作为候选合并进原来的列表。变化的文章较多（超过 FULL_RATIO）时整体重新计算，
+避免 IDF 的变化累积
+"""
+
+import argparse
+import json
+import os
+import time
+import uuid
+from itertools import chain
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+from article_index import COLLECTIONS
+from fs_utils import atomic_write
+from search_index import document_terms
+
+BLOG_DIR = COLLECTIONS['blog']
+OUTPUT_FILE = Path(__file__).parent.parent / "src" / "data" / "related.json"
+STATE_FILE = Path(__file__).parent / ".cache" / "related_state.json"
+# 切分或打分规则变化时递增，使之前的状态失效
+STATE_VERSION = 1
+DEFAULT_TOP_K = 5
+# 相似度低于该值的文章不算相关
+MIN_SCORE = 0.05
+# 每批计算的行数：一批的相似度为 BATCH_SIZE × 文章数 的稠密矩阵
+BATCH_SIZE = 512
+# 出现在超过该比例文章中的词项区分度太低，不计入向量
+MAX_DF = 0.5
+# 每篇文章只保留权重最高的词项数
+MAX_TERMS = 128
+# 变化的文章超过该比例时整体重新计算
+FULL_RATIO = 0.1
+
+
+def _empty_state():
+    return {'docs': {}, 'related': {}, 'top_k': None}
+
+
+def load_state(path=STATE_FILE):
+    """读取上次运行的状态：文件名 -> {row, mtime, size, slug, title} 和相关文章（词频矩阵另见 load_counts）"""
+    try:
+        data = json.loads(Path(path).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return _empty_state()
+    return data if data.get('version') == STATE_VERSION else _empty_state()
+
+
+def load_counts(path=STATE_FILE, generation=None):
+    """
+    读取状态文件旁 .npz 中的词频矩阵和词表；不存在或与 JSON 状态不是同一次保存的（generation 不同）时返回 (None, [])
+
+    两个文件分别原子替换，进程在两次替换之间退出时会留下新矩阵和旧 JSON，此时 JSON 中的行号不能用于新矩阵
+    """
+    if generation is None:
+        return None, []
+    try:
+        with np.load(Path(path).with_suffix('.npz'), allow_pickle=False) as f:
+            if f['generation'].item() != generation:
+                return None, []
+            counts = sparse.csr_matrix((f['data'], f['indices'], f['indptr']), shape=tuple(f['shape']))
+            return counts, f['vocab'].tolist()
+    except (OSError, ValueError, KeyError):
+        return None, []
+
+
+def save_state(state, counts, vocab, path=STATE_FILE):
+    """保存状态：矩阵和 JSON 中写入同一个 generation，读取时不一致的一对视为没有状态"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    generation = uuid.uuid4().hex
+    tmp = path.with_name(f".{path.stem}.tmp.npz")
+    np.savez(tmp, data=counts.data, indices=counts.indices, indptr=counts.indptr,
+             shape=np.asarray(counts.shape), vocab=np.asarray(vocab, dtype=str), generation=np.asarray(generation))
+    os.replace(tmp, path.with_suffix('.npz'))
+    atomic_write(path, json.dumps(dict(state, version=STATE_VERSION, generation=generation),
+                                  ensure_ascii=False, separators=(',', ':')))
+
+
+def scan_documents(directory, old_docs):
+    """只检查修改时间和大小，返回 (按文件名排序的 [(文件, stat)], 新增或修改过的文件名集合)"""
+    files = []
+    changed = set()
+    for filepath in sorted(Path(directory).glob("*.md")):
+        st = filepath.stat()
+        old = old_docs.get(filepath.name)
+        if not old or old['mtime'] != st.st_mtime_ns or old['size'] != st.st_size:
+            changed.add(filepath.name)
+        files.append((filepath, st))
+    return files, changed
+
+
+def build_counts(files, changed, old_docs, old_counts, vocab):
+    """
+    生成词频矩阵：未变化的文章直接取旧矩阵的行，只切分变化的文章
+
+    返回 (文件名 -> {row, mtime, size, slug, title}, 词频矩阵, 词表, 错误列表)，
+    矩阵的行与按文件名排序的文章一一对应
+    """
+    vocab = list(vocab)
+    column = None
+    docs = {}
+    errors = []
+    old_rows = []
+    new_rows = {}
+    for filepath, st in files:
+        old = old_docs.get(filepath.name)
+        if filepath.name not in changed:
+            docs[filepath.name] = dict(old, row=len(docs))
+            old_rows.append((len(docs) - 1, old['row']))
+            continue
+        try:
+            meta, terms = document_terms(filepath)
+        except Exception as e:
+            errors.append((filepath.name, str(e)))
+            continue
+        if column is None:
+            # 词表很大时构造索引较慢，只在有文章需要重新切分时才构造
+            column = {term: i for i, term in enumerate(vocab)}
+        for term in terms:
+            if term not in column:
+                column[term] = len(vocab)
+                vocab.append(term)
+        new_rows[len(docs)] = {column[term]: tf for term, tf in terms.items()}
+        docs[filepath.name] = {'row': len(docs), 'mtime': st.st_mtime_ns, 'size': st.st_size,
+                               'slug': meta['slug'], 'title': meta['title']}
+
+    n = len(docs)
+    parts = []
+    order = []
+    if old_rows:
+        old_counts = sparse.csr_matrix((old_counts.data, old_counts.indices, old_counts.indptr),
+                                       shape=(old_counts.shape[0], len(vocab)))
+        parts.append(old_counts[[old for _, old in old_rows]])
+        order.extend(new for new, _ in old_rows)
+    if new_rows:
+        rows = sorted(new_rows)
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(new_rows[r]) for r in rows], out=indptr[1:])
+        indices = np.fromiter(chain.from_iterable(new_rows[r].keys() for r in rows), dtype=np.int64, count=indptr[-1])
+        values = np.fromiter(chain.from_iterable(new_rows[r].values() for r in rows), dtype=np.float32,
+                             count=indptr[-1])
+        parts.append(sparse.csr_matrix((values, indices, indptr), shape=(len(rows), len(vocab))))
+        order.extend(rows)
+    if parts:
+        counts = sparse.vstack(parts, format='csr')[np.argsort(np.asarray(order))]
+    else:
+        counts = sparse.csr_matrix((n, len(vocab)), dtype=np.float32)
+    counts, vocab = _compact_vocab(counts.astype(np.float32).tocsr(), vocab)
+    return docs, counts, vocab, errors
+
+
+def _compact_vocab(counts, vocab):
+    """删除的文章留下的词项过多时，去掉词表中不再使用的词项"""
+    used = np.flatnonzero(np.bincount(counts.indices, minlength=len(vocab)))
+    if len(vocab) <= 2 * len(used) + 1000:
+        return counts, vocab
+    remap = np.full(len(vocab), -1, dtype=np.int64)
+    remap[used] = np.arange(len(used))
+    counts = sparse.csr_matrix((counts.data, remap[counts.indices], counts.indptr), shape=(counts.shape[0], len(used)))
+    return counts, [vocab[i] for i in used]
+
+
+def tfidf_matrix(counts, max_df=MAX_DF, max_terms=MAX_TERMS):
+    """
+    词频矩阵 -> 行向量 L2 归一化的 TF-IDF 稀疏矩阵（CSR，float32）
+
+    词频取 1 + log(tf)，IDF 取 log((1 + n) / (1 + df)) + 1；只在一篇文章中出现的词项和
+    出现在超过 max_df 比例文章中的词项不计入（文章很少时不过滤）。
+    每篇文章只保留权重最高的 max_terms 个词项（权重相同的一并保留），相似度计算的开销随之大幅下降
+    """
+    counts = counts.tocsr()
+    counts.sum_duplicates()
+    n = counts.shape[0]
+    doc_freq = np.bincount(counts.indices, minlength=counts.shape[1]).astype(np.float32)
+    idf = np.log((1 + n) / (1 + doc_freq)) + 1
+    if n >= 10:
+        idf[(doc_freq <= 1) | (doc_freq > max_df * n)] = 0
+    data = (1 + np.log(np.maximum(counts.data, 1))) * idf[counts.indices]
+
+    if max_terms:
+        indptr = counts.indptr
+        for row in np.nonzero(np.diff(indptr) > max_terms)[0]:
+            start, end = indptr[row], indptr[row + 1]
+            weights = data[start:end]
+            # 与第 max_terms 大的权重相同的词项都保留，结果与词表的列顺序无关
+            threshold = np.partition(weights, end - start - max_terms)[end - start - max_terms]
+            weights[weights < threshold] = 0
+
+    matrix = sparse.csr_matrix((data.astype(np.float32), counts.indices.copy(), counts.indptr.copy()),
+                               shape=counts.shape)
+    matrix.eliminate_zeros()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return (sparse.diags(1 / norms) @ matrix).astype(np.float32).tocsr()
+
+
+def _top_k(scores, rows, k, min_score):
+    """scores 为 批 × 文章数 的相似度，rows 为这一批对应的行号；返回每行的 [(列号, 相似度)]"""
+    scores[np.arange(len(rows)), rows] = -1  # 排除自身
+    k = min(k, scores.shape[1] - 1)
+    if k <= 0:
+        return [[] for _ in rows]
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+    return [[(int(c), float(s)) for c, s in zip(cols, vals) if s >= min_score]
+            for cols, vals in zip(top, top_scores)]
+
+
+def similar_rows(matrix, rows, k=DEFAULT_TOP_K, batch_size=BATCH_SIZE, min_score=MIN_SCORE):
+    """按批计算 rows 中每行的前 k 个相似行，返回 行号 -> [(列号, 相似度)]"""
+    result = {}
+    rows = np.asarray(sorted(rows), dtype=np.int64)
+    transposed = matrix.T.tocsr()
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        scores = (matrix[batch] @ transposed).toarray()
+        for row, neighbours in zip(batch, _top_k(scores, batch, k, min_score)):
+            result[int(row)] = neighbours
+    return result
+
+
+def compute_related(docs, counts, changed, old_related, k=DEFAULT_TOP_K, full=False, batch_size=BATCH_SIZE,
+                    min_score=MIN_SCORE):
+    """
+    计算 文件名 -> [(文件名, 相似度)]，返回 (结果, 重新计算整行的文章数)
+
+    counts 为词频矩阵（行与按文件名排序的 docs 对应）；old_related 为上次的结果；changed 为新增或修改过的文件名
+    """
+    names = sorted(docs)
+    position = {name: i for i, name in enumerate(names)}
+    if not names:
+        return {}, 0
+    matrix = tfidf_matrix(counts)
+
+    stale = changed | {name for name in old_related if name not in docs}
+    if full or not old_related or len(stale) > FULL_RATIO * len(names):
+        rows = similar_rows(matrix, range(len(names)), k, batch_size, min_score)
+        return {names[r]: [(names[c], s) for c, s in cols] for r, cols in rows.items()}, len(names)
+
+    # 变化的文章整行重新计算，同时得到所有文章与变化文章的相似度
+    changed_rows = sorted(position[name] for name in changed)
+    related = {}
+    candidates = {}
+    recompute = set(changed_rows)
+    if changed_rows:
+        transposed = matrix[changed_rows].T.tocsr()
+        for start in range(0, len(names), batch_size):
+            scores = (matrix[start:start + batch_size] @ transposed).toarray()
+            for offset, j in zip(*np.nonzero(scores >= min_score)):
+                candidates.setdefault(start + int(offset), []).append(
+                    (changed_rows[j], float(scores[offset, j])))
+
+    for name in names:
+        row = position[name]
+        if row in recompute:
+            continue
+        previous = old_related.get(name)
+        if previous is None:
+            recompute.add(row)
+            continue
+        kept = [(position[n], s) for n, s in previous if n not in stale and n in position]
+        if len(kept) < len(previous) and len(previous) >= k:
+            # 原来的相关文章被删除或修改，空出的位置可能属于候选之外的文章
+            recompute.add(row)
+            continue
+        merged = kept + [(c, s) for c, s in candidates.get(row, []) if c != row]
+        merged.sort(key=lambda item: -item[1])
+        related[name] = [(names[c], s) for c, s in merged[:k]]
+
+    rows = similar_rows(matrix, recompute, k, batch_size, min_score)
+    for r, cols in rows.items():
+        related[names[r]] = [(names[c], s) for c, s in cols]
+    return related, len(recompute)
+
+
+def render_output(docs, related):
+    """slug -> [{slug, title, score}]（按 slug 排序，内容确定）"""
+    output = {}
+    for name in sorted(related, key=lambda n: docs[n]['slug']):
+        output[docs[name]['slug']] = [
+            {'slug': docs[other]['slug'], 'title': docs[other]['title'], 'score': round(score, 4)}
+            for other, score in related[name]
+        ]
+    return json.dumps(output, ensure_ascii=False, indent=1, sort_keys=True) + '\n'
+
+
+def build_related(directory=BLOG_DIR, output_file=OUTPUT_FILE, state_file=STATE_FILE, k=DEFAULT_TOP_K,
+                  full=False, batch_size=BATCH_SIZE):
+    """增量计算相关文章并写入 output_file，返回统计"""
+    start = time.perf_counter()
+    state = load_state(state_file)
+    if state.get('top_k') != k:
+        full = True
+    old_docs = state['docs']
+    files, changed = scan_documents(directory, old_docs)
+    names = {f.name for f, _ in files}
+    removed = [name for name in old_docs if name not in names]
+    output_file = Path(output_file)
+    if not (changed or removed or full) and output_file.exists():
+        # 没有任何变化：不加载词频矩阵
+        return {'docs': len(files), 'changed': 0, 'removed': 0, 'recomputed': 0, 'errors': 0, 'written': False,
+                'scan_time': time.perf_counter() - start, 'elapsed': time.perf_counter() - start}
+
+    old_counts, vocab = load_counts(state_file, state.get('generation')) if len(changed) < len(files) else (None, [])
+    if old_counts is None:
+        # 没有可用的矩阵（首次运行或与 JSON 状态不一致）：旧的行号和相关文章都不可信，整体重新计算
+        changed = set(names)
+        full = True
+    docs, counts, vocab, errors = build_counts(files, changed, old_docs, old_counts, vocab)
+    changed &= set(docs)
+    scan_time = time.perf_counter() - start
+
+    old_related = {name: [tuple(item) for item in items] for name, items in state['related'].items()}
+    related, recomputed = compute_related(docs, counts, changed, old_related, k, full, batch_size)
+
+    text = render_output(docs, related)
+    written = False
+    if not output_file.exists() or output_file.read_text(encoding='utf-8') != text:
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(output_file, text)
+        written = True
+    save_state({'docs': docs, 'related': related, 'top_k': k}, counts, vocab, state_file)
+
+    for name, error in errors:
+        print(f"[ERROR] 无法读取 {name}: {error}")
+    return {
+        'docs': len(docs),
+        'changed': len(changed),
+        'removed': len(removed),
+        'recomputed': recomputed,
+        'errors': len(errors),
+        'written': written,
+        'scan_time': scan_time,
+        'elapsed': time.perf_counter() - start,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='预先计算 blog 文章的相关文章（写入 src/data/related.json）')
+    parser.add_argument('--top', '-k', type=int, default=DEFAULT_TOP_K, help=f'每篇文章的相关文章数（默认为 {DEFAULT_TOP_K}）')
+    parser.add_argument('--output', '-o', default=str(OUTPUT_FILE), help='输出文件（默认为 src/data/related.json）')
+    parser.add_argument('--full', action='store_true', help='重新计算所有文章的相关文章（已切分的词频仍然复用）')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help=f'每批计算的行数（默认为 {BATCH_SIZE}）')
+    parser.add_argument('--state', default=str(STATE_FILE), help='状态文件（默认为 scripts/.cache/related_state.json）')
+    args = parser.parse_args()
+    if args.top < 1 or args.batch_size < 1:
+        parser.error("--top 和 --batch-size 必须大于 0")
+
+    stats = build_related(output_file=args.output, state_file=args.state, k=args.top, full=args.full,
+                          batch_size=args.batch_size)
+    print(f"文章 {stats['docs']} 篇：新增或修改 {stats['changed']} 篇，移除 {stats['removed']} 篇，"
+          f"重新计算 {stats['recomputed']} 行，失败 {stats['errors']} 篇")
+    print(f"{'已写入' if stats['written'] else '未变化'}: {args.output}")
+    print(f"耗时: 扫描 {stats['scan_time']:.2f}s，共 {stats['elapsed']:.2f}s")
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP 响应磁盘缓存
+按规范化后的 URL 保存 gzip 压缩的原始 HTML 以及 ETag/Last-Modified，
+再次抓取时发送条件请求；离线模式下完全从缓存读取，不产生任何网络请求。
+缓存总大小超过上限时按最近访问时间（LRU）淘汰
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import metrics
+
+# 默认配置
+CACHE_DIR = Path(__file__).parent / ".cache" / "http"
+DEFAULT_MAX_SIZE_MB = 1024
+
+# 微信公众号文章 URL 中不影响页面内容的跟踪参数，规范化时去掉；
+# 其他网站的同名参数（key、version、lang 等）可能决定页面内容，只去掉 utm_*
+WECHAT_HOST = 'mp.weixin.qq.com'
+TRACKING_PARAMS = {
+    'scene', 'srcid', 'from', 'isappinstalled', 'clicktime', 'enterid', 'sessionid',
+    'exportkey', 'pass_ticket', 'wx_header', 'ascene', 'devicetype', 'version', 'nettype',
+    'abtest_cookie', 'lang', 'countrycode', 'key', 'uin',
+}
+
+
+def _is_tracking_param(host, key):
+    if key.startswith('utm_'):
+        return True
+    return host == WECHAT_HOST and (key in TRACKING_PARAMS or key.startswith('sharer_'))
+
+
+def normalize_url(url):
+    """规范化 URL：小写协议和域名、去掉锚点和跟踪参数（微信文章的跟踪参数和所有网站的 utm_*）、查询参数排序"""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(host, key)
+    ]
+    query.sort()
+    path = parts.path or '/'
+    return urlunsplit((parts.scheme.lower(), host, path, urlencode(query), ''))
+
+
+def url_key(url):
+    """缓存键：规范化 URL 的 SHA-256"""
+    return hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+
+
+class CacheMiss(Exception):
+    """离线模式下缓存中没有该页面"""
+
+
+class ResponseCache:
+    """按 URL 缓存原始响应，线程安全"""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_size_mb=DEFAULT_MAX_SIZE_MB):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._total_size = None
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'evicted': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _paths(self, url):
+        key = url_key(url)
+        folder = self.cache_dir / key[:2]
+        return folder / f"{key}.html.gz", folder / f"{key}.json"
+
+    def _entries(self):
+        """遍历缓存条目，返回 (最近访问时间, 大小, 正文路径, 元数据路径)"""
+        for meta_path in self.cache_dir.glob('*/*.json'):
+            body_path = meta_path.with_name(meta_path.stem + '.html.gz')
+            try:
+                stat = body_path.stat()
+                yield meta_path.stat().st_mtime, stat.st_size, body_path, meta_path
+            except FileNotFoundError:
+                continue
+
+    def load(self, url):
+        """读取缓存，返回 (原始 HTML 字节, 元数据)，不存在时返回 None"""
+        body_path, meta_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text(encoding='utf-8'))
+            with gzip.open(body_path, 'rb') as f:
+                content = f.read()
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        # 更新元数据文件的修改时间，作为 LRU 的最近访问时间
+        try:
+            os.utime(meta_path)
+        except OSError:
+            pass
+        return content, meta
+
+    def conditional_headers(self, meta):
+        """根据缓存的元数据生成条件请求头"""
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def store(self, url, content, headers):
+        """保存响应正文（gzip 压缩）和校验头，写入完成后再替换，避免留下半个文件"""
+        body_path, meta_path = self._paths(url)
+        body_path.parent.mkdir(parents=True, exist_ok=True)
+        compressed = gzip.compress(content)
+        meta = {
+            'url': normalize_url(url),
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'size': len(content),
+            'stored_at': time.time(),
+        }
+
+        old_size = body_path.stat().st_size if body_path.exists() else 0
+        tmp_body = body_path.with_name(body_path.name + f'.{threading.get_ident()}.tmp')
+        tmp_meta = meta_path.with_name(meta_path.name + f'.{threading.get_ident()}.tmp')
+        tmp_body.write_bytes(compressed)
+        tmp_meta.write_text(json.dumps(meta, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp_body, body_path)
+        os.replace(tmp_meta, meta_path)
+
+        with self._lock:
+            if self._total_size is None:
+                self._total_size = sum(size for _, size, _, _ in self._entries())
+            else:
+                self._total_size += len(compressed) - old_size
+            if self._total_size > self.max_size:
+                self._evict()
+
+    def _evict(self):
+        """按最近访问时间从旧到新删除，直到总大小降到上限的 90%"""
+        target = self.max_size * 0.9
+        for _, size, body_path, meta_path in sorted(self._entries()):
+            if self._total_size <= target:
+                break
+            for path in (meta_path, body_path):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+            self._total_size -= size
+            self.stats['evicted'] += 1
+
+    def fetch(self, client, url, headers=None, offline=False):
+        """
+        通过缓存获取页面原始字节
+
+        离线模式只读缓存；否则有缓存时发送条件请求，304 直接返回缓存内容
+        """
+        cached = self.load(url)
+        if offline:
+            if cached is None:
+                raise CacheMiss(f"离线模式下缓存中没有该页面: {url}")
+            self._count('hits')
+            metrics.mark_cache('hit')
+            return cached[0]
+
+        request_headers = dict(headers or {})
+        if cached is not None:
+            request_headers.update(self.conditional_headers(cached[1]))
+
+        response = client.get(url, headers=request_headers)
+        if response.status_code == 304 and cached is not None:
+            self._count('revalidated')
+            metrics.mark_cache('revalidated')
+            return cached[0]
+
+        self._count('misses')
+        metrics.mark_cache('miss')
+        if response.status_code == 200:
+            self.store(url, response.content, response.headers)
+        return response.content
+
+
+_cache = None
+
+
+def configure_cache(cache_dir=CACHE_DIR, max_size_mb=DEFAULT_MAX_SIZE_MB, enabled=True):
+    """设置共享缓存；enabled=False 时关闭缓存"""
+    global _cache
+    _cache = ResponseCache(cache_dir, max_size_mb) if enabled else None
+    return _cache
+
+
+def get_cache():
+    """获取共享缓存，未配置或已关闭时返回 None"""
+    return _cache
+
+
+def format_stats(stats):
+    """格式化缓存统计"""
+    return (f"命中 {stats['hits']} 次，条件请求未变化 {stats['revalidated']} 次，"
+            f"下载 {stats['misses']} 次，淘汰 {stats['evicted']} 个")
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+构建站内全文搜索索引
+扫描 src/content/blog 和 src/content/dialogue，中文按相邻两字（bigram）切分，英文和数字按单词切分，
+生成倒排索引并按词项的哈希分片写入 public/search/，搜索页面只需加载查询词所在的分片。
+
+增量构建：scripts/.cache/search_state.json 记录每篇文章的修改时间、大小和词频，
+只重新读取和切分新增或修改过的文章，并且只重写包含受影响词项的分片。
+
+输出格式：
+    public/search/meta.json        {version, shards, docs: {文章编号: {collection, slug, title, date, length}}}
+    public/search/shards/NNN.json  {词项: [编号差值, 词频, 编号差值, 词频, ...]}（编号升序，差值编码）
+
+分片编号为词项 UTF-16 编码单元的 FNV-1a 32 位哈希对分片数取模，与 JavaScript 中
+逐个 charCodeAt 计算的结果相同；查询词使用与 tokenize() 相同的规则切分
+"""
+
+import argparse
+import json
+import re
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from article_index import COLLECTIONS, sort_date
+from frontmatter_io import read_header
+from fs_utils import atomic_write
+from markdown_rules import SEARCH_RULES
+
+OUTPUT_DIR = Path(__file__).parent.parent / "public" / "search"
+STATE_FILE = Path(__file__).parent / ".cache" / "search_state.json"
+# 切分规则或输出格式变化时递增，使之前的状态失效
+INDEX_VERSION = 1
+DEFAULT_SHARDS = 64
+# 标题中的词项按出现 TITLE_WEIGHT 次计入词频
+TITLE_WEIGHT = 5
+
+# 中日韩文字（统一汉字、扩展 A、兼容汉字、假名、谚文）
+_CJK = '\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3040-\u30ff\uac00-\ud7af'
+_TOKEN = re.compile(rf'[{_CJK}]+|[a-z0-9]+')
+_CJK_RUN = re.compile(rf'[{_CJK}]')
+
+
+def tokenize(text):
+    """切分为词项列表：中文连续段切成相邻两字（单独一个字时保留单字），英文和数字按单词（转小写）"""
+    text = unicodedata.normalize('NFKC', text).lower()
+    terms = []
+    for run in _TOKEN.findall(text):
+        if len(run) > 1 and _CJK_RUN.match(run):
+            terms.extend(map(''.join, zip(run, run[1:])))
+        else:
+            terms.append(run)
+    return terms
+
+
+def shard_of(term, shards):
+    """词项所在的分片：UTF-16 编码单元的 FNV-1a 32 位哈希对分片数取模"""
+    h = 0x811c9dc5
+    data = term.encode('utf-16-le')
+    for i in range(0, len(data), 2):
+        h ^= data[i] | (data[i + 1] << 8)
+        h = (h * 0x01000193) & 0xffffffff
+    return h % shards
+
+
+def slugify(stem):
+    """与 Astro 内容集合的 slug 规则一致：转小写，去掉标点，空白替换为连字符"""
+    slug = re.sub(r'[^\w\- ]', '', stem.lower())
+    return slug.replace(' ', '-')
+
+
+def document_terms(filepath):
+    """读取一篇文章，返回 (元数据, 词频)"""
+    header = read_header(filepath)
+    fields = header.fields or {}
+    title = str(fields.get('title') or filepath.stem)
+    terms = Counter(tokenize(SEARCH_RULES.apply(header.body)))
+    length = sum(terms.values())
+    for term in tokenize(title):
+        terms[term] += TITLE_WEIGHT
+    meta = {
+        'slug': slugify(filepath.stem),
+        'title': title,
+        'date': sort_date({k: str(v) for k, v in fields.items() if k in ('date', 'pubDate') and v})[:10],
+        'length': length,
+    }
+    return meta, dict(terms)
+
+
+def empty_state(shards=DEFAULT_SHARDS):
+    return {'version': INDEX_VERSION, 'shards': shards, 'next_id': 0, 'docs': {}}
+
+
+def load_state(path=STATE_FILE, shards=DEFAULT_SHARDS):
+    """读取上次构建的状态；版本或分片数不同时从头构建"""
+    try:
+        data = json.loads(Path(path).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return empty_state(shards)
+    if data.get('version') != INDEX_VERSION or data.get('shards') != shards:
+        return empty_state(shards)
+    return data
+
+
+def save_state(state, path=STATE_FILE):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write(path, json.dumps(state, ensure_ascii=False, separators=(',', ':')))
+
+
+def encode_postings(postings):
+    """按编号升序排列的 [编号, 词频, ...] -> [编号差值, 词频, ...]"""
+    encoded = postings[:]
+    for i in range(len(encoded) - 2, 0, -2):
+        encoded[i] -= encoded[i - 2]
+    return encoded
+
+
+def write_shards(docs, shard_ids, shards, output_dir):
+    """重新生成指定分片（只写入内容有变化的文件），返回实际写入的分片数"""
+    wanted = set(shard_ids)
+    if not wanted:
+        return 0
+    postings = defaultdict(list)
+    shard_cache = {}
+    # 按编号顺序遍历，每个词项的倒排列表自然有序
+    for doc in sorted(docs.values(), key=lambda d: d['id']):
+        doc_id = doc['id']
+        for term, tf in doc['terms'].items():
+            shard = shard_cache.get(term)
+            if shard is None:
+                shard = shard_cache[term] = shard_of(term, shards)
+            if shard in wanted:
+                postings[term].extend((doc_id, tf))
+
+    by_shard = defaultdict(dict)
+    for term in sorted(postings):
+        by_shard[shard_cache[term]][term] = encode_postings(postings[term])
+
+    shard_dir = Path(output_dir) / "shards"
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    written = 0
+    for shard in sorted(wanted):
+        data = json.dumps(by_shard.get(shard, {}), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        target = shard_dir / f"{shard:03d}.json"
+        if target.exists() and target.read_bytes() == data:
+            continue
+        atomic_write(target, data)
+        written += 1
+    return written
+
+
+def build_index(collections=None, output_dir=OUTPUT_DIR, state_file=STATE_FILE, shards=DEFAULT_SHARDS,
+                full=False, verbose=False):
+    """增量构建搜索索引，返回统计"""
+    start = time.perf_counter()
+    collections = collections or COLLECTIONS
+    output_dir = Path(output_dir)
+    state = empty_state(shards) if full else load_state(state_file, shards)
+    old_docs = state['docs']
+    docs = {}
+    affected = set()
+    stats = {'parsed': 0, 'reused': 0, 'removed': 0, 'errors': 0, 'shards_written': 0}
+
+    for collection, directory in collections.items():
+        if not directory.exists():
+            continue
+        for filepath in sorted(directory.glob("*.md")):
+            key = f"{collection}/{filepath.name}"
+            st = filepath.stat()
+            old = old_docs.get(key)
+            if old and old['mtime'] == st.st_mtime_ns and old['size'] == st.st_size:
+                docs[key] = old
+                stats['reused'] += 1
+                continue
+            try:
+                meta, terms = document_terms(filepath)
+            except Exception as e:
+                stats['errors'] += 1
+                print(f"[ERROR] 无法读取 {key}: {e}")
+                continue
+            doc_id = old['id'] if old else state['next_id']
+            if not old:
+                state['next_id'] += 1
+            docs[key] = dict(meta, id=doc_id, collection=collection, mtime=st.st_mtime_ns,
+                             size=st.st_size, terms=terms)
+            affected.update(terms)
+            if old:
+                affected.update(old['terms'])
+            stats['parsed'] += 1
+            if verbose:
+                print(f"[INDEX] {key}（{len(terms)} 个词项）")
+
+    for key, old in old_docs.items():
+        if key not in docs:
+            affected.update(old['terms'])
+            stats['removed'] += 1
+
+    meta_file = output_dir / "meta.json"
+    if full or not old_docs or not meta_file.exists():
+        shard_ids = range(shards)
+    else:
+        shard_ids = {shard_of(term, shards) for term in affected}
+    stats['shards_written'] = write_shards(docs, shard_ids, shards, output_dir)
+
+    changed = stats['parsed'] or stats['removed']
+    if changed or not meta_file.exists():
+        meta = {
+            'version': INDEX_VERSION,
+            'shards': shards,
+            'docs': {
+                str(doc['id']): {k: doc[k] for k in ('collection', 'slug', 'title', 'date', 'length')}
+                for doc in sorted(docs.values(), key=lambda d: d['id'])
+            },
+        }
+        output_dir.mkdir(parents=True, exist_ok=True)
+        atomic_write(meta_file, json.dumps(meta, ensure_ascii=False, separators=(',', ':')))
+
+    if changed or full or not Path(state_file).exists():
+        state['docs'] = docs
+        save_state(state, state_file)
+    stats['terms'] = len({term for doc in docs.values() for term in doc['terms']})
+    stats['docs'] = len(docs)
+    stats['elapsed'] = time.perf_counter() - start
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='构建站内全文搜索索引（输出到 public/search/）')
+    parser.add_argument('--output', '-o', default=str(OUTPUT_DIR), help='输出目录（默认为 public/search）')
+    parser.add_argument('--shards', type=int, default=DEFAULT_SHARDS, help=f'分片数（默认为 {DEFAULT_SHARDS}）')
+    parser.add_argument('--full', action='store_true', help='忽略上次记录的状态，重新构建所有分片')
+    parser.add_argument('--state', default=str(STATE_FILE), help='状态文件（默认为 scripts/.cache/search_state.json）')
+    parser.add_argument('--verbose', '-v', action='store_true', help='列出重新切分的文章')
+    args = parser.parse_args()
+    if args.shards < 1:
+        parser.error("--shards 必须大于 0")
+
+    stats = build_index(output_dir=args.output, state_file=args.state, shards=args.shards,
+                        full=args.full, verbose=args.verbose)
+    print(f"文章 {stats['docs']} 篇，词项 {stats['terms']} 个")
+    print(f"重新切分 {stats['parsed']} 篇，未变化 {stats['reused']} 篇，移除 {stats['removed']} 篇，"
+          f"失败 {stats['errors']} 篇")
+    print(f"写入分片 {stats['shards_written']}/{args.shards} 个，耗时 {stats['elapsed']:.2f}s")
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式提取和转换（内存占用与文章大小无关）
+原来的流程同时在内存中保留响应字节、解码后的文本、整棵解析树、正文 HTML 字符串和 Markdown 结果，
+图片很多的长文章峰值内存很高。流式模式下：
+
+1. 响应按块读取（requests stream=True），逐块送入 lxml 的 HTMLPullParser
+2. 按解析事件遍历文档：#js_content 中的元素在开始和结束时逐段序列化为 HTML 送入 html2text，
+   处理过的元素立即从树中删除，整个文档只保留当前打开的元素
+3. html2text 的输出按整行分段应用清理规则后直接写入文件
+
+标题和日期的选择器优先级与 fast_extract.py 相同（文本在候选元素结束时取得），
+正文只支持 #js_content（微信公众号文章的正文容器）；找不到时抛出 StreamError，由调用方回退到整体解析。
+MARKDOWN_RULES 的默认规则都不跨行，分段应用的结果与整体应用完全相同；跨行的自定义规则只在同一段内生效
+"""
+
+import hashlib
+import html
+import html.entities
+from datetime import datetime
+
+import fast_extract
+from fast_extract import TITLE_SELECTORS, DATE_SELECTORS, TITLE_SUFFIX_WECHAT, TITLE_SUFFIX, JUNK_CLASS
+
+if fast_extract.AVAILABLE:
+    from lxml import etree
+
+AVAILABLE = fast_extract.AVAILABLE
+
+CONTENT_ID = 'js_content'
+JUNK_TAGS = frozenset(('script', 'style', 'iframe', 'noscript'))
+# get_text() 不包含这些元素中的文本
+_NO_TEXT_TAGS = frozenset(('script', 'style', 'template'))
+_VOID_TAGS = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+                        'param', 'source', 'track', 'wbr'))
+_NBSP_PLACEHOLDER = '&nbsp_place_holder;'
+
+
+class StreamError(ValueError):
+    """流式提取失败（调用方应回退到整体解析）"""
+
+
+class MarkdownSink:
+    """
+    接收 html2text 的输出，按整行分段应用清理规则后写入 write(bytes)
+
+    只在“换行后接非换行字符”的位置切分，连续换行和单独一行都不会跨越两段；
+    结果等同于对全文应用 rules 后 strip()，同时计算写入内容的 SHA-256（与 content_hash() 一致）
+    """
+
+    def __init__(self, write, rules, transform=None):
+        self.write_bytes = write
+        self.rules = rules
+        self.transform = transform
+        self.buffer = ''
+        self.started = False
+        self.pending = ''
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, text):
+        if not text:
+            return
+        self.buffer += text
+        end = len(self.buffer.rstrip('\n'))
+        cut = self.buffer.rfind('\n', 0, end)
+        if cut < 0:
+            return
+        segment, self.buffer = self.buffer[:cut + 1], self.buffer[cut + 1:]
+        self._emit(segment)
+
+    def _emit(self, segment):
+        segment = self.rules.apply(segment)
+        if self.transform is not None:
+            segment = self.transform(segment)
+        if not self.started:
+            segment = segment.lstrip()
+            if not segment:
+                return
+            self.started = True
+        # 末尾的空白先保留，后面还有内容时才写出（全文末尾的空白被去掉）
+        body = segment.rstrip()
+        if not body:
+            self.pending += segment
+            return
+        self._out(self.pending + body)
+        self.pending = segment[len(body):]
+
+    def _out(self, text):
+        data = text.encode('utf-8')
+        self.digest.update(data)
+        self.size += len(data)
+        self.write_bytes(data)
+
+    def close(self):
+        """写出剩余内容，返回正文的 SHA-256"""
+        if self.buffer:
+            self._emit(self.buffer)
+            self.buffer = ''
+        return self.digest.hexdigest()
+
+
+class _Open:
+    """一个已开始、尚未结束的元素"""
+
+    __slots__ = ('elem', 'is_content', 'emit', 'skip', 'slots', 'text_done')
+
+    def __init__(self, elem, is_content, emit, skip, slots):
+        self.elem = elem
+        self.is_content = is_content
+        self.emit = emit          # 在正文中（需要序列化）
+        self.skip = skip          # 在需要删除的元素（script、广告等）中
+        self.slots = slots        # 作为标题或日期候选时的文本片段
+        self.text_done = False
+
+
+class StreamExtractor:
+    """
+    增量解析一个 HTML 文档：
+
+        extractor = StreamExtractor(converter, sink)
+        for chunk in chunks:
+            extractor.feed(chunk)
+        title, pub_date = extractor.close(parse_date)
+
+    converter 为新建的 html2text.HTML2Text，sink 为 MarkdownSink
+    """
+
+    def __init__(self, converter, sink):
+        if not AVAILABLE:
+            raise StreamError("lxml 未安装")
+        self.parser = etree.HTMLPullParser(events=('start', 'end'), encoding='utf-8', remove_comments=True)
+        self.converter = converter
+        self.converter.start = True
+        # 与 html2text 的 finish() 相同：unicode_snob 时替换为不换行空格
+        self.nbsp = html.entities.html5['nbsp;'] if converter.unicode_snob else ' '
+        self.sink = sink
+        self.stack = []
+        self.found_content = False
+        self.content_done = False
+        self.titles = [None] * len(TITLE_SELECTORS)
+        self.dates = [None] * len(DATE_SELECTORS)
+        self.meta_date = None
+        self._html = []
+
+    # HTML 输出（送入 html2text）
+
+    def _html_out(self, text):
+        self._html.append(text)
+
+    def _drain(self, final=False):
+        if self._html:
+            data = ''.join(self._html)
+            # 文本送入 html2text 时如果被分成两次，空白的处理会不同（例如 "after  " 与 "after" + "  "），
+            # 因此只送到最后一个标签为止，其后的文本留到下一次（文本中的 > 已转义）
+            cut = len(data) if final else data.rfind('>') + 1
+            self._html = [data[cut:]] if cut < len(data) else []
+            self.converter.feed(data[:cut])
+        # 保留最后一段：html2text 处理空链接时会回看并删除它
+        out = self.converter.outtextlist
+        if len(out) > 1:
+            self.sink.write(''.join(out[:-1]).replace(_NBSP_PLACEHOLDER, self.nbsp))
+            del out[:-1]
+
+    @staticmethod
+    def _start_tag(elem):
+        attrs = dict(elem.attrib)
+        if elem.tag == 'img' and 'data-src' in attrs:
+            # 微信图片懒加载，真实地址在 data-src 中
+            attrs['src'] = attrs['data-src']
+        parts = [elem.tag]
+        parts.extend(f'{k}="{html.escape(v)}"' for k, v in attrs.items())
+        return f"<{' '.join(parts)}>"
+
+    # 文本：open_ 为文本所属的元素（其文本或子元素的 tail）
+
+    def _text(self, open_, text):
+        if not text:
+            return
+        if open_.elem.tag not in _NO_TEXT_TAGS:
+            stripped = text.strip()
+            if stripped:
+                for entry in self.stack:
+                    if entry.slots is not None:
+                        entry.slots.append(stripped)
+        if open_.emit and not open_.skip:
+            self._html_out(html.escape(text, quote=False))
+
+    def _children_done(self, open_, until=None):
+        """输出 open_ 的文本和已结束子元素的 tail，并把这些子元素从树中删除"""
+        elem = open_.elem
+        if not open_.text_done:
+            self._text(open_, elem.text)
+            open_.text_done = True
+        while len(elem) and elem[0] is not until:
+            self._text(open_, elem[0].tail)
+            del elem[0]
+
+    def _on_start(self, elem):
+        parent = self.stack[-1] if self.stack else None
+        if parent is not None:
+            self._children_done(parent, until=elem)
+        tag = elem.tag if isinstance(elem.tag, str) else ''
+
+        is_content = not self.found_content and elem.get('id') == CONTENT_ID
+        if is_content:
+            self.found_content = True
+        emit = is_content or (parent is not None and parent.emit)
+        skip = emit and not is_content and (
+            parent.skip or tag in JUNK_TAGS or bool(JUNK_CLASS.search(elem.get('class', ''))))
+
+        slots = None
+        for found, selectors in ((self.titles, TITLE_SELECTORS), (self.dates, DATE_SELECTORS)):
+            for i, match in enumerate(selectors):
+                if found[i] is None and match(elem):
+                    slots = slots if slots is not None else []
+                    found[i] = slots
+        if self.meta_date is None and tag == 'meta' and elem.get('property') == 'article:published_time':
+            self.meta_date = elem.get('content', '')
+
+        self.stack.append(_Open(elem, is_content, emit, skip, slots))
+        if emit and not skip:
+            self._html_out(self._start_tag(elem))
+
+    def _on_end(self, elem):
+        open_ = self.stack[-1]
+        self._children_done(open_)
+        self.stack.pop()
+        tag = elem.tag if isinstance(elem.tag, str) else ''
+        if open_.emit and not open_.skip and tag not in _VOID_TAGS:
+            self._html_out(f"</{tag}>")
+        if open_.slots is not None:
+            # 候选元素结束：文本已完整，替换为字符串
+            text = ''.join(open_.slots)
+            for found in (self.titles, self.dates):
+                for i, slot in enumerate(found):
+                    if slot is open_.slots:
+                        found[i] = text
+        if open_.is_content:
+            self._finish_content()
+
+    def _finish_content(self):
+        self._drain(final=True)
+        self.sink.write(self.converter.finish().replace(_NBSP_PLACEHOLDER, self.nbsp))
+        self.content_done = True
+
+    def feed(self, data):
+        """送入一块原始 HTML 字节，处理已经解析出的事件"""
+        try:
+            self.parser.feed(data)
+        except etree.ParserError as e:
+            raise StreamError(f"lxml 解析失败: {e}")
+        self._process()
+
+    def _process(self):
+        for event, elem in self.parser.read_events():
+            if event == 'start':
+                self._on_start(elem)
+            else:
+                self._on_end(elem)
+        if self.found_content and not self.content_done:
+            self._drain()
+
+    def close(self, parse_date):
+        """结束解析，返回 (标题, 发布日期)；没有找到 #js_content 时抛出 StreamError"""
+        try:
+            self.parser.close()
+        except etree.ParserError as e:
+            raise StreamError(f"lxml 解析失败: {e}")
+        self._process()
+        if not self.found_content:
+            raise StreamError("没有找到 #js_content")
+        if not self.content_done:
+            self._finish_content()
+
+        title = None
+        for text in self.titles:
+            if isinstance(text, str):
+                title = TITLE_SUFFIX.sub('', TITLE_SUFFIX_WECHAT.sub('', text))
+                if title:
+                    break
+        if not title and isinstance(self.titles[-1], str):
+            title = TITLE_SUFFIX.sub('', self.titles[-1])
+        title = title or '未命名文章'
+
+        pub_date = None
+        for text in self.dates:
+            if isinstance(text, str):
+                pub_date = parse_date(text)
+                if pub_date:
+                    break
+        if not pub_date and self.meta_date is not None:
+            try:
+                pub_date = datetime.fromisoformat(self.meta_date.replace('Z', '+00:00'))
+            except ValueError:
+                pass
+        return title, pub_date or datetime.now()
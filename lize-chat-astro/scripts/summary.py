@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式摘要生成
+原来的摘要先对整篇 Markdown 应用 SUMMARY_RULES，再截取前 max_length * 2 个字符，耗时与文章大小成正比。
+这里逐块读取正文，清理后的文本够用时立即停止，只处理摘要需要的前缀：
+结果与对全文应用 SUMMARY_RULES 后截取完全相同，耗时与文章大小无关。
+
+正文可以是内存中的字符串（iter_text），也可以直接从文件的正文开头读取（iter_file，不读取整个文件）
+"""
+
+import codecs
+import re
+
+from markdown_rules import SUMMARY_RULES
+
+# 每次处理的字符数 / 字节数
+CHUNK_SIZE = 1024
+DEFAULT_MAX_LENGTH = 150
+
+_NEWLINES = re.compile(r'\n+')
+_SENTENCE_END = re.compile(r'[。！？]')
+
+
+def _chunk_rules():
+    """SUMMARY_RULES 中可以逐块应用的规则（单字符替换）；换行合并跨越块的边界，由 summary_prefix() 处理"""
+    rules = SUMMARY_RULES.copy()
+    rules.rules = [rule for rule in rules.rules if rule.name != 'newlines']
+    return rules
+
+
+_CHUNK_RULES = _chunk_rules()
+
+
+def iter_text(text, size=CHUNK_SIZE):
+    """把字符串按 size 个字符切块"""
+    for start in range(0, len(text or ''), size):
+        yield text[start:start + size]
+
+
+def iter_file(f, size=CHUNK_SIZE):
+    """从二进制文件的当前位置按块读取并解码为 UTF-8 文本（多字节字符跨块时由增量解码器拼接）"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while True:
+        data = f.read(size)
+        if not data:
+            break
+        text = decoder.decode(data)
+        if text:
+            yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def clean_pieces(chunks, strip_leading=True):
+    """
+    逐段产生清理后的文本，拼接起来等同于对全文应用 SUMMARY_RULES；调用方停止迭代后不再读取后面的块
+
+    strip_leading=True 时去掉开头的空白
+    """
+    started = not strip_leading
+    pending = False
+    for chunk in chunks:
+        for i, piece in enumerate(_NEWLINES.split(_CHUNK_RULES.apply(chunk))):
+            if i > 0:
+                # 连续的换行（可能跨越多个块）合并为一个空格
+                pending = True
+            if not started:
+                piece = piece.lstrip()
+            if not piece:
+                continue
+            if pending and started:
+                yield ' '
+            pending = False
+            started = True
+            yield piece
+    if pending and started:
+        yield ' '
+
+
+def summary_prefix(chunks, length, strip_leading=True):
+    """清理后文本的前 length 个字符，够用时不再读取后面的块；不足 length 个字符说明全文已经读完"""
+    parts = []
+    size = 0
+    for piece in clean_pieces(chunks, strip_leading):
+        parts.append(piece)
+        size += len(piece)
+        if size >= length:
+            break
+    return ''.join(parts)[:length]
+
+
+def summarize(chunks, max_length=DEFAULT_MAX_LENGTH):
+    """
+    从正文块生成摘要：文本超过 max_length 时在前 max_length * 2 个字符内的最后一个句末标点处截断，
+    没有句末标点时截取 max_length 个字符并加省略号；正文为空时返回 None
+
+    读到第 max_length * 2 个字符之后的非空白字符即停止（之后的内容不影响结果），
+    否则读完全文，与对全文 strip() 后处理的结果相同
+    """
+    limit = max_length * 2
+    parts = []
+    size = 0
+    for piece in clean_pieces(chunks):
+        parts.append(piece)
+        size += len(piece)
+        if size > limit and piece[max(0, limit - size + len(piece)):].strip():
+            text = ''.join(parts)
+            break
+    else:
+        text = ''.join(parts).rstrip()
+    if not text:
+        return None
+    if len(text) <= max_length:
+        return text
+    sentences = _SENTENCE_END.split(text[:limit])
+    if len(sentences) > 1:
+        return '。'.join(sentences[:-1]) + '。'
+    return text[:max_length] + '...'
+
+
+def summarize_file(header, max_length=DEFAULT_MAX_LENGTH):
+    """从文件正文开头流式读取生成摘要（header 为 frontmatter_io.read_header() 的结果）"""
+    with header.open_body() as f:
+        return summarize(iter_file(f), max_length)